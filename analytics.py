@@ -0,0 +1,257 @@
+"""Rolling returns, drawdown, volatility and YTD contribution per fund.
+
+The running aggregates live in a small JSON state file next to the history:
+the last year of daily totals (for the 1W/1M/1Y anchors), the year's opening
+values, the running peak and worst drawdown, and a Welford accumulator over
+daily returns. A run updates them from today's row alone; when the state is
+missing or out of step with the history (a re-run day, a skipped save) it is
+rebuilt in one vectorised pass over the history frame.
+
+Usage: python analytics.py rebuild [--portfolio NAME]
+
+Returns are on portfolio value, so buying or selling units moves them too.
+"""
+
+from __future__ import annotations
+
+import argparse
+import calendar
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+import json
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from persistence import HistoryStore, portfolio_history_path
+
+
+PERIODS = ("1W", "1M", "YTD", "1Y")
+TRADING_DAYS = 252
+
+
+def analytics_state_path(portfolio: str | None = None) -> Path:
+    suffix = "" if portfolio is None else f"-{portfolio}"
+    return portfolio_history_path(portfolio).with_name(f"analytics_state{suffix}.json")
+
+
+def _months_back(day: date, months: int) -> date:
+    year, month = divmod(day.year * 12 + day.month - 1 - months, 12)
+    month += 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def period_start(day: date, period: str) -> date:
+    if period == "1W":
+        return day - timedelta(days=7)
+    if period == "1M":
+        return _months_back(day, 1)
+    if period == "1Y":
+        return _months_back(day, 12)
+    raise ValueError(f"Unknown period: {period}")
+
+
+def _fund_values(row: pd.Series) -> dict[str, float]:
+    return {str(fund): float(value) for fund, value in row.drop("Total").dropna().items()}
+
+
+@dataclass
+class AnalyticsState:
+    last_date: str | None = None
+    last_total: float | None = None
+    last_by_fund: dict[str, float] = field(default_factory=dict)
+    # (date, total) for the last year, plus the latest day at or before a year ago.
+    window: list[tuple[str, float]] = field(default_factory=list)
+    year: int | None = None
+    year_open_total: float | None = None
+    year_open_by_fund: dict[str, float] = field(default_factory=dict)
+    peak: float = 0.0
+    max_drawdown: float = 0.0
+    # Welford accumulator over daily returns.
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def update(self, date_str: str, total: float, by_fund: Mapping[str, float]) -> None:
+        """Fold in the day after ``last_date``."""
+        day = date.fromisoformat(date_str)
+        by_fund = {fund: float(value) for fund, value in by_fund.items() if not math.isnan(value)}
+        if self.year is None:
+            self.year_open_total, self.year_open_by_fund = total, dict(by_fund)
+        elif day.year != self.year:
+            self.year_open_total, self.year_open_by_fund = self.last_total, dict(self.last_by_fund)
+        self.year = day.year
+
+        if self.last_total:
+            daily_return = total / self.last_total - 1.0
+            self.count += 1
+            delta = daily_return - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (daily_return - self.mean)
+
+        self.peak = max(self.peak, total)
+        if self.peak > 0:
+            self.max_drawdown = min(self.max_drawdown, total / self.peak - 1.0)
+
+        self.window.append((date_str, total))
+        cutoff = period_start(day, "1Y").isoformat()
+        while len(self.window) > 1 and self.window[1][0] <= cutoff:
+            self.window.pop(0)
+
+        self.last_date, self.last_total, self.last_by_fund = date_str, total, by_fund
+
+    def _anchor(self, start: str) -> float | None:
+        anchor = None
+        for date_str, total in self.window:
+            if date_str > start:
+                break
+            anchor = total
+        return anchor
+
+    def summarise(self) -> PortfolioAnalytics:
+        if self.last_date is None or self.last_total is None:
+            return PortfolioAnalytics({period: None for period in PERIODS}, None, 0.0, 0.0, {})
+        day = date.fromisoformat(self.last_date)
+        returns: dict[str, float | None] = {}
+        for period in PERIODS:
+            anchor = self.year_open_total if period == "YTD" else self._anchor(period_start(day, period).isoformat())
+            returns[period] = None if not anchor else (self.last_total / anchor - 1.0) * 100.0
+
+        volatility = None
+        if self.count > 1:
+            volatility = math.sqrt(self.m2 / (self.count - 1)) * math.sqrt(TRADING_DAYS) * 100.0
+        drawdown = (self.last_total / self.peak - 1.0) * 100.0 if self.peak > 0 else 0.0
+
+        contributions = {}
+        if self.year_open_total:
+            for fund in dict.fromkeys([*self.last_by_fund, *self.year_open_by_fund]):
+                change = self.last_by_fund.get(fund, 0.0) - self.year_open_by_fund.get(fund, 0.0)
+                contributions[fund] = change / self.year_open_total * 100.0
+        return PortfolioAnalytics(returns, volatility, drawdown, self.max_drawdown * 100.0, contributions)
+
+
+@dataclass(frozen=True, slots=True)
+class PortfolioAnalytics:
+    """What the summary and push message show, all in percent."""
+
+    returns: dict[str, float | None]
+    volatility: float | None
+    drawdown: float
+    max_drawdown: float
+    contributions: dict[str, float]
+
+    def describe(self) -> str:
+        """E.g. ``1W +0.52% | 1M +2.10% | YTD +4.80% | 1Y n/a | Vol 9.41% | Max DD -3.20%``."""
+        parts = [f"{period} {_signed_pct(self.returns.get(period))}" for period in PERIODS]
+        parts.append(f"Vol {'n/a' if self.volatility is None else f'{self.volatility:.2f}%'}")
+        parts.append(f"Max DD {self.max_drawdown:.2f}%")
+        return " | ".join(parts)
+
+    def top_contributors(self, count: int = 3) -> list[tuple[str, float]]:
+        return sorted(self.contributions.items(), key=lambda item: abs(item[1]), reverse=True)[:count]
+
+
+def _signed_pct(value: float | None) -> str:
+    return "n/a" if value is None else f"{value:+.2f}%"
+
+
+def rebuild_state(history_df: pd.DataFrame) -> AnalyticsState:
+    """Compute the state from the whole history in one vectorised pass."""
+    if history_df.empty or "Total" not in history_df.columns:
+        return AnalyticsState()
+    values = history_df.copy()
+    values["Date"] = values["Date"].astype(str)
+    values = values.drop_duplicates("Date", keep="last").set_index("Date").sort_index()
+    values = values.apply(pd.to_numeric, errors="coerce")
+    values = values[values["Total"].notna()]
+    if values.empty:
+        return AnalyticsState()
+
+    dates = values.index.to_numpy(dtype=str)
+    totals = values["Total"].to_numpy(dtype=float)
+    previous = totals[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = totals[1:] / previous - 1.0
+    returns = returns[previous != 0]
+    mean = float(returns.mean()) if len(returns) else 0.0
+
+    peak = np.maximum.accumulate(totals)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdowns = np.where(peak > 0, totals / peak - 1.0, 0.0)
+
+    last_day = date.fromisoformat(dates[-1])
+    cutoff = period_start(last_day, "1Y").isoformat()
+    window_start = max(int(np.searchsorted(dates, cutoff, side="right")) - 1, 0)
+    # The year opens on last year's close, or the first day recorded this year.
+    year_open = max(int(np.searchsorted(dates, f"{last_day.year:04d}-01-01")) - 1, 0)
+
+    return AnalyticsState(
+        last_date=str(dates[-1]),
+        last_total=float(totals[-1]),
+        last_by_fund=_fund_values(values.iloc[-1]),
+        window=[(str(date_str), float(total)) for date_str, total in zip(dates[window_start:], totals[window_start:])],
+        year=last_day.year,
+        year_open_total=float(totals[year_open]),
+        year_open_by_fund=_fund_values(values.iloc[year_open]),
+        peak=float(peak[-1]),
+        max_drawdown=min(float(drawdowns.min()), 0.0),
+        count=len(returns),
+        mean=mean,
+        m2=float(((returns - mean) ** 2).sum()),
+    )
+
+
+def load_state(path: Path) -> AnalyticsState | None:
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        data["window"] = [tuple(entry) for entry in data["window"]]
+        return AnalyticsState(**data)
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+
+
+def save_state(path: Path, state: AnalyticsState) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(asdict(state), indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def refresh_state(
+    history: HistoryStore, today_str: str, total: float, by_fund: Mapping[str, float], path: Path
+) -> AnalyticsState:
+    """Update the saved state with today's row, or rebuild it when it doesn't end on the previous day.
+
+    ``history`` must already hold today's row.
+    """
+    state = load_state(path)
+    dates = history.frame["Date"].astype(str)
+    earlier = dates[dates < today_str]
+    previous_date = earlier.max() if not earlier.empty else None
+    if state is not None and state.last_date == previous_date:
+        state.update(today_str, total, by_fund)
+        return state
+    return rebuild_state(history.frame)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the analytics state from the stored history.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="history -> analytics state file")
+    rebuild.add_argument("--portfolio", help="a name from PORTFOLIOS; defaults to the single portfolio")
+    args = parser.parse_args(argv)
+
+    state = rebuild_state(HistoryStore.load(portfolio=args.portfolio).frame)
+    path = analytics_state_path(args.portfolio)
+    save_state(path, state)
+    print(path)
+    print(state.summarise().describe())
+
+
+if __name__ == "__main__":
+    main()
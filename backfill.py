@@ -0,0 +1,97 @@
+"""Re-render archived daily summaries from the stored history, offline.
+
+Usage: python backfill.py --start 2026-01-01 --end 2026-03-31
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+import pandas as pd
+
+from config import configure_locale, configure_logging, get_summary_stylesheet
+from html_summary import build_html_summary, write_summary_pages
+from persistence import HistoryStore
+
+
+logger = logging.getLogger(__name__)
+
+
+def history_with_previous(history_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Return (values, previous) frames indexed by date.
+
+    ``previous`` is ``values`` shifted down one row, i.e. the latest prior
+    snapshot for every date, computed in one pass over the whole history.
+    """
+    values = history_df.copy()
+    values["Date"] = values["Date"].astype(str)
+    values = values.drop_duplicates("Date", keep="last").set_index("Date").sort_index()
+    values = values.apply(pd.to_numeric, errors="coerce")
+    return values, values.shift(1)
+
+
+def render_day(date_str: str, row: pd.Series, previous_row: pd.Series, stylesheet_href: str | None = None) -> str:
+    fund_values = row.drop("Total").dropna()
+    data = pd.DataFrame({"Total Holding Value": fund_values.astype(float)})
+    data.index.name = "Fund/Share"
+    previous_total = None if pd.isna(previous_row.get("Total")) else float(previous_row["Total"])
+    previous_by_fund = previous_row.drop("Total").dropna().astype(float).to_dict()
+    return build_html_summary(
+        data,
+        float(row["Total"]),
+        date_str,
+        previous_total=previous_total,
+        previous_by_fund=previous_by_fund,
+        stylesheet_href=stylesheet_href,
+    )
+
+
+def backfill_summaries(
+    history_df: pd.DataFrame,
+    start: str | None = None,
+    end: str | None = None,
+    output_dir: str = "summaries",
+    workers: int = 8,
+    link_stylesheet: bool = False,
+) -> list[str]:
+    values, previous = history_with_previous(history_df)
+    selected = values.loc[start:end]
+    selected = selected[selected["Total"].notna()]
+
+    def render_and_write(date_str: str) -> str:
+        def render(out, stylesheet_href):
+            out.write(render_day(date_str, selected.loc[date_str], previous.loc[date_str], stylesheet_href))
+
+        write_summary_pages(render, date_str, output_dir=output_dir, update_latest=False, link_stylesheet=link_stylesheet)
+        return date_str
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(render_and_write, selected.index))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Regenerate daily summary pages from stored history.")
+    parser.add_argument("--start", help="first date to render (YYYY-MM-DD), defaults to the earliest")
+    parser.add_argument("--end", help="last date to render (YYYY-MM-DD), defaults to the latest")
+    parser.add_argument("--output-dir", default="summaries")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    configure_logging(debug=False)
+    configure_locale()
+    history = HistoryStore.load()
+    rendered = backfill_summaries(
+        history.frame,
+        args.start,
+        args.end,
+        args.output_dir,
+        args.workers,
+        link_stylesheet=get_summary_stylesheet() == "linked",
+    )
+    logger.info("Rendered %s summaries into %s", len(rendered), args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare the DataFrame collate path with the slotted model for small portfolios.
+
+Times load -> value -> total for 20 and 50 funds and reports peak traced
+memory for each, with the scrape stubbed out.
+
+Usage: python benchmarks/bench_model.py [funds ...]
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_normalise import RATES, frame_normalise  # noqa: E402
+import portfolio_model  # noqa: E402
+from utilities import improved_normalise_key  # noqa: E402
+
+
+def synthetic_units(path: Path, funds: int) -> dict[str, dict[str, str | None]]:
+    """Write a units.csv for ``funds`` holdings and return the scraped fields per URL."""
+    lines = ["fund,units,url"]
+    pages = {}
+    for i in range(funds):
+        name = f"Share {i} plc" if i % 7 == 0 else f"Fund {i} Index Accumulation"
+        url = f"https://example.invalid/funds/{i}"
+        lines.append(f"{name},{100 + i * 3.5},{url}")
+        sell = f"${10 + i:.2f}" if i % 10 == 9 else f"{100 + i:,.2f}p"
+        pages[url] = {"title": name, "sell": sell, "buy": sell, "change_value": "+1.00p", "change_pct": "+0.50%"}
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return pages
+
+
+def dataframe_collate(units_path: Path, pages: dict[str, dict[str, str | None]]) -> tuple[float, pd.DataFrame]:
+    """The DataFrame pipeline the model replaced, kept here as the baseline."""
+    units_df = pd.read_csv(units_path).dropna(how="all")
+    units_df = units_df.dropna(subset=["fund", "units", "url"]).copy()
+    units_df["key"] = units_df["fund"].apply(improved_normalise_key)
+    rows = [{**pages[url], "url": url, "fund_name": fund} for fund, url in zip(units_df["fund"], units_df["url"])]
+    fund_data_df = pd.DataFrame(rows).set_index("url")
+    merged = units_df.set_index("url").join(fund_data_df, how="left", rsuffix="_src").set_index("fund")
+    merged = merged[merged["title"].notna() & merged["sell"].notna()]
+    merged = frame_normalise(merged)
+    merged = merged.rename({"units": "Units", "sell": "Sell Price", "value": "Total Holding Value"}, axis=1)
+    return float(merged["Total Holding Value"].sum()), merged
+
+
+def model_collate(units_path: Path, pages: dict[str, dict[str, str | None]]) -> tuple[float, portfolio_model.Valuation]:
+    holdings, columns = portfolio_model.load_holdings(units_path)
+    quotes = {holding.url: portfolio_model.Quote.from_fields(holding.url, holding.fund, pages[holding.url]) for holding in holdings}
+    valuation = portfolio_model.value_holdings(holdings, quotes, columns)
+    return valuation.total(), valuation
+
+
+def best_of(func, *args, repeat: int = 20) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_bytes(func, *args) -> int:
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    portfolio_model.get_gbp_rates = lambda currencies: RATES
+    sizes = [int(arg) for arg in sys.argv[1:]] or [20, 50]
+    with tempfile.TemporaryDirectory() as tmp:
+        for funds in sizes:
+            units_path = Path(tmp) / f"units-{funds}.csv"
+            pages = synthetic_units(units_path, funds)
+            frame_total, _ = dataframe_collate(units_path, pages)
+            model_total, _ = model_collate(units_path, pages)
+            assert abs(frame_total - model_total) < 1e-6, (frame_total, model_total)
+
+            frame_seconds = best_of(dataframe_collate, units_path, pages)
+            model_seconds = best_of(model_collate, units_path, pages)
+            frame_peak = peak_bytes(dataframe_collate, units_path, pages)
+            model_peak = peak_bytes(model_collate, units_path, pages)
+            print(
+                f"funds={funds} dataframe={frame_seconds * 1000:.2f}ms/{frame_peak / 1024:.0f}KiB "
+                f"model={model_seconds * 1000:.2f}ms/{model_peak / 1024:.0f}KiB "
+                f"speedup={frame_seconds / model_seconds:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Compare the per-row and column-wise price normalisation at 10k rows.
+
+Usage: python benchmarks/bench_normalise.py [rows]
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from fx import convert_to_gbp  # noqa: E402
+from utilities import (  # noqa: E402
+    contains_share,
+    improved_normalise_key,
+    infer_currencies,
+    infer_currency,
+    parse_price_to_gbp,
+    parse_prices_to_gbp,
+)
+
+
+RATES = {"GBP": 1.0, "USD": 0.8, "EUR": 0.85}
+
+
+def synthetic_merged(rows: int, distinct: int | None = None, seed: int = 0) -> pd.DataFrame:
+    """Synthetic merged frame; ``distinct`` repeats that many funds across accounts."""
+    rng = np.random.default_rng(seed)
+    distinct = distinct or rows
+    picks = rng.integers(0, distinct, rows)
+    prices = rng.uniform(1, 5000, distinct).round(2)[picks]
+    kinds = rng.integers(0, 4, distinct)[picks]
+    sell = [
+        f"{price:,.2f}p" if kind == 0 else f"£{price:,.2f}" if kind == 1 else f"${price:,.2f}" if kind == 2 else f"€{price:,.2f}"
+        for price, kind in zip(prices, kinds)
+    ]
+    names = [f"Fund {i} Index Accumulation" if kind % 2 == 0 else f"Share {i} plc" for i, kind in zip(picks, kinds)]
+    return pd.DataFrame({"units": rng.uniform(1, 1000, rows), "sell": sell, "title": names}, index=names)
+
+
+def scalar_normalise(merged_data_df: pd.DataFrame) -> pd.DataFrame:
+    """The pre-vectorisation implementation, kept here as the baseline."""
+    merged_data_df = merged_data_df.copy()
+    merged_data_df["currency"] = merged_data_df["sell"].map(infer_currency)
+    share_mask = merged_data_df.index.str.contains("share", case=False)
+    merged_data_df["sell"] = [
+        parse_price_to_gbp(price, is_share=is_share) for price, is_share in zip(merged_data_df["sell"], share_mask)
+    ]
+    merged_data_df["value"] = merged_data_df["units"] * merged_data_df["sell"]
+    merged_data_df["value"] = [
+        value * RATES[currency] for value, currency in zip(merged_data_df["value"], merged_data_df["currency"])
+    ]
+    merged_data_df["currency"] = "GBP"
+    merged_data_df["key"] = merged_data_df.index.to_series().apply(improved_normalise_key)
+    return merged_data_df.drop(columns=["title"])
+
+
+def frame_normalise(merged_data_df: pd.DataFrame) -> pd.DataFrame:
+    """The same steps on whole columns, through the helpers portfolio_model prices with."""
+    merged_data_df = merged_data_df.copy()
+    merged_data_df["currency"] = infer_currencies(merged_data_df["sell"])
+    merged_data_df["sell"] = parse_prices_to_gbp(merged_data_df["sell"], contains_share(merged_data_df.index))
+    merged_data_df["value"] = merged_data_df["units"] * merged_data_df["sell"]
+    merged_data_df["value"] = convert_to_gbp(merged_data_df["value"], merged_data_df["currency"], RATES)
+    merged_data_df["currency"] = "GBP"
+    return merged_data_df.drop(columns=["title"])
+
+
+def vectorised_normalise(merged_data_df: pd.DataFrame) -> pd.DataFrame:
+    result = frame_normalise(merged_data_df)
+    # Keys go through the scalar helper once per distinct fund.
+    keys = {fund: improved_normalise_key(fund) for fund in result.index.unique()}
+    result["key"] = result.index.to_series().map(keys)
+    return result
+
+
+def best_of(func, *args, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    for label, distinct in (("all distinct", None), ("250 funds across accounts", 250)):
+        merged = synthetic_merged(rows, distinct)
+        pd.testing.assert_frame_equal(scalar_normalise(merged), vectorised_normalise(merged))
+        scalar = best_of(scalar_normalise, merged)
+        vectorised = best_of(vectorised_normalise, merged)
+        print(
+            f"rows={rows} ({label}) scalar={scalar * 1000:.1f}ms "
+            f"vectorised={vectorised * 1000:.1f}ms speedup={scalar / vectorised:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
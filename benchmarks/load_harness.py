@@ -0,0 +1,370 @@
+"""End-to-end load harness: full main() runs against local stand-in services.
+
+Starts an HL page server (configurable latency, error rate and page size), an
+FX endpoint, an ntfy sink and an SMTP sink on localhost, points the app at
+them through the usual environment variables and drives complete runs at
+increasing fund counts, reporting throughput and fetch tail latency.
+
+Usage:
+    python benchmarks/load_harness.py --funds 10 100 1000 --latency-ms 50 --error-rate 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+from pathlib import Path
+import random
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import http_client  # noqa: E402
+import main as app  # noqa: E402
+import metrics  # noqa: E402
+import page_cache  # noqa: E402
+import share_quotes  # noqa: E402
+from benchmarks.run_benchmarks import synthetic_page  # noqa: E402
+
+
+FUND_COUNTS = (10, 100, 500, 1_000)
+FX_PER_GBP = {"USD": 1.25, "EUR": 1.17}
+# Every USD_EVERY-th page quotes a dollar price so the FX path is exercised.
+USD_EVERY = 10
+
+
+@dataclass
+class HlServerConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    page_kb: int = 40
+    seed: int = 0
+
+
+@dataclass
+class Sink:
+    """Thread-safe record of what a stand-in received."""
+
+    messages: list[dict[str, object]] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, message: dict[str, object]) -> None:
+        with self._lock:
+            self.messages.append(message)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.messages.clear()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _hl_handler(config: HlServerConfig):
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+    pages: dict[int, bytes] = {}
+
+    def page(index: int) -> bytes:
+        if index not in pages:
+            html = synthetic_page(index, filler_kb=config.page_kb)
+            if index % USD_EVERY == 0:
+                html = html.replace('class="bid">', 'class="bid">$').replace("p</span></div>", "</span></div>")
+            pages[index] = html.encode("utf-8")
+        return pages[index]
+
+    class Handler(_QuietHandler):
+        def do_GET(self):
+            with rng_lock:
+                delay = config.latency_ms + (rng.expovariate(1.0 / config.jitter_ms) if config.jitter_ms else 0.0)
+                failed = rng.random() < config.error_rate
+            time.sleep(delay / 1000.0)
+            path = urlparse(self.path).path
+            if failed:
+                self._send(503, b"unavailable", "text/plain")
+            elif path.startswith("/funds/") and path.rsplit("/", 1)[-1].isdigit():
+                self._send(200, page(int(path.rsplit("/", 1)[-1])), "text/html; charset=utf-8")
+            else:
+                self._send(404, b"not found", "text/plain")
+
+    return Handler
+
+
+class _FxHandler(_QuietHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        symbols = query.get("symbols", [""])[0].split(",")
+        rates = {symbol: FX_PER_GBP.get(symbol, 1.0) for symbol in symbols if symbol}
+        self._send(200, json.dumps({"base": "GBP", "rates": rates}).encode(), "application/json")
+
+
+def _ntfy_handler(sink: Sink):
+    class Handler(_QuietHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            sink.add({"topic": self.path.strip("/"), "title": self.headers.get("Title"), "body": body.decode("utf-8")})
+            self._send(200, b"{}", "application/json")
+
+    return Handler
+
+
+def _smtp_handler(sink: Sink):
+    class Handler(socketserver.StreamRequestHandler):
+        """Just enough SMTP for smtplib: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, QUIT."""
+
+        def reply(self, line: str) -> None:
+            self.wfile.write(f"{line}\r\n".encode())
+
+        def handle(self):
+            self.reply("220 localhost stand-in SMTP")
+            envelope: dict[str, object] = {"rcpt": []}
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                command = line.decode("utf-8", "replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb in {"EHLO", "HELO"}:
+                    self.reply("250-localhost")
+                    self.reply("250-AUTH PLAIN")
+                    self.reply("250 8BITMIME")
+                elif verb == "AUTH":
+                    credentials = command.split(" ")[-1]
+                    envelope["user"] = base64.b64decode(credentials).split(b"\0")[1].decode()
+                    self.reply("235 Authentication successful")
+                elif verb == "MAIL":
+                    envelope["from"] = command[10:].strip("<> ")
+                    self.reply("250 OK")
+                elif verb == "RCPT":
+                    envelope["rcpt"].append(command[8:].strip("<> "))
+                    self.reply("250 OK")
+                elif verb == "DATA":
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while (chunk := self.rfile.readline()) not in (b".\r\n", b""):
+                        data.append(chunk)
+                    sink.add({**envelope, "size": sum(len(chunk) for chunk in data)})
+                    envelope = {"rcpt": [], "user": envelope.get("user")}
+                    self.reply("250 OK queued")
+                elif verb == "QUIT":
+                    self.reply("221 Bye")
+                    return
+                else:
+                    self.reply("250 OK")
+
+    return Handler
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+@contextmanager
+def _serving(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@dataclass
+class StandIns:
+    hl_url: str
+    fx_url: str
+    ntfy_url: str
+    smtp_port: int
+    pushes: Sink
+    emails: Sink
+
+    def env(self, workdir: Path) -> dict[str, str]:
+        return {
+            "FX_API_URL": self.fx_url,
+            "FX_CACHE_PATH": str(workdir / ".cache" / "fx_rates.json"),
+            "QUOTE_CACHE_PATH": str(workdir / ".cache" / "share_quotes.json"),
+            "PAGE_CACHE": "false",
+            "NTFY_BASE_URL": self.ntfy_url,
+            "NTFY_TOPIC": "load-test",
+            "NTFY_TOKEN": "",
+            "SMTP_HOST": "127.0.0.1",
+            "SMTP_PORT": str(self.smtp_port),
+            "SMTP_USER": "harness",
+            "SMTP_PASS": "harness",
+            "SMTP_STARTTLS": "false",
+            "EMAIL_FROM": "harness@localhost",
+            "EMAIL_TO": "inbox@localhost",
+            "PORTFOLIOS": "",
+            "HISTORY_FORMAT": "wide",
+            "DEBUG": "false",
+            "FETCH_BACKOFF_SECONDS": "0.05",
+        }
+
+
+@contextmanager
+def stand_ins(config: HlServerConfig):
+    pushes, emails = Sink(), Sink()
+    with ExitStack() as stack:
+        hl = stack.enter_context(_serving(ThreadingHTTPServer(("127.0.0.1", 0), _hl_handler(config))))
+        fx = stack.enter_context(_serving(ThreadingHTTPServer(("127.0.0.1", 0), _FxHandler)))
+        ntfy = stack.enter_context(_serving(ThreadingHTTPServer(("127.0.0.1", 0), _ntfy_handler(pushes))))
+        smtp = stack.enter_context(_serving(_ThreadingTCPServer(("127.0.0.1", 0), _smtp_handler(emails))))
+        yield StandIns(
+            hl_url=f"http://127.0.0.1:{hl.server_address[1]}",
+            fx_url=f"http://127.0.0.1:{fx.server_address[1]}/latest",
+            ntfy_url=f"http://127.0.0.1:{ntfy.server_address[1]}",
+            smtp_port=smtp.server_address[1],
+            pushes=pushes,
+            emails=emails,
+        )
+
+
+def _stand_in_quotes(symbols, currencies) -> dict[str, share_quotes.RawQuote]:
+    # yfinance has no configurable endpoint, so the harness answers quotes itself.
+    return {symbol: share_quotes.RawQuote(150.0, 148.5, "GBp") for symbol in symbols}
+
+
+@contextmanager
+def _patched_env(values: dict[str, str]):
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@dataclass
+class LoadResult:
+    funds: int
+    seconds: float
+    funds_per_second: float
+    fetch_p50_seconds: float | None
+    fetch_p95_seconds: float | None
+    fetch_max_seconds: float | None
+    fetch_failures: int
+    fetch_retries: int
+    fetch_hedged: int
+    pushes: int
+    emails: int
+    status: str
+
+
+def run_once(services: StandIns, funds: int, workers: int | None = None) -> LoadResult:
+    """Run main() end to end for ``funds`` holdings in a scratch directory."""
+    services.pushes.clear()
+    services.emails.clear()
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        units_dir = workdir / "HL_Daily_Prices_Data"
+        units_dir.mkdir()
+        rows = ["fund,units,url"] + [f"Synthetic Fund {index},{10 + index % 90},{services.hl_url}/funds/{index}" for index in range(funds)]
+        (units_dir / "units.csv").write_text("\n".join(rows) + "\n", encoding="utf-8")
+
+        env = services.env(workdir)
+        if workers is not None:
+            env["SCRAPE_WORKERS"] = str(workers)
+        cwd = Path.cwd()
+        original_download = share_quotes.download_quotes
+        http_client.reset_session()
+        page_cache.reset_page_cache()
+        status = "ok"
+        start = time.perf_counter()
+        try:
+            with _patched_env(env):
+                os.chdir(workdir)
+                share_quotes.download_quotes = _stand_in_quotes
+                try:
+                    app.main([])
+                except Exception:
+                    status = "failed"
+        finally:
+            elapsed = time.perf_counter() - start
+            share_quotes.download_quotes = original_download
+            os.chdir(cwd)
+            http_client.reset_session()
+            page_cache.reset_page_cache()
+
+    fetch = metrics.get_run_metrics().report()["fetch"]
+    return LoadResult(
+        funds=funds,
+        seconds=elapsed,
+        funds_per_second=funds / elapsed if elapsed else 0.0,
+        fetch_p50_seconds=fetch["p50_seconds"],
+        fetch_p95_seconds=fetch["p95_seconds"],
+        fetch_max_seconds=fetch["max_seconds"],
+        fetch_failures=fetch["failures"],
+        fetch_retries=fetch["retries"],
+        fetch_hedged=fetch["hedged"],
+        pushes=len(services.pushes.messages),
+        emails=len(services.emails.messages),
+        status=status,
+    )
+
+
+def run_load(fund_counts=FUND_COUNTS, config: HlServerConfig | None = None, workers: int | None = None) -> list[LoadResult]:
+    with stand_ins(config or HlServerConfig()) as services:
+        return [run_once(services, funds, workers) for funds in fund_counts]
+
+
+def _ms(value: float | None) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--funds", type=int, nargs="+", default=list(FUND_COUNTS))
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fixed HL page latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="mean of extra exponential latency (the tail)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of HL requests answered with 503")
+    parser.add_argument("--page-kb", type=int, default=40)
+    parser.add_argument("--workers", type=int, help="SCRAPE_WORKERS for the runs (default: app default)")
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    config = HlServerConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.page_kb)
+    results = run_load(args.funds, config, args.workers)
+    print(f"{'funds':>6} {'seconds':>8} {'funds/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'failed':>6} {'retry':>5} {'hedge':>5} {'push':>4} {'mail':>4}  status")
+    for result in results:
+        print(
+            f"{result.funds:>6} {result.seconds:>8.2f} {result.funds_per_second:>8.1f} {_ms(result.fetch_p50_seconds):>8} "
+            f"{_ms(result.fetch_p95_seconds):>8} {_ms(result.fetch_max_seconds):>8} {result.fetch_failures:>6} {result.fetch_retries:>5} {result.fetch_hedged:>5} "
+            f"{result.pushes:>4} {result.emails:>4}  {result.status}"
+        )
+    if args.output:
+        args.output.write_text(json.dumps([asdict(result) for result in results], indent=2), encoding="utf-8")
+    return 0 if all(result.status == "ok" for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
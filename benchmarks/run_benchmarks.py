@@ -0,0 +1,290 @@
+"""Microbenchmarks for the scrape-parse-collate-render pipeline.
+
+Generates synthetic HL-style fund pages, holdings and history files, times each
+stage on its own and writes the results as JSON. Pass ``--baseline`` to compare
+against a stored run and exit non-zero on regressions.
+
+Usage:
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta, timezone
+import json
+from pathlib import Path
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import persistence  # noqa: E402
+import portfolio_model  # noqa: E402
+import price_scraper  # noqa: E402
+from html_summary import build_html_summary  # noqa: E402
+from portfolio_model import Holding, Quote  # noqa: E402
+
+
+FUND_SIZES = (10, 100, 1_000, 10_000)
+# The BeautifulSoup fallback is only timed for reference at small sizes.
+SOUP_MAX_FUNDS = 100
+HISTORY_YEARS = (1, 10)
+HISTORY_FUND_SIZES = (10, 100, 1_000)
+RATES = {"GBP": 1.0, "USD": 0.8, "EUR": 0.85}
+TODAY = date(2026, 4, 16)
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <meta property="og:title" content="{title}">
+  <title>{title} | Hargreaves Lansdown</title>
+  <script>window.dataLayer = [{{"fund": "{title}", "sell": "Sell: 0.00p"}}];</script>
+</head>
+<body>
+  <nav>{nav}</nav>
+  <h1>{title}</h1>
+  <div class="prices">
+    <div class="price"><span class="price-label">Sell:</span> <span class="bid">{sell}</span></div>
+    <div class="price"><span class="price-label">Buy:</span> <span class="ask">{buy}</span></div>
+    <div class="change"><span>Change:</span> <span>{change}p</span> <span>( {pct}% )</span></div>
+  </div>
+  <section>{filler}</section>
+</body>
+</html>
+"""
+
+
+@dataclass
+class BenchResult:
+    name: str
+    funds: int
+    years: int | None
+    seconds: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[funds={self.funds},years={self.years}]"
+
+
+def fund_names(count: int) -> list[str]:
+    return [f"Synthetic Fund {index} Index Accumulation" for index in range(count)]
+
+
+def synthetic_page(index: int, filler_kb: int = 40) -> str:
+    price = 100 + index % 5000 + 0.25
+    return PAGE_TEMPLATE.format(
+        title=f"Synthetic Fund {index} Class B - Accumulation (GBP)",
+        nav="".join(f'<a href="/page/{link}">Link {link}</a>' for link in range(50)),
+        sell=f"{price:,.2f}p",
+        buy=f"{price:,.2f}p",
+        change=f"+{index % 7}.{index % 10}0",
+        pct=f"+{index % 3}.{index % 10}1",
+        filler="<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>" * (filler_kb * 1024 // 64),
+    )
+
+
+def synthetic_merged(count: int) -> pd.DataFrame:
+    rng = np.random.default_rng(count)
+    names = fund_names(count)
+    prices = rng.uniform(1, 5000, count)
+    sell = [f"${price:,.2f}" if index % 10 == 0 else f"{price:,.2f}p" for index, price in enumerate(prices)]
+    return pd.DataFrame({"units": rng.uniform(1, 1000, count), "sell": sell, "title": names}, index=names)
+
+
+def synthetic_portfolio(count: int) -> pd.DataFrame:
+    rng = np.random.default_rng(count)
+    names = fund_names(count)
+    data = pd.DataFrame(
+        {
+            "Units": rng.uniform(1, 1000, count),
+            "Sell Price": rng.uniform(0.5, 50, count),
+            "Buy Price": rng.uniform(0.5, 50, count),
+            "Change Value": ["+1.00p"] * count,
+            "Percentage Change": ["+0.50%"] * count,
+            "URL": [f"https://www.hl.co.uk/funds/{index}" for index in range(count)],
+            "Currency": ["GBP"] * count,
+        },
+        index=pd.Index(names, name="Fund/Share"),
+    )
+    data["Total Holding Value"] = data["Units"] * data["Sell Price"]
+    return data
+
+
+def synthetic_history(count: int, years: int) -> pd.DataFrame:
+    dates = pd.bdate_range(end=TODAY - timedelta(days=1), periods=years * 261)
+    rng = np.random.default_rng(count * 100 + years)
+    values = rng.uniform(100, 10_000, (len(dates), count))
+    history = pd.DataFrame(values, columns=fund_names(count))
+    history.insert(0, "Total", values.sum(axis=1))
+    history.insert(0, "Date", dates.strftime("%Y-%m-%d"))
+    return history
+
+
+def best_of(func, repeat: int, setup=None) -> float:
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_parse(funds: int, repeat: int) -> list[BenchResult]:
+    pages = [synthetic_page(index) for index in range(min(funds, 200))]
+    loops = max(1, funds // len(pages))
+
+    def run(parser):
+        for _ in range(loops):
+            for page in pages:
+                parser(page)
+
+    # Time a page sample and scale up, so 10k pages don't need 10k distinct strings.
+    scale = funds / (loops * len(pages))
+    results = [BenchResult("parse_fund_html", funds, None, best_of(lambda: run(price_scraper.parse_fund_html), repeat) * scale)]
+    if funds <= SOUP_MAX_FUNDS:
+        soup = best_of(lambda: run(price_scraper._parse_fund_html_soup), repeat) * scale
+        results.append(BenchResult("parse_fund_html_soup", funds, None, soup))
+    return results
+
+
+def bench_value(funds: int, repeat: int) -> BenchResult:
+    merged = synthetic_merged(funds)
+    holdings = [Holding(name, units, f"u{index}", name.lower()) for index, (name, units) in enumerate(zip(merged.index, merged["units"]))]
+    quotes = {
+        holding.url: Quote.from_fields(holding.url, holding.fund, {"title": holding.fund, "sell": sell})
+        for holding, sell in zip(holdings, merged["sell"])
+    }
+    original = portfolio_model.get_gbp_rates
+    portfolio_model.get_gbp_rates = lambda currencies: RATES
+    try:
+        seconds = best_of(lambda: portfolio_model.value_holdings(holdings, quotes), repeat)
+    finally:
+        portfolio_model.get_gbp_rates = original
+    return BenchResult("value_holdings", funds, None, seconds)
+
+
+def bench_render(funds: int, repeat: int) -> BenchResult:
+    data = synthetic_portfolio(funds)
+    total = float(data["Total Holding Value"].sum())
+    previous_by_fund = (data["Total Holding Value"] * 0.99).to_dict()
+    seconds = best_of(
+        lambda: build_html_summary(data, total, TODAY.isoformat(), previous_total=total * 0.99, previous_by_fund=previous_by_fund),
+        repeat,
+    )
+    return BenchResult("build_html_summary", funds, None, seconds)
+
+
+def bench_history(funds: int, years: int, repeat: int, workdir: Path) -> list[BenchResult]:
+    source = workdir / f"history-{funds}-{years}.csv"
+    synthetic_history(funds, years).to_csv(source, index=False)
+    target = workdir / "daily_totals.csv"
+    data = synthetic_portfolio(funds)
+    total = float(data["Total Holding Value"].sum())
+    today_str = TODAY.isoformat()
+
+    def reset():
+        shutil.copyfile(source, target)
+
+    update = best_of(lambda: persistence.update_daily_totals(data, total, today_str, filename=str(target)), repeat, setup=reset)
+
+    reset()
+    saved = persistence.DEFAULT_HISTORY_PATH, persistence.PRIVATE_HISTORY_PATH
+    persistence.DEFAULT_HISTORY_PATH = target
+    persistence.PRIVATE_HISTORY_PATH = workdir / "missing" / "daily_totals.csv"
+    try:
+        snapshot = best_of(lambda: persistence.load_previous_snapshot(today_str, data.index.tolist()), repeat)
+    finally:
+        persistence.DEFAULT_HISTORY_PATH, persistence.PRIVATE_HISTORY_PATH = saved
+
+    return [
+        BenchResult("update_daily_totals", funds, years, update),
+        BenchResult("load_previous_snapshot", funds, years, snapshot),
+    ]
+
+
+def run_suite(
+    fund_sizes=FUND_SIZES,
+    history_fund_sizes=HISTORY_FUND_SIZES,
+    history_years=HISTORY_YEARS,
+    repeat: int = 3,
+) -> list[BenchResult]:
+    results: list[BenchResult] = []
+    for funds in fund_sizes:
+        results.extend(bench_parse(funds, repeat))
+        results.append(bench_value(funds, repeat))
+        results.append(bench_render(funds, repeat))
+    with tempfile.TemporaryDirectory() as tmp:
+        for funds in history_fund_sizes:
+            for years in history_years:
+                results.extend(bench_history(funds, years, repeat, Path(tmp)))
+    return results
+
+
+def results_to_json(results: list[BenchResult]) -> dict:
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+        },
+        "results": [{"key": result.key, **asdict(result)} for result in results],
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return a line per benchmark that got slower than baseline * (1 + tolerance)."""
+    previous = {entry["key"]: entry["seconds"] for entry in baseline.get("results", [])}
+    regressions = []
+    for entry in current["results"]:
+        before = previous.get(entry["key"])
+        if before and entry["seconds"] > before * (1 + tolerance):
+            regressions.append(f"{entry['key']}: {before * 1000:.2f}ms -> {entry['seconds'] * 1000:.2f}ms")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--funds", type=int, nargs="+", default=list(FUND_SIZES))
+    parser.add_argument("--history-funds", type=int, nargs="+", default=list(HISTORY_FUND_SIZES))
+    parser.add_argument("--years", type=int, nargs="+", default=list(HISTORY_YEARS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=ROOT / "benchmarks" / "results.json")
+    parser.add_argument("--baseline", type=Path, help="fail if any benchmark regressed against this file")
+    parser.add_argument("--save-baseline", type=Path, help="also write the results here")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown fraction (default 0.25)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.funds, args.history_funds, args.years, args.repeat)
+    payload = results_to_json(results)
+    for result in results:
+        print(f"{result.key:<60} {result.seconds * 1000:10.2f} ms")
+
+    args.output.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+    if args.baseline:
+        regressions = compare(payload, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
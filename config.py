@@ -1,4 +1,6 @@
 from dataclasses import dataclass
+import locale
+import logging
 import os
 
 from dotenv import load_dotenv
@@ -6,6 +8,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 def env(name: str, default: str = "") -> str:
     value = os.getenv(name, default)
@@ -17,6 +21,19 @@ def env_flag(name: str, default: bool = False) -> bool:
     return env(name, fallback).lower() in {"true", "1", "yes"}
 
 
+def env_number(name: str, default: int | float) -> int | float:
+    # Parsed as the default's type. A malformed value is logged and the default
+    # used rather than failing the run; empty means unset.
+    value = env(name)
+    if not value:
+        return default
+    try:
+        return type(default)(value)
+    except ValueError:
+        logger.warning("Ignoring %s=%r, which is not a number; using %s", name, value, default)
+        return default
+
+
 @dataclass(frozen=True)
 class EmailSettings:
     host: str
@@ -25,6 +42,7 @@ class EmailSettings:
     password: str
     sender: str
     recipients: tuple[str, ...]
+    starttls: bool = True
 
     @property
     def enabled(self) -> bool:
@@ -37,14 +55,69 @@ class PushSettings:
     topic: str
     token: str
 
+    @property
+    def topics(self) -> tuple[str, ...]:
+        # NTFY_TOPIC may list several topics separated by commas.
+        return tuple(topic.strip() for topic in self.topic.split(",") if topic.strip())
+
     @property
     def enabled(self) -> bool:
-        return bool(self.topic)
+        return bool(self.topics)
+
+
+@dataclass(frozen=True)
+class HttpSettings:
+    timeout: float
+    pool_hosts: int
+    pool_size: int
+
+
+@dataclass(frozen=True)
+class FetchSettings:
+    budget_seconds: float
+    retries: int
+    backoff_seconds: float
+    hedge: bool
+
+
+@dataclass(frozen=True)
+class PageCacheSettings:
+    enabled: bool
+    directory: str
+    max_bytes: int
+    max_age_days: int
+
+
+@dataclass(frozen=True)
+class WatchlistSettings:
+    symbols: tuple[str, ...]
+    cache_path: str
+    ttl_seconds: float
+
+
+@dataclass(frozen=True)
+class DaemonSettings:
+    interval_seconds: float
+    portfolio_alert_pct: float
+    fund_alert_pct: float
+
+
+@dataclass(frozen=True)
+class MatchSettings:
+    cache_path: str
+    min_score: float
+    search_url: str
+
+
+@dataclass(frozen=True)
+class FxSettings:
+    api_url: str
+    cache_path: str
 
 
 def get_email_settings() -> EmailSettings:
     host = env("SMTP_HOST")
-    port = int(env("SMTP_PORT", "587"))
+    port = env_number("SMTP_PORT", 587)
     user = env("SMTP_USER") or env("EMAIL_ADDRESS")
     password = env("SMTP_PASS") or env("EMAIL_APP_PASSWORD")
     sender = env("EMAIL_FROM") or user or env("EMAIL_ADDRESS")
@@ -57,6 +130,8 @@ def get_email_settings() -> EmailSettings:
         password=password,
         sender=sender,
         recipients=recipients,
+        # Only turned off for local SMTP sinks that don't speak TLS.
+        starttls=env_flag("SMTP_STARTTLS", default=True),
     )
 
 
@@ -70,3 +145,121 @@ def get_push_settings() -> PushSettings:
 
 def get_debug_mode() -> bool:
     return env_flag("DEBUG", default=False)
+
+
+def get_scrape_workers() -> int:
+    # 1 keeps the original one-fund-at-a-time behaviour.
+    return max(1, env_number("SCRAPE_WORKERS", 8))
+
+
+def get_http_settings() -> HttpSettings:
+    # Enough keep-alive sockets per host for every scrape worker.
+    pool_size = max(10, get_scrape_workers())
+    return HttpSettings(
+        timeout=env_number("HTTP_TIMEOUT", 20.0),
+        pool_hosts=env_number("HTTP_POOL_HOSTS", 10),
+        pool_size=env_number("HTTP_POOL_SIZE", pool_size),
+    )
+
+
+def get_fetch_settings() -> FetchSettings:
+    return FetchSettings(
+        # Wall-clock budget shared by every fund fetch in a run.
+        budget_seconds=env_number("RUN_BUDGET_SECONDS", 300.0),
+        retries=max(0, env_number("FETCH_RETRIES", 2)),
+        backoff_seconds=env_number("FETCH_BACKOFF_SECONDS", 0.5),
+        hedge=env_flag("FETCH_HEDGE", default=True),
+    )
+
+
+def get_page_cache_settings() -> PageCacheSettings:
+    return PageCacheSettings(
+        enabled=env_flag("PAGE_CACHE", default=True),
+        directory=env("PAGE_CACHE_DIR", ".cache/hl_pages"),
+        max_bytes=int(env_number("PAGE_CACHE_MAX_MB", 50.0) * 1024 * 1024),
+        max_age_days=env_number("PAGE_CACHE_MAX_AGE_DAYS", 14),
+    )
+
+
+def get_fx_settings() -> FxSettings:
+    return FxSettings(
+        api_url=env("FX_API_URL", "https://api.frankfurter.dev/v1/latest"),
+        cache_path=env("FX_CACHE_PATH", ".cache/fx_rates.json"),
+    )
+
+
+def get_watchlist_settings() -> WatchlistSettings:
+    # WATCHLIST=ELIX.L,VOD.L lists Yahoo symbols; set it empty to show no share quotes.
+    symbols = tuple(symbol.strip() for symbol in env("WATCHLIST", "ELIX.L").split(",") if symbol.strip())
+    return WatchlistSettings(
+        symbols=symbols,
+        cache_path=env("QUOTE_CACHE_PATH", ".cache/share_quotes.json"),
+        ttl_seconds=env_number("QUOTE_CACHE_TTL_SECONDS", 300.0),
+    )
+
+
+def get_daemon_settings() -> DaemonSettings:
+    return DaemonSettings(
+        interval_seconds=max(1.0, env_number("DAEMON_INTERVAL_SECONDS", 900.0)),
+        # Moves since the last close, in percent; 0 turns that kind of alert off.
+        portfolio_alert_pct=env_number("ALERT_PORTFOLIO_PCT", 1.0),
+        fund_alert_pct=env_number("ALERT_FUND_PCT", 3.0),
+    )
+
+
+def get_match_settings() -> MatchSettings:
+    return MatchSettings(
+        cache_path=env("MATCH_INDEX_PATH", ".cache/holding_index.json"),
+        # Title matches scoring below this (0-1) are treated as no match.
+        min_score=env_number("MATCH_MIN_SCORE", 0.6),
+        # HL's A-Z fund listing; {letter} is the fund name's first letter. Empty disables searching.
+        search_url=env("MATCH_SEARCH_URL", "https://www.hl.co.uk/funds/fund-discounts,-prices--and--factsheets/search-results/{letter}"),
+    )
+
+
+def get_history_format() -> str:
+    # "wide" keeps the single daily_totals.csv; "long" uses year partitions.
+    value = env("HISTORY_FORMAT", "wide").lower()
+    return value if value in {"wide", "long"} else "wide"
+
+
+def get_portfolios() -> dict[str, str]:
+    # PORTFOLIOS=name=path/to/units.csv,other=path/to/other_units.csv
+    portfolios: dict[str, str] = {}
+    for entry in env("PORTFOLIOS").split(","):
+        name, _, path = entry.partition("=")
+        if name.strip() and path.strip():
+            portfolios[name.strip()] = path.strip()
+    return portfolios
+
+
+def get_prometheus_textfile_enabled() -> bool:
+    # Also write summaries/hl_daily_prices.prom for node_exporter's textfile collector.
+    return env_flag("METRICS_PROMETHEUS", default=False)
+
+
+def get_notify_timeout() -> float:
+    # How long a run waits for all notification channels before reporting the stragglers.
+    return env_number("NOTIFY_TIMEOUT", 60.0)
+
+
+def get_summary_stylesheet() -> str:
+    # "inline" embeds the CSS in every archived page; "linked" shares one summary.css per folder.
+    value = env("SUMMARY_STYLESHEET", "inline").lower()
+    return value if value in {"inline", "linked"} else "inline"
+
+
+def configure_logging(debug: bool) -> None:
+    level = logging.DEBUG if debug else logging.INFO
+    logging.basicConfig(level=level, format="%(levelname)s %(name)s: %(message)s")
+
+
+def configure_locale() -> None:
+    for loc in ("en_GB.UTF-8", "en_US.UTF-8", "C.UTF-8", "C"):
+        try:
+            locale.setlocale(locale.LC_ALL, loc)
+            logger.debug("Locale set to %s", loc)
+            return
+        except locale.Error:
+            continue
+    logger.warning("Could not set locale, using system default")
@@ -0,0 +1,229 @@
+"""Intraday mode: keep the run's state warm and alert on big moves.
+
+    python main.py daemon
+
+Holdings, the previous close from history, the HTTP pool and the page cache
+stay loaded between polls. Each poll re-fetches the fund pages and watchlist
+quotes, matches pages to holdings the way the daily run does, re-values only
+the holdings whose quote changed, and pushes a notification when the
+portfolio or a fund moves past an alert threshold.
+Nothing is written to history; the daily run still does that.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from datetime import date, datetime
+import logging
+from pathlib import Path
+import threading
+import time
+
+from config import DaemonSettings, get_daemon_settings, get_portfolios, get_push_settings
+from fetch_policy import start_run_budget
+from matching import HoldingIndex, load_holding_index
+from metrics import get_run_metrics, reset_run_metrics
+from notifications import send_push_notification
+from persistence import HistoryStore
+from portfolio_model import Holding, Quote, Valuation, load_holdings, value_holdings
+from pull_and_collate import UNITS_PATH, resolve_holdings, scrape_unique_urls
+from share_quotes import ShareQuote, fetch_watchlist_quotes
+
+
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_TOTAL = "Portfolio"
+
+
+def move_pct(value: float, previous: float | None) -> float | None:
+    if previous is None or previous == 0:
+        return None
+    return (value - previous) / previous * 100.0
+
+
+@dataclass(frozen=True)
+class Alert:
+    name: str
+    value: float
+    pct: float
+
+    def describe(self) -> str:
+        return f"{self.name}: GBP {self.value:,.2f} ({self.pct:+.2f}% since close)"
+
+
+@dataclass
+class PortfolioState:
+    """One portfolio's warm state between polls."""
+
+    name: str | None
+    units_path: Path
+    holdings: list[Holding] = field(default_factory=list)
+    columns: tuple[str, ...] = ("units",)
+    units_mtime: float | None = None
+    index: HoldingIndex | None = None
+    # The holdings as last matched to pages; url-less or relinked ones point at the page they were priced from.
+    resolved: list[Holding] = field(default_factory=list)
+    valuation: Valuation | None = None
+    total: float = 0.0
+    url_positions: dict[str, list[int]] = field(default_factory=dict)
+    fund_positions: dict[str, list[int]] = field(default_factory=dict)
+    baseline_date: str | None = None
+    previous_total: float | None = None
+    previous_by_fund: dict[str, float] = field(default_factory=dict)
+    # Furthest multiple of the threshold already alerted today, per (name, direction).
+    alerted: dict[tuple[str, int], int] = field(default_factory=dict)
+
+    def refresh_holdings(self) -> None:
+        """Re-read units.csv only when it has changed since the last poll."""
+        mtime = self.units_path.stat().st_mtime
+        if mtime == self.units_mtime:
+            return
+        self.holdings, self.columns = load_holdings(self.units_path)
+        self.units_mtime = mtime
+        self.index = None
+        self.resolved = []
+        self.valuation = None
+        self.baseline_date = None
+
+    def refresh_baseline(self, today_str: str) -> bool:
+        """Load the previous close from history once per day; True when it was (re)loaded."""
+        if self.baseline_date == today_str:
+            return False
+        history = HistoryStore.load(portfolio=self.name)
+        funds = list(dict.fromkeys(holding.fund for holding in self.holdings))
+        self.previous_total, self.previous_by_fund = history.previous_snapshot(today_str, funds)
+        self.baseline_date = today_str
+        self.alerted.clear()
+        return True
+
+    def revalue(self, quotes: dict[str, Quote], listings: dict[str, list[tuple[str, str]]] | None = None) -> set[str]:
+        """Bring the valuation up to date with ``quotes``; returns the funds whose value was recomputed.
+
+        Holdings are matched to pages with ``resolve_holdings``, as in the daily
+        run. Only holdings whose quote changed are re-priced. A holding that
+        failed to price before, or fails now, or that matched a different page,
+        changes the set of priced holdings and triggers a full rebuild instead.
+        """
+        if self.index is None:
+            self.index = load_holding_index(self.units_path, self.holdings)
+        with get_run_metrics().stage("match"):
+            holdings = resolve_holdings(self.holdings, quotes, self.index, listings=listings)
+        if self.valuation is not None and holdings == self.resolved:
+            valuation = self.valuation
+            changed = [url for url, positions in self.url_positions.items() if quotes.get(url) != valuation.quotes[positions[0]]]
+            unpriced = {holding.url for holding in holdings} - self.url_positions.keys()
+            recovered = any(quotes.get(url) is not None and quotes[url].sell is not None for url in unpriced)
+            if not recovered and all(quotes.get(url) is not None and quotes[url].sell is not None for url in changed):
+                updates = {position: quotes[url] for url in changed for position in self.url_positions[url]}
+                if updates:
+                    self.total += valuation.reprice(updates)
+                return {valuation.holdings[position].fund for position in updates}
+
+        self.resolved = holdings
+        self.valuation = value_holdings(holdings, quotes, self.columns)
+        self.total = self.valuation.total()
+        self.url_positions, self.fund_positions = {}, {}
+        for position, holding in enumerate(self.valuation.holdings):
+            self.url_positions.setdefault(holding.url, []).append(position)
+            self.fund_positions.setdefault(holding.fund, []).append(position)
+        return set(self.fund_positions)
+
+    def fund_value(self, fund: str) -> float:
+        return sum(self.valuation.value[position] for position in self.fund_positions[fund])
+
+    def _crossed(self, name: str, pct: float | None, threshold: float) -> bool:
+        # Alert on each further multiple of the threshold, once per direction per day.
+        if pct is None or threshold <= 0:
+            return False
+        band = int(abs(pct) // threshold)
+        direction = 1 if pct > 0 else -1
+        if band == 0 or band <= self.alerted.get((name, direction), 0):
+            return False
+        self.alerted[(name, direction)] = band
+        return True
+
+    def alerts(self, settings: DaemonSettings, funds: set[str]) -> list[Alert]:
+        alerts = []
+        total_pct = move_pct(self.total, self.previous_total)
+        if self._crossed(PORTFOLIO_TOTAL, total_pct, settings.portfolio_alert_pct):
+            alerts.append(Alert(PORTFOLIO_TOTAL, self.total, total_pct))
+        for fund in sorted(funds):
+            value = self.fund_value(fund)
+            pct = move_pct(value, self.previous_by_fund.get(fund))
+            if self._crossed(fund, pct, settings.fund_alert_pct):
+                alerts.append(Alert(fund, value, pct))
+        return alerts
+
+
+def format_alert_message(alerts: list[Alert], share_quotes: list[ShareQuote]) -> str:
+    return "\n".join([*(alert.describe() for alert in alerts), *(quote.describe() for quote in share_quotes)])
+
+
+class IntradayMonitor:
+    """Polls every portfolio's funds and the watchlist, keeping state between polls."""
+
+    def __init__(self, settings: DaemonSettings | None = None, units_paths: Mapping[str | None, Path] | None = None) -> None:
+        self.settings = settings or get_daemon_settings()
+        paths = units_paths or get_portfolios() or {None: UNITS_PATH}
+        self.portfolios = [PortfolioState(name, Path(path)) for name, path in paths.items()]
+
+    def poll(self, today_str: str | None = None) -> dict[str | None, list[Alert]]:
+        """Re-fetch, re-value and notify; returns the alerts raised per portfolio."""
+        today_str = today_str or date.today().isoformat()
+        reset_run_metrics()
+        start_run_budget()
+        new_baseline = set()
+        for state in self.portfolios:
+            state.refresh_holdings()
+            if state.refresh_baseline(today_str):
+                new_baseline.add(state.name)
+
+        # Pages matched by title last poll are re-fetched along with the ones units.csv links.
+        quotes, _ = scrape_unique_urls([[*state.holdings, *state.resolved] for state in self.portfolios])
+        share_quotes = fetch_watchlist_quotes()
+
+        raised: dict[str | None, list[Alert]] = {}
+        listings: dict[str, list[tuple[str, str]]] = {}
+        for state in self.portfolios:
+            funds = state.revalue(quotes, listings)
+            if state.name in new_baseline:
+                # Every fund's move is measured from a new close, changed or not.
+                funds |= set(state.fund_positions)
+            alerts = state.alerts(self.settings, funds)
+            logger.info(
+                "Poll %s: re-priced %s funds, total GBP %.2f",
+                state.name or "default portfolio",
+                len(funds),
+                state.total,
+            )
+            if alerts:
+                self.notify(state.name, alerts, share_quotes)
+            raised[state.name] = alerts
+        return raised
+
+    def notify(self, portfolio: str | None, alerts: list[Alert], share_quotes: list[ShareQuote]) -> None:
+        subject = f"Portfolio alert - {datetime.now():%Y-%m-%d %H:%M}"
+        if portfolio is not None:
+            subject = f"{subject} ({portfolio})"
+        try:
+            send_push_notification(get_push_settings(), subject, format_alert_message(alerts, share_quotes))
+        except Exception as exc:
+            logger.warning("Alert notification failed: %s", exc)
+
+
+def run_daemon(stop: threading.Event | None = None, max_polls: int | None = None, monitor: IntradayMonitor | None = None) -> None:
+    """Poll every DAEMON_INTERVAL_SECONDS until ``stop`` is set; a failed poll is logged and retried next time."""
+    monitor = monitor or IntradayMonitor()
+    stop = stop or threading.Event()
+    polls = 0
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            monitor.poll()
+        except Exception:
+            logger.exception("Intraday poll failed")
+        polls += 1
+        if max_polls is not None and polls >= max_polls:
+            return
+        stop.wait(max(0.0, monitor.settings.interval_seconds - (time.monotonic() - started)))
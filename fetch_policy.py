@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import random
+import threading
+import time
+
+import requests
+
+import http_client
+from config import FetchSettings, get_fetch_settings, get_http_settings, get_scrape_workers
+from metrics import FetchSample, get_run_metrics
+
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Hedging only starts once the run has enough successful fetches to estimate p95.
+HEDGE_MIN_SAMPLES = 8
+
+
+class DeadlineExceeded(TimeoutError):
+    """The run's fetch budget ran out before this request could complete."""
+
+
+class RunBudget:
+    """A wall-clock budget that every fetch in the run draws on."""
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+
+_budget: RunBudget | None = None
+_hedge_pool: ThreadPoolExecutor | None = None
+_hedge_slots: threading.BoundedSemaphore | None = None
+_lock = threading.Lock()
+
+
+def start_run_budget(seconds: float | None = None) -> RunBudget:
+    global _budget
+    with _lock:
+        _budget = RunBudget(get_fetch_settings().budget_seconds if seconds is None else seconds)
+    return _budget
+
+
+def get_run_budget() -> RunBudget:
+    if _budget is None:
+        return start_run_budget()
+    return _budget
+
+
+def _get_hedge_pool() -> tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    global _hedge_pool, _hedge_slots
+    if _hedge_pool is None:
+        with _lock:
+            if _hedge_pool is None:
+                workers = 2 * get_scrape_workers()
+                _hedge_slots = threading.BoundedSemaphore(workers)
+                _hedge_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+    return _hedge_pool, _hedge_slots
+
+
+def _attempt(url: str, headers: dict[str, str], timeout: float) -> requests.Response:
+    """One GET, timed into the run's per-request latencies that set the hedge threshold."""
+    start = time.perf_counter()
+    response = http_client.get(url, headers=headers, timeout=timeout)
+    get_run_metrics().record_attempt(time.perf_counter() - start)
+    return response
+
+
+def _submit(url: str, headers: dict[str, str], timeout: float) -> Future | None:
+    """Start an attempt on the hedge pool, or return None when every thread is busy.
+
+    A losing request keeps its thread until it finishes or times out, so the
+    pool can fill up; callers fall back to an unhedged request rather than
+    queue behind those.
+    """
+    pool, slots = _get_hedge_pool()
+    if not slots.acquire(blocking=False):
+        return None
+    future = pool.submit(_attempt, url, headers, timeout)
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def _hedged_get(url: str, headers: dict[str, str], timeout: float, hedge_after: float | None) -> tuple[requests.Response, bool]:
+    """GET ``url``; if no answer arrives within ``hedge_after`` seconds, race a duplicate request."""
+    if hedge_after is None or hedge_after >= timeout:
+        return _attempt(url, headers, timeout), False
+
+    primary = _submit(url, headers, timeout)
+    if primary is None:
+        return _attempt(url, headers, timeout), False
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result(), False
+
+    backup = _submit(url, headers, timeout - hedge_after)
+    if backup is None:
+        return primary.result(), False
+    pending: set[Future] = {primary, backup}
+    error: BaseException | None = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return future.result(), True
+            except Exception as exc:
+                error = exc
+    raise error
+
+
+def _backoff(settings: FetchSettings, retry: int) -> float:
+    # Exponential backoff with +/-50% jitter so retrying workers don't stampede.
+    return settings.backoff_seconds * (2 ** (retry - 1)) * random.uniform(0.5, 1.5)
+
+
+def fetch_with_retries(url: str, headers: dict[str, str] | None = None) -> requests.Response:
+    """GET a fund page within the run budget, retrying transient failures.
+
+    Connection errors, timeouts and 429/5xx responses are retried up to
+    FETCH_RETRIES times with jittered exponential backoff. Once the run has
+    a p95 estimate of single-request latency, an attempt still running past
+    it gets a hedged duplicate and the first response wins. Every fetch is recorded in the
+    run metrics with its retry count.
+    """
+    settings = get_fetch_settings()
+    budget = get_run_budget()
+    metrics = get_run_metrics()
+    http_timeout = get_http_settings().timeout
+    start = time.perf_counter()
+    retries = 0
+    hedged = False
+
+    def record(response: requests.Response | None, ok: bool) -> None:
+        metrics.record_fetch(
+            FetchSample(
+                url,
+                time.perf_counter() - start,
+                len(response.content) if response is not None else 0,
+                response.status_code if response is not None else None,
+                retries=retries,
+                ok=ok,
+                hedged=hedged,
+            )
+        )
+
+    while True:
+        remaining = budget.remaining()
+        if remaining <= 0:
+            record(None, ok=False)
+            raise DeadlineExceeded(f"Run budget of {budget.seconds:.0f}s exhausted before fetching {url}")
+
+        hedge_after = metrics.fetch_latency_percentile(95, HEDGE_MIN_SAMPLES) if settings.hedge else None
+        try:
+            response, hedged_now = _hedged_get(url, headers or {}, min(http_timeout, remaining), hedge_after)
+            hedged = hedged or hedged_now
+        except (requests.ConnectionError, requests.Timeout):
+            if retries >= settings.retries:
+                record(None, ok=False)
+                raise
+        else:
+            if response.status_code not in RETRYABLE_STATUSES or retries >= settings.retries:
+                record(response, ok=response.status_code < 400)
+                return response
+
+        retries += 1
+        delay = _backoff(settings, retries)
+        if delay >= budget.remaining():
+            record(None, ok=False)
+            raise DeadlineExceeded(f"Run budget exhausted while retrying {url}")
+        time.sleep(delay)
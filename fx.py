@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from datetime import date, timedelta
+import json
+import logging
+import os
+from pathlib import Path
+
+import pandas as pd
+
+import http_client
+from config import FxSettings, get_fx_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def business_day(today: date | None = None) -> str:
+    # Weekend runs share Friday's rates; ECB reference rates don't move then.
+    today = today or date.today()
+    if today.weekday() >= 5:
+        today -= timedelta(days=today.weekday() - 4)
+    return today.isoformat()
+
+
+def _load_cache(path: Path) -> dict[str, dict[str, float]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_cache(path: Path, cache: dict[str, dict[str, float]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(cache, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _fetch_rates(api_url: str, currencies: list[str]) -> dict[str, float]:
+    response = http_client.get(api_url, params={"base": "GBP", "symbols": ",".join(currencies)})
+    response.raise_for_status()
+    per_gbp = response.json()["rates"]
+    # The API quotes units of currency per GBP; invert to GBP per unit.
+    return {currency: 1.0 / float(per_gbp[currency]) for currency in currencies if currency in per_gbp}
+
+
+def get_gbp_rates(
+    currencies: Iterable[str],
+    settings: FxSettings | None = None,
+    today: date | None = None,
+) -> dict[str, float]:
+    """Return GBP-per-unit rates for the requested currencies.
+
+    Rates are cached on disk per business day, so at most one batched request
+    is made per day. A currency the request didn't return (it failed, or the
+    API doesn't quote it) takes its most recent cached rate; one that has
+    never had a rate is logged and left out, for the caller to handle.
+    """
+    wanted = sorted({currency for currency in currencies if currency and currency != "GBP"})
+    rates: dict[str, float] = {"GBP": 1.0}
+    if not wanted:
+        return rates
+
+    settings = settings or get_fx_settings()
+    cache_path = Path(settings.cache_path)
+    cache = _load_cache(cache_path)
+    day = business_day(today)
+    day_rates = cache.get(day, {})
+
+    missing = [currency for currency in wanted if currency not in day_rates]
+    if missing:
+        try:
+            fetched = _fetch_rates(settings.api_url, missing)
+        except Exception as exc:
+            logger.warning("FX request failed, falling back to cached rates: %s", exc)
+            fetched = {}
+        if fetched:
+            day_rates = {**day_rates, **fetched}
+            cache[day] = day_rates
+            _save_cache(cache_path, cache)
+        for currency in missing:
+            if currency in fetched:
+                continue
+            for cached_day in sorted(cache, reverse=True):
+                if currency in cache[cached_day]:
+                    logger.warning("Using %s rate from %s", currency, cached_day)
+                    day_rates = {**day_rates, currency: cache[cached_day][currency]}
+                    break
+            else:
+                logger.error("No FX rate available for %s", currency)
+
+    rates.update({currency: float(day_rates[currency]) for currency in wanted if currency in day_rates})
+    return rates
+
+
+def convert_to_gbp(values: pd.Series, currencies: pd.Series, rates: Mapping[str, float]) -> pd.Series:
+    """Convert a whole value column to GBP using each row's currency."""
+    multipliers = currencies.map(rates)
+    unknown = currencies[multipliers.isna()]
+    if not unknown.empty:
+        raise ValueError(f"No FX rate for currencies: {', '.join(sorted(set(unknown)))}")
+    return values * multipliers.astype(float)
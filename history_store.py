@@ -0,0 +1,164 @@
+"""Long-format (Date, Fund, Value) history, partitioned by year.
+
+Each ``daily_totals-YYYY.csv`` partition holds one row per fund per day, with
+the portfolio total stored under the ``Total`` fund name. A new day's rows are
+appended to a byte copy of its year's partition; re-running a day re-parses
+and rewrites that partition. Either way a write costs O(one year of rows), not
+the whole history, and goes through a temp file and an atomic rename so a
+crash can't leave a torn file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+from collections.abc import Mapping
+import os
+from pathlib import Path
+import shutil
+
+import pandas as pd
+
+
+LONG_COLUMNS = ["Date", "Fund", "Value"]
+TOTAL_FUND = "Total"
+
+
+def partition_path(directory: Path, year: str) -> Path:
+    return Path(directory) / f"daily_totals-{year}.csv"
+
+
+def list_partitions(directory: Path) -> list[Path]:
+    return sorted(Path(directory).glob("daily_totals-[0-9][0-9][0-9][0-9].csv"))
+
+
+def last_recorded_date(path: Path) -> str | None:
+    """The first field of the last non-empty line of a date-ordered CSV, read from the end."""
+    with path.open("rb") as handle:
+        handle.seek(0, os.SEEK_END)
+        size = handle.tell()
+        start = max(0, size - 4096)
+        handle.seek(start)
+        tail = handle.read()
+    if start > 0:
+        # The read may begin inside a line, or inside a multi-byte character; drop that partial line.
+        tail = tail.partition(b"\n")[2]
+    lines = tail.decode("utf-8").splitlines()
+    for line in reversed(lines):
+        if line.strip():
+            date_str = next(csv.reader([line]))[0]
+            return None if date_str == "Date" else date_str
+    return None
+
+
+def _temp_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.tmp")
+
+
+def upsert_rows(path: Path, date_str: str, rows: list[tuple[object, ...]], columns: list[str]) -> Path:
+    """Write one day's rows into a date-ordered CSV, replacing any earlier rows for that day."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = _temp_path(path)
+    # A crashed earlier write can leave its temp file behind; never append to it.
+    tmp_path.unlink(missing_ok=True)
+
+    last_date = last_recorded_date(path) if path.exists() else None
+    if last_date is None or date_str > last_date:
+        # Newer than anything stored: copy the file's bytes as-is (no
+        # parsing) and append only today's rows to the copy.
+        if path.exists():
+            shutil.copyfile(path, tmp_path)
+        with tmp_path.open("a", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            if not path.exists() or path.stat().st_size == 0:
+                writer.writerow(columns)
+            writer.writerows(rows)
+    else:
+        existing = pd.read_csv(path, dtype={"Date": str, "Fund": str})
+        existing = existing[existing["Date"] != date_str]
+        existing = pd.concat([existing, pd.DataFrame(rows, columns=columns)], ignore_index=True)
+        existing.sort_values("Date", kind="stable").to_csv(tmp_path, index=False)
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def upsert_day(directory: Path, date_str: str, values: Mapping[str, float]) -> Path:
+    """Write one day's values into its year partition, replacing any earlier rows for that day."""
+    rows = [(date_str, fund, value) for fund, value in values.items() if pd.notna(value)]
+    return upsert_rows(partition_path(directory, date_str[:4]), date_str, rows, LONG_COLUMNS)
+
+
+def read_long_history(directory: Path, years: list[str] | None = None) -> pd.DataFrame:
+    paths = list_partitions(directory)
+    if years is not None:
+        paths = [path for path in paths if path.stem.rsplit("-", 1)[-1] in years]
+    frames = [pd.read_csv(path, dtype={"Date": str, "Fund": str}) for path in paths]
+    if not frames:
+        return pd.DataFrame(columns=LONG_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def wide_to_long(wide_df: pd.DataFrame) -> pd.DataFrame:
+    long_df = wide_df.melt(id_vars="Date", var_name="Fund", value_name="Value").dropna(subset=["Value"])
+    long_df["Date"] = long_df["Date"].astype(str)
+    # Keep each day's rows together, in the wide file's column order.
+    return long_df.sort_values("Date", kind="stable").reset_index(drop=True)[LONG_COLUMNS]
+
+
+def long_to_wide(long_df: pd.DataFrame) -> pd.DataFrame:
+    funds = [fund for fund in pd.unique(long_df["Fund"]) if fund != TOTAL_FUND]
+    wide_df = long_df.pivot_table(index="Date", columns="Fund", values="Value", aggfunc="last", sort=True)
+    wide_df = wide_df.reindex(columns=[TOTAL_FUND, *funds])
+    wide_df.columns.name = None
+    return wide_df.reset_index()
+
+
+def migrate_wide_csv(wide_path: Path, directory: Path) -> list[Path]:
+    """Split an existing wide daily_totals.csv into year partitions."""
+    long_df = wide_to_long(pd.read_csv(wide_path))
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    written = []
+    for year, partition in long_df.groupby(long_df["Date"].str[:4], sort=True):
+        path = partition_path(directory, year)
+        tmp_path = _temp_path(path)
+        partition.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        written.append(path)
+    return written
+
+
+def export_wide_csv(directory: Path, wide_path: Path) -> pd.DataFrame:
+    """Rebuild the wide daily_totals.csv layout from the partitions."""
+    wide_df = long_to_wide(read_long_history(directory))
+    wide_path = Path(wide_path)
+    wide_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = _temp_path(wide_path)
+    wide_df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, wide_path)
+    return wide_df
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert between wide and long daily history layouts.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="wide daily_totals.csv -> year partitions")
+    migrate.add_argument("wide_csv", type=Path)
+    migrate.add_argument("directory", type=Path)
+    export = subparsers.add_parser("export", help="year partitions -> wide daily_totals.csv")
+    export.add_argument("directory", type=Path)
+    export.add_argument("wide_csv", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        for path in migrate_wide_csv(args.wide_csv, args.directory):
+            print(path)
+    else:
+        export_wide_csv(args.directory, args.wide_csv)
+        print(args.wide_csv)
+
+
+if __name__ == "__main__":
+    main()
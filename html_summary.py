@@ -1,211 +1,148 @@
 from __future__ import annotations
 
+from collections.abc import Callable, Sequence
+from io import StringIO
+from pathlib import Path
+import shutil
+from typing import TYPE_CHECKING, TextIO
+
+import numpy as np
 import pandas as pd
-from persistence import load_previous_snapshot
+from persistence import HistoryStore, load_previous_snapshot
 
-def build_html_summary(
-    data: pd.DataFrame,
-    total: float,
-    today_str: str,
-    previous_total: float | None = None,
-    previous_by_fund: dict[str, float] | None = None,
-    elix_price_pence: float | None = None,
-    elix_change_pence: float | None = None,
-    elix_change_pct: float | None = None,
-) -> str:
-    # Convert index to column for display
-    df_display = data.reset_index().rename(columns={"index": "Fund/Share"})
+if TYPE_CHECKING:
+    from analytics import PortfolioAnalytics
+    from share_quotes import ShareQuote
 
-    # Day-over-day comparison: use the snapshot passed in by the caller, and
-    # only fall back to loading it ourselves when neither value was provided.
-    if previous_total is None and previous_by_fund is None:
-        previous_total, previous_by_fund = load_previous_snapshot(today_str, data.index.tolist())
-    if previous_by_fund is None:
-        previous_by_fund = {}
 
-    # Attach DoD Change and DoD % to the display dataframe
-    dod_changes = []
-    dod_pcts = []
-    for fund_name, row in data.iterrows():
-        curr_val = float(row.get('Total Holding Value', 0.0))
-        prev_val = previous_by_fund.get(fund_name)
-        if prev_val is None:
-            dod_changes.append(None)
-            dod_pcts.append(None)
-        else:
-            chg = curr_val - prev_val
-            pct = (chg / prev_val * 100.0) if prev_val else None
-            dod_changes.append(chg)
-            dod_pcts.append(pct)
-    df_display['DoD Change'] = dod_changes
-    df_display['DoD %'] = dod_pcts
-
-    # HTML table
-    # Format columns if present
-    formatters = {}
-    if "Total Holding Value" in df_display.columns:
-        formatters["Total Holding Value"] = lambda v: f"£{v:,.2f}" if pd.notna(v) else ""
-    if "Sell Price" in df_display.columns:
-        formatters["Sell Price"] = lambda v: f"£{v:,.2f}" if pd.notna(v) else ""
-    if "DoD Change" in df_display.columns:
-        formatters["DoD Change"] = lambda v: ("+" if v is not None and v >= 0 else "") + (f"£{v:,.2f}" if v is not None else "")
-    if "DoD %" in df_display.columns:
-        formatters["DoD %"] = lambda v: ("+" if v is not None and v >= 0 else "") + (f"{v:.2f}%" if v is not None else "")
-
-    table_html = df_display.to_html(index=False, border=0, classes="dataframe", escape=False, formatters=formatters)
-
-    # Build total badge safely (avoid complex f-string expressions)
-    total_badge = f"Total: £{total:,.2f}"
-    total_class = "total flat"
-    if previous_total is not None:
-        diff = total - previous_total
-        pct = None if previous_total == 0 else ((diff / previous_total) * 100.0)
-        sign = "+" if diff >= 0 else ""
-        pct_txt = f" ({'+' if (pct is not None and pct >= 0) else ''}{pct:.2f}%)" if pct is not None else ""
-        total_badge = (
-            f"Total: £{total:,.2f}  "
-            f"<span style=\"margin-left:8px; padding:4px 8px; border-radius:999px;\">"
-            f"{sign}£{diff:,.2f}{pct_txt}</span>"
-        )
-        if diff > 0:
-            total_class = "total up"
-        elif diff < 0:
-            total_class = "total down"
+STYLESHEET_NAME = "summary.css"
 
-    elix_badge = ""
-    if elix_price_pence is not None:
-        elix_change = ""
-        if elix_change_pence is not None:
-            elix_change = f" ({elix_change_pence:+.2f}p DoD"
-            if elix_change_pct is not None:
-                elix_change += f", {elix_change_pct:+.2f}%"
-            elix_change += ")"
-        elif elix_change_pct is not None:
-            elix_change = f" ({elix_change_pct:+.2f}% DoD)"
-        elix_badge = f'<div class="elix">LON:ELIX: {elix_price_pence:.2f}p{elix_change}</div>'
-
-    html=f"""
-    <html>
-    <head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width,initial-scale=1">
-    <style>
-        body {{ margin:0; padding:0; background:#0b1220; color:#e2e8f0; font-family:Arial,Helvetica,sans-serif; }}
-        .container {{ width:100%; margin:0; background:#111827; box-shadow:0 2px 12px rgba(0,0,0,.25); overflow:hidden; border:1px solid #1f2937; }}
-        .header {{ padding:16px 20px; border-bottom:1px solid #1f2937; }}
-        .title {{ margin:0; font-size:20px; color:#f8fafc; }}
-        .meta {{ margin-top:6px; font-size:12px; color:#94a3b8; }}
-        .total {{ margin:12px 20px 0; background:#0ea5e9; color:#00131a; font-weight:800; display:inline-block; padding:8px 12px; border-radius:999px; font-size:14px; }}
-        .total.up {{ background:#16a34a !important; }}
-        .total.down {{ background:#dc2626 !important; }}
-        .total.flat {{ background:#6b7280 !important; }}
-        .content {{ padding:16px 20px 24px; }}
-        .elix {{ margin:12px 20px 0; background:#1d4ed8; color:#dbeafe; font-weight:700; display:inline-block; padding:8px 12px; border-radius:999px; font-size:14px; }}
+SUMMARY_CSS = """        body { margin:0; padding:0; background:#0b1220; color:#e2e8f0; font-family:Arial,Helvetica,sans-serif; }
+        .container { width:100%; margin:0; background:#111827; box-shadow:0 2px 12px rgba(0,0,0,.25); overflow:hidden; border:1px solid #1f2937; }
+        .header { padding:16px 20px; border-bottom:1px solid #1f2937; }
+        .title { margin:0; font-size:20px; color:#f8fafc; }
+        .meta { margin-top:6px; font-size:12px; color:#94a3b8; }
+        .total { margin:12px 20px 0; background:#0ea5e9; color:#00131a; font-weight:800; display:inline-block; padding:8px 12px; border-radius:999px; font-size:14px; }
+        .total.up { background:#16a34a !important; }
+        .total.down { background:#dc2626 !important; }
+        .total.flat { background:#6b7280 !important; }
+        .content { padding:16px 20px 24px; }
+        .stale { margin-left:6px; padding:1px 6px; border-radius:999px; background:#b45309; color:#fff7ed; font-size:10px; font-weight:700; }
+        .quote { margin:12px 20px 0; background:#1d4ed8; color:#dbeafe; font-weight:700; display:inline-block; padding:8px 12px; border-radius:999px; font-size:14px; }
+        .analytics { margin:12px 20px 0; color:#cbd5e1; font-size:12px; }
         
         /* Mobile-first table styles */
-        table.dataframe {{ 
+        table.dataframe { 
             border-collapse:collapse; 
             width:100%; 
             font-size:12px;
-        }}
-        table.dataframe th, table.dataframe td {{ 
+        }
+        table.dataframe th, table.dataframe td { 
             border:1px solid #374151; 
             padding:8px 6px; 
             text-align:left; 
             color:#fff; 
             word-wrap:break-word;
             max-width:120px;
-        }}
-        table.dataframe thead th {{ 
+        }
+        table.dataframe thead th { 
             background:#0f172a; 
             color:#cbd5e1; 
             border-bottom:2px solid #64748b; 
             font-size:11px;
-        }}
-        table.dataframe tbody tr:nth-child(odd) {{ background:#0b1324; }}
-        a {{ color:#7dd3fc; }}
-        .footer {{ color:#64748b; font-size:11px; text-align:center; padding:12px; }}
+        }
+        table.dataframe tbody tr:nth-child(odd) { background:#0b1324; }
+        a { color:#7dd3fc; }
+        .footer { color:#64748b; font-size:11px; text-align:center; padding:12px; }
         
         /* Mobile-specific improvements */
-        @media (max-width: 768px) {{
-            .header {{ padding:12px 16px; }}
-            .title {{ font-size:18px; }}
-            .meta {{ font-size:11px; }}
-            .total {{ 
+        @media (max-width: 768px) {
+            .header { padding:12px 16px; }
+            .title { font-size:18px; }
+            .meta { font-size:11px; }
+            .total { 
                 margin:10px 16px 0; 
                 padding:6px 10px; 
                 font-size:13px;
                 display:block;
                 text-align:center;
-            }}
-            .content {{ padding:12px 16px 20px; }}
-            .elix {{
+            }
+            .content { padding:12px 16px 20px; }
+            .quote {
                 margin:10px 16px 0;
                 padding:6px 10px;
                 font-size:13px;
                 display:block;
                 text-align:center;
-            }}
+            }
             
             /* Make table scrollable horizontally on mobile */
-            .table-container {{
+            .table-container {
                 overflow-x:auto;
                 -webkit-overflow-scrolling:touch;
                 margin:0 -16px;
                 padding:0 16px;
-            }}
+            }
             
-            table.dataframe {{
+            table.dataframe {
                 font-size:11px;
                 min-width:500px; /* Ensure minimum width for readability */
-            }}
+            }
             
-            table.dataframe th, table.dataframe td {{
+            table.dataframe th, table.dataframe td {
                 padding:6px 4px;
                 font-size:10px;
-            }}
+            }
             
-            table.dataframe thead th {{
+            table.dataframe thead th {
                 font-size:10px;
-            }}
+            }
             
-            .footer {{
+            .footer {
                 font-size:10px;
                 padding:10px;
-            }}
-        }}
+            }
+        }
         
         /* Extra small screens */
-        @media (max-width: 480px) {{
-            .header {{ padding:10px 12px; }}
-            .title {{ font-size:16px; }}
-            .total {{
+        @media (max-width: 480px) {
+            .header { padding:10px 12px; }
+            .title { font-size:16px; }
+            .total {
                 margin:8px 12px 0;
                 padding:5px 8px;
                 font-size:12px;
-            }}
-            .content {{ padding:10px 12px 16px; }}
-            .elix {{
+            }
+            .content { padding:10px 12px 16px; }
+            .quote {
                 margin:8px 12px 0;
                 padding:5px 8px;
                 font-size:12px;
-            }}
+            }
             
-            table.dataframe {{
+            table.dataframe {
                 font-size:10px;
-            }}
+            }
             
-            table.dataframe th, table.dataframe td {{
+            table.dataframe th, table.dataframe td {
                 padding:4px 3px;
                 font-size:9px;
-            }}
+            }
             
-            table.dataframe thead th {{
+            table.dataframe thead th {
                 font-size:9px;
-            }}
-        }}
-    </style>
-    </head>
+            }
+        }
+"""
+
+_PAGE_HEAD = """
+    <html>
+    <head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width,initial-scale=1">
+"""
+
+_PAGE_BODY = """    </head>
     <body>
     <div class="container">
         <div class="header">
@@ -213,10 +150,12 @@ def build_html_summary(
         <div class="meta">{today_str}</div>
         </div>
         <div class="{total_class}">{total_badge}</div>
-        {elix_badge}
+        {quote_badges}
         <div class="content">
         <div class="table-container">
-        {table_html}
+        """
+
+_PAGE_FOOT = """
         </div>
         </div>
         <div class="footer">Automatic message • HL Price Update</div>
@@ -224,4 +163,248 @@ def build_html_summary(
     </body>
     </html>
     """
-    return html
+
+# The table markup DataFrame.to_html(index=False, classes="dataframe", escape=False) produced.
+_TABLE_HEAD = '<table class="dataframe dataframe">\n  <thead>\n    <tr style="text-align: right;">\n'
+_TABLE_BODY = "    </tr>\n  </thead>\n  <tbody>\n"
+_TABLE_FOOT = "  </tbody>\n</table>"
+_ROWS_PER_WRITE = 500
+
+
+def _cell_text(text: str) -> str:
+    return text.strip().replace("  ", "&nbsp;&nbsp;")
+
+
+_ESCAPES = str.maketrans({"\t": "\\t", "\r": "\\r", "\n": "\\n"})
+
+
+def _format_generic(column: pd.Series) -> list[str]:
+    """Format a column the way to_html does when it has no custom formatter."""
+    if column.empty:
+        return []
+    values = column.to_numpy(dtype=object)
+    if all(type(value) is str for value in values):
+        # Plain text only needs pandas' control-character escaping.
+        return [_cell_text(value.translate(_ESCAPES)) for value in values]
+    with pd.option_context("display.max_colwidth", None):
+        lines = column.reset_index(drop=True).to_string(index=False, header=False, na_rep="NaN").split("\n")
+    return [_cell_text(line) for line in lines]
+
+
+def _format_numbers(values: np.ndarray, template: str, signed: bool = False) -> list[str]:
+    """Format a float column with one str.format template, "NaN" where missing."""
+    missing = np.isnan(values)
+    fmt = template.format
+    cells = ["NaN" if is_missing else fmt(value) for value, is_missing in zip(values.tolist(), missing.tolist())]
+    if signed:
+        # The old lambdas prefixed "+" for zero and gains, and left "£-1.00" for losses.
+        cells = [f"+{cell}" if value >= 0 else cell for cell, value in zip(cells, values.tolist())]
+    return cells
+
+
+def _float_values(column: pd.Series) -> np.ndarray:
+    return pd.to_numeric(column, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _dod_cells(data: pd.DataFrame, previous_by_fund: dict[str, float]) -> tuple[list[str], list[str]]:
+    rows = len(data)
+    if "Total Holding Value" in data.columns:
+        current = _float_values(data["Total Holding Value"])
+    else:
+        current = np.zeros(rows)
+    previous = np.array([previous_by_fund.get(fund, np.nan) for fund in data.index], dtype=float)
+    has_previous = np.array([fund in previous_by_fund for fund in data.index], dtype=bool)
+    has_pct = has_previous & (previous != 0)
+    change = np.where(has_previous, current - previous, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(has_pct, change / previous * 100.0, np.nan)
+
+    # A column with no values at all was an all-None object column, shown as "None".
+    change_cells = _format_numbers(change, "£{:,.2f}", signed=True) if has_previous.any() else ["None"] * rows
+    pct_cells = _format_numbers(pct, "{:.2f}%", signed=True) if has_pct.any() else ["None"] * rows
+    return change_cells, pct_cells
+
+
+_MONEY_COLUMNS = ("Total Holding Value", "Sell Price")
+
+
+def _table_columns(
+    data: pd.DataFrame, previous_by_fund: dict[str, float], contributions: dict[str, float] | None = None
+) -> tuple[list[str], list[list[str]]]:
+    """Return the header labels and the formatted cells of every column, column by column."""
+    fund_label = data.index.name if data.index.name not in (None, "index") else "Fund/Share"
+    fund_names = pd.Series(data.index, dtype=object)
+    if "Stale" in data.columns:
+        # Holdings valued from history because today's page couldn't be fetched.
+        stale = data["Stale"].fillna(False).astype(bool).to_numpy()
+        fund_names = fund_names.where(~stale, fund_names.astype(str) + ' <span class="stale">stale</span>')
+
+    labels = [fund_label]
+    columns = [_format_generic(fund_names)]
+    for label in data.columns:
+        if label == "Stale":
+            continue
+        labels.append(label)
+        if label in _MONEY_COLUMNS:
+            columns.append(_format_numbers(_float_values(data[label]), "£{:,.2f}"))
+        else:
+            columns.append(_format_generic(data[label]))
+
+    change_cells, pct_cells = _dod_cells(data, previous_by_fund)
+    labels += ["DoD Change", "DoD %"]
+    columns += [change_cells, pct_cells]
+    if contributions is not None:
+        ytd = np.array([contributions.get(fund, np.nan) for fund in data.index], dtype=float)
+        labels.append("YTD Contribution")
+        columns.append(_format_numbers(ytd, "{:.2f}%", signed=True))
+    return labels, columns
+
+
+def _write_table(out: TextIO, labels: list[str], columns: list[list[str]]) -> None:
+    out.write(_TABLE_HEAD)
+    out.write("".join(f"      <th>{_cell_text(str(label))}</th>\n" for label in labels))
+    out.write(_TABLE_BODY)
+
+    # One precompiled row template, filled from the column lists in blocks.
+    row_template = "    <tr>\n" + "".join(f"      <td>{{{index}}}</td>\n" for index in range(len(columns))) + "    </tr>\n"
+    fill = row_template.format
+    rows = list(zip(*columns))
+    for start in range(0, len(rows), _ROWS_PER_WRITE):
+        out.write("".join(fill(*row) for row in rows[start:start + _ROWS_PER_WRITE]))
+    out.write(_TABLE_FOOT)
+
+
+def _total_badge(total: float, previous_total: float | None) -> tuple[str, str]:
+    total_badge = f"Total: £{total:,.2f}"
+    total_class = "total flat"
+    if previous_total is not None:
+        diff = total - previous_total
+        pct = None if previous_total == 0 else ((diff / previous_total) * 100.0)
+        sign = "+" if diff >= 0 else ""
+        pct_txt = f" ({'+' if (pct is not None and pct >= 0) else ''}{pct:.2f}%)" if pct is not None else ""
+        total_badge = (
+            f"Total: £{total:,.2f}  "
+            f"<span style=\"margin-left:8px; padding:4px 8px; border-radius:999px;\">"
+            f"{sign}£{diff:,.2f}{pct_txt}</span>"
+        )
+        if diff > 0:
+            total_class = "total up"
+        elif diff < 0:
+            total_class = "total down"
+    return total_badge, total_class
+
+
+def _badges(share_quotes: Sequence[ShareQuote], analytics: PortfolioAnalytics | None) -> str:
+    badges = [f'<div class="quote">{quote.describe()}</div>' for quote in share_quotes]
+    if analytics is not None:
+        badges.append(f'<div class="analytics">{analytics.describe()}</div>')
+    return "\n        ".join(badges)
+
+
+def render_html_summary(
+    out: TextIO,
+    data: pd.DataFrame,
+    total: float,
+    today_str: str,
+    previous_total: float | None = None,
+    previous_by_fund: dict[str, float] | None = None,
+    share_quotes: Sequence[ShareQuote] = (),
+    history: HistoryStore | None = None,
+    stylesheet_href: str | None = None,
+    analytics: PortfolioAnalytics | None = None,
+) -> None:
+    """Stream the summary page to ``out``.
+
+    With ``stylesheet_href`` the page links that stylesheet instead of
+    inlining SUMMARY_CSS; email needs the inline copy, the archive doesn't.
+    """
+    # Day-over-day comparison: use the snapshot passed in by the caller, and
+    # only fall back to loading it ourselves when neither value was provided.
+    if previous_total is None and previous_by_fund is None:
+        if history is not None:
+            previous_total, previous_by_fund = history.previous_snapshot(today_str, data.index.tolist())
+        else:
+            previous_total, previous_by_fund = load_previous_snapshot(today_str, data.index.tolist())
+    if previous_by_fund is None:
+        previous_by_fund = {}
+
+    contributions = None if analytics is None else analytics.contributions
+    labels, columns = _table_columns(data, previous_by_fund, contributions)
+    total_badge, total_class = _total_badge(total, previous_total)
+
+    out.write(_PAGE_HEAD)
+    if stylesheet_href is None:
+        out.write(f"    <style>\n{SUMMARY_CSS}    </style>\n")
+    else:
+        out.write(f'    <link rel="stylesheet" href="{stylesheet_href}">\n')
+    out.write(
+        _PAGE_BODY.format(
+            today_str=today_str,
+            total_class=total_class,
+            total_badge=total_badge,
+            quote_badges=_badges(share_quotes, analytics),
+        )
+    )
+    _write_table(out, labels, columns)
+    out.write(_PAGE_FOOT)
+
+
+def build_html_summary(
+    data: pd.DataFrame,
+    total: float,
+    today_str: str,
+    previous_total: float | None = None,
+    previous_by_fund: dict[str, float] | None = None,
+    share_quotes: Sequence[ShareQuote] = (),
+    history: HistoryStore | None = None,
+    stylesheet_href: str | None = None,
+    analytics: PortfolioAnalytics | None = None,
+) -> str:
+    out = StringIO()
+    render_html_summary(
+        out,
+        data,
+        total,
+        today_str,
+        previous_total=previous_total,
+        previous_by_fund=previous_by_fund,
+        share_quotes=share_quotes,
+        history=history,
+        stylesheet_href=stylesheet_href,
+        analytics=analytics,
+    )
+    return out.getvalue()
+
+
+def write_summary_pages(
+    render: Callable[[TextIO, str | None], None],
+    today_str: str,
+    output_dir: str = "summaries",
+    update_latest: bool = True,
+    link_stylesheet: bool = False,
+) -> None:
+    """Stream a summary page into the archive via ``render(out, stylesheet_href)``.
+
+    With ``link_stylesheet`` the page links a summary.css kept once per folder
+    instead of carrying its own copy of the CSS.
+    """
+    out_dir = Path(output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stylesheet_href = None
+    if link_stylesheet:
+        css_path = out_dir / STYLESHEET_NAME
+        if not css_path.exists() or css_path.read_text(encoding="utf-8") != SUMMARY_CSS:
+            css_path.write_text(SUMMARY_CSS, encoding="utf-8")
+        stylesheet_href = STYLESHEET_NAME
+
+    page_path = out_dir / f"daily_summary-{today_str}.html"
+    with page_path.open("w", encoding="utf-8") as out:
+        render(out, stylesheet_href)
+    if update_latest:
+        shutil.copyfile(page_path, out_dir / "latest.html")
+
+
+def write_summary_files(
+    html_summary: str, today_str: str, output_dir: str = "summaries", update_latest: bool = True
+) -> None:
+    write_summary_pages(lambda out, _: out.write(html_summary), today_str, output_dir, update_latest)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HttpSettings, get_http_settings
+
+
+_session: requests.Session | None = None
+_settings: HttpSettings | None = None
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ConnectionStats:
+    opened: int
+    reused: int
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide session, creating it on first use.
+
+    Every outbound call (HL pages, FX rates, ntfy) goes through this one
+    session so connections to the same host are kept alive and reused
+    instead of paying a fresh TCP+TLS handshake per request.
+    """
+    global _session, _settings
+    if _session is None:
+        with _lock:
+            if _session is None:
+                settings = get_http_settings()
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=settings.pool_hosts, pool_maxsize=settings.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["Accept-Encoding"] = "gzip, deflate"
+                _settings = settings
+                _session = session
+    return _session
+
+
+def reset_session() -> None:
+    global _session, _settings
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _settings = None
+
+
+def request(method: str, url: str, timeout: float | None = None, **kwargs) -> requests.Response:
+    session = get_session()
+    if timeout is None:
+        timeout = _settings.timeout if _settings is not None else get_http_settings().timeout
+    return session.request(method, url, timeout=timeout, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def get_connection_stats() -> ConnectionStats:
+    if _session is None:
+        return ConnectionStats(opened=0, reused=0)
+
+    opened = 0
+    requests_made = 0
+    seen: set[int] = set()
+    for adapter in _session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            requests_made += pool.num_requests
+    return ConnectionStats(opened=opened, reused=max(0, requests_made - opened))
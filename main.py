@@ -1,92 +1,362 @@
+"""Daily portfolio run and its lighter companion commands.
+
+    python main.py              # scrape, record history, render and notify ("run")
+    python main.py dry-run      # scrape and render, but write and send nothing
+    python main.py render       # re-render a day's summary from history, offline
+    python main.py resend       # send the last notification again
+    python main.py daemon       # poll through the day and alert on big moves
+
+pandas, requests, BeautifulSoup and yfinance are imported inside the
+commands that use them, so the light commands start without them.
+"""
+
 from __future__ import annotations
 
+import argparse
+from collections.abc import Sequence
+from dataclasses import asdict
 from datetime import date
+import json
 import logging
-import locale
 from pathlib import Path
+import signal
+import threading
+from typing import TYPE_CHECKING
+
+from config import (
+    configure_locale,
+    configure_logging,
+    get_debug_mode,
+    get_email_settings,
+    get_notify_timeout,
+    get_portfolios,
+    get_prometheus_textfile_enabled,
+    get_push_settings,
+    get_summary_stylesheet,
+)
+from metrics import RunMetrics, get_run_metrics, reset_run_metrics, write_json_report, write_prometheus_textfile
 
-from config import get_debug_mode, get_email_settings, get_push_settings
-from html_summary import build_html_summary
-from notifications import build_notification_subject, format_push_message, send_email_notification, send_push_notification
-from persistence import load_previous_snapshot, update_daily_totals
-from price_scraper import fetch_share_quote
-from pull_and_collate import create_data_frame
+if TYPE_CHECKING:
+    from notifications import Notifier
+    from portfolio_model import Valuation
+    from share_quotes import ShareQuote
 
 
 logger = logging.getLogger(__name__)
 
+LAST_NOTIFICATION = "last_notification.json"
+LAST_NOTIFICATION_HTML = "last_notification.html"
+
+
+def summary_dir(portfolio: str | None = None) -> Path:
+    return Path("summaries") if portfolio is None else Path("summaries") / portfolio
+
+
+def save_last_notification(output_dir: Path, today_str: str, subject: str, push_message: str, html_summary: str) -> None:
+    """Keep the notification about to be sent so ``resend`` can repeat it without a run."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / LAST_NOTIFICATION_HTML).write_text(html_summary, encoding="utf-8")
+    saved = {"date": today_str, "subject": subject, "push_message": push_message}
+    (output_dir / LAST_NOTIFICATION).write_text(json.dumps(saved, indent=2), encoding="utf-8")
+
+
+def report_portfolio(
+    valuation: Valuation,
+    today_str: str,
+    share_quotes: Sequence[ShareQuote] = (),
+    portfolio: str | None = None,
+    notifier: Notifier | None = None,
+    dry_run: bool = False,
+) -> None:
+    """Record history, render and notify for one portfolio.
+
+    A dry run does the same work in memory and prints the push message, but
+    leaves the history, the summary archive and every channel untouched.
+    """
+    from analytics import analytics_state_path, refresh_state, save_state
+    from html_summary import build_html_summary, render_html_summary, write_summary_files, write_summary_pages
+    from notifications import build_notification_subject, format_push_message
+    from persistence import HistoryStore
+    from price_ledger import ledger_dir, record_prices
+
+    metrics = get_run_metrics()
+    analytics_state = None
+
+    # One read of the history here and one write in the finally block; the
+    # update, snapshot lookup and report all work from memory in between.
+    with metrics.stage("history_load"):
+        history = HistoryStore.load(portfolio=portfolio)
+        history.load_frame()
+    try:
+        if valuation.failed_units:
+            _, last_values = history.previous_snapshot(today_str, list(valuation.failed_units))
+            valuation = valuation.with_stale(last_values)
+            metrics.increment("stale_funds", sum(valuation.stale))
+        total = valuation.total()
+        # History and the renderer work on frames; this is the only one built.
+        data = valuation.to_frame()
 
-def configure_logging(debug: bool) -> None:
-    level = logging.DEBUG if debug else logging.INFO
-    logging.basicConfig(level=level, format="%(levelname)s %(name)s: %(message)s")
+        with metrics.stage("history_update"):
+            history.record(data, total, today_str)
+        with metrics.stage("snapshot"):
+            previous_total, previous_by_fund = history.previous_snapshot(today_str, data.index.tolist())
+        with metrics.stage("analytics"):
+            analytics_state = refresh_state(
+                history, today_str, total, data["Total Holding Value"].to_dict(), analytics_state_path(portfolio)
+            )
+            analytics = analytics_state.summarise()
 
+        output_dir = summary_dir(portfolio)
+        with metrics.stage("render"):
+            render_kwargs = dict(
+                previous_total=previous_total,
+                previous_by_fund=previous_by_fund,
+                share_quotes=share_quotes,
+                history=history,
+                analytics=analytics,
+            )
+            # Email always gets the CSS inlined; the archive copy may link it.
+            html_summary = build_html_summary(data, total, today_str, **render_kwargs)
+            if not dry_run and get_summary_stylesheet() == "linked":
+                write_summary_pages(
+                    lambda out, href: render_html_summary(out, data, total, today_str, stylesheet_href=href, **render_kwargs),
+                    today_str,
+                    output_dir=str(output_dir),
+                    link_stylesheet=True,
+                )
+            elif not dry_run:
+                write_summary_files(html_summary, today_str, output_dir=str(output_dir))
 
-def configure_locale() -> None:
-    for loc in ("en_GB.UTF-8", "en_US.UTF-8", "C.UTF-8", "C"):
-        try:
-            locale.setlocale(locale.LC_ALL, loc)
-            logger.debug("Locale set to %s", loc)
+        subject = build_notification_subject(today_str)
+        if portfolio is not None:
+            subject = f"{subject} ({portfolio})"
+        push_message = format_push_message(total, previous_total, share_quotes, analytics)
+        if dry_run:
+            print(f"{subject}\n{push_message}")
             return
-        except locale.Error:
-            continue
-    logger.warning("Could not set locale, using system default")
+
+        save_last_notification(output_dir, today_str, subject, push_message, html_summary)
+        send_notification(subject, push_message, html_summary, notifier=notifier, portfolio=portfolio)
+    finally:
+        if not dry_run:
+            with metrics.stage("history_flush"):
+                history.flush()
+            # Saved only once the history holds the day it was updated from.
+            if analytics_state is not None:
+                save_state(analytics_state_path(portfolio), analytics_state)
+            try:
+                record_prices(ledger_dir(portfolio), today_str, valuation)
+            except Exception as exc:
+                # The ledger is a secondary record; losing a day of it mustn't fail the run.
+                logger.warning("Price ledger not updated: %s", exc)
+        logger.debug("History I/O: %s reads, %s writes", history.io.reads, history.io.writes)
+
+
+def send_notification(
+    subject: str,
+    push_message: str,
+    html_summary: str,
+    notifier: Notifier | None = None,
+    portfolio: str | None = None,
+) -> None:
+    metrics = get_run_metrics()
+    with metrics.stage("notify"):
+        if notifier is None:
+            with new_notifier() as own_notifier:
+                results = own_notifier.notify(subject, push_message, html_summary)
+        else:
+            results = notifier.notify(subject, push_message, html_summary)
+    for result in results:
+        logger.info("Notification %s: %s in %.2fs", result.channel, "sent" if result.ok else result.error, result.seconds)
+    metrics.extra.setdefault("notifications", []).extend({"portfolio": portfolio, **asdict(result)} for result in results)
+    failed = [result.channel for result in results if not result.ok]
+    if failed:
+        raise RuntimeError(f"Notification failed via {', '.join(failed)}")
+
+
+def new_notifier() -> Notifier:
+    from notifications import Notifier
+
+    return Notifier(get_push_settings(), get_email_settings(), timeout=get_notify_timeout())
 
 
-def write_summary_files(html_summary: str, today_str: str, output_dir: str = "summaries") -> None:
+def write_run_report(metrics: RunMetrics, today_str: str, output_dir: str = "summaries") -> dict[str, object]:
+    """Write the run's timings as JSON (and optionally a Prometheus textfile) next to the summaries."""
+    report = {"date": today_str, **metrics.report()}
     out_dir = Path(output_dir)
-    out_dir.mkdir(exist_ok=True)
-    (out_dir / f"daily_summary-{today_str}.html").write_text(html_summary, encoding="utf-8")
-    (out_dir / "latest.html").write_text(html_summary, encoding="utf-8")
+    write_json_report(report, out_dir / f"run_report-{today_str}.json")
+    if get_prometheus_textfile_enabled():
+        write_prometheus_textfile(report, out_dir / "hl_daily_prices.prom")
+    return report
 
 
-def main() -> None:
-    debug_mode = get_debug_mode()
-    configure_logging(debug_mode)
-    configure_locale()
+def run(today_str: str, debug_mode: bool, dry_run: bool = False) -> None:
+    from pull_and_collate import create_valuation, create_valuations
+    from share_quotes import fetch_watchlist_quotes
+
+    metrics = get_run_metrics()
+    portfolio_paths = get_portfolios()
+    if portfolio_paths:
+        portfolios, dedup_stats = create_valuations(portfolio_paths, debug=debug_mode)
+        logger.info(
+            "Scraped %s unique URLs for %s holdings across %s portfolios (%s requests saved)",
+            dedup_stats.unique_urls,
+            dedup_stats.holdings,
+            len(portfolio_paths),
+            dedup_stats.saved_requests,
+        )
+        metrics.extra["dedup"] = {"holdings": dedup_stats.holdings, "unique_urls": dedup_stats.unique_urls}
+    else:
+        portfolios = {None: create_valuation(debug=debug_mode)}
+
+    with metrics.stage("share_quotes"):
+        share_quotes = fetch_watchlist_quotes()
+    # One notifier for the run, so every portfolio's email shares one SMTP login.
+    with new_notifier() as notifier:
+        for portfolio, valuation in portfolios.items():
+            logger.debug("Final valuation for %s: %s", portfolio or "default portfolio", valuation)
+            try:
+                report_portfolio(valuation, today_str, share_quotes, portfolio=portfolio, notifier=notifier, dry_run=dry_run)
+            except Exception:
+                # One portfolio's failure shouldn't stop the others; re-raise when
+                # it's the only one so single-portfolio runs still fail loudly.
+                if len(portfolios) == 1:
+                    raise
+                logger.exception("Reporting failed for portfolio %s", portfolio)
+                metrics.increment("portfolio_failures")
+
 
-    data = create_data_frame(debug=debug_mode)
-    logger.debug("Final dataframe:\n%s", data)
-    total = float(data["Total Holding Value"].sum())
-    today_str = date.today().isoformat()
+def full_run(today_str: str, debug_mode: bool, dry_run: bool = False) -> None:
+    """The daily job: ``run`` inside a fresh fetch budget, then the run report.
 
-    update_daily_totals(data, total, today_str)
-    previous_total, previous_by_fund = load_previous_snapshot(today_str, data.index.tolist())
-    elix_price_pence = None
-    elix_change_pence = None
-    elix_change_pct = None
+    A dry run logs the report instead of writing it.
+    """
+    from fetch_policy import start_run_budget
+    from http_client import get_connection_stats
+    from page_cache import finalise_page_cache
+
+    metrics = reset_run_metrics()
+    start_run_budget()
+
+    status = "failed"
     try:
-        elix_quote = fetch_share_quote("ELIX.L")
-        elix_price_pence = float(elix_quote["price_pence"])
-        if elix_quote["change_pence"] is not None:
-            elix_change_pence = float(elix_quote["change_pence"])
-        if elix_quote["change_pct"] is not None:
-            elix_change_pct = float(elix_quote["change_pct"])
-    except Exception as exc:
-        logger.warning("Could not fetch ELIX quote: %s", exc)
-
-    html_summary = build_html_summary(
-        data,
-        total,
-        today_str,
-        previous_total=previous_total,
-        previous_by_fund=previous_by_fund,
-        elix_price_pence=elix_price_pence,
-        elix_change_pence=elix_change_pence,
-        elix_change_pct=elix_change_pct,
-    )
-    write_summary_files(html_summary, today_str)
-
-    subject = build_notification_subject(today_str)
-    push_message = format_push_message(
-        total,
-        previous_total,
-        elix_price_pence=elix_price_pence,
-        elix_change_pence=elix_change_pence,
-        elix_change_pct=elix_change_pct,
+        run(today_str, debug_mode, dry_run=dry_run)
+        status = "ok"
+    finally:
+        connection_stats = get_connection_stats()
+        logger.info("HTTP connections: %s opened, %s reused", connection_stats.opened, connection_stats.reused)
+        metrics.extra["connections"] = {"opened": connection_stats.opened, "reused": connection_stats.reused}
+        cache_stats = finalise_page_cache()
+        if cache_stats is not None:
+            logger.info(
+                "Page cache: %s not modified, %s downloaded, parse %s hits/%s misses, %s evicted",
+                cache_stats.not_modified,
+                cache_stats.downloaded,
+                cache_stats.parse_hits,
+                cache_stats.parse_misses,
+                cache_stats.evicted,
+            )
+            metrics.extra["page_cache"] = asdict(cache_stats)
+        metrics.extra["status"] = status
+
+        report = {"date": today_str, **metrics.report()} if dry_run else write_run_report(metrics, today_str)
+        fetch = report["fetch"]
+        logger.info(
+            "Run %s in %.2fs: %s fetches (%s failed, %s bytes), p50 %s, p95 %s",
+            status,
+            report["duration_seconds"],
+            fetch["count"],
+            fetch["failures"],
+            fetch["bytes"],
+            _format_seconds(fetch["p50_seconds"]),
+            _format_seconds(fetch["p95_seconds"]),
+        )
+
+
+def render_summary(date_str: str | None = None, portfolio: str | None = None) -> str:
+    """Re-render one day's summary (the latest by default) from history, without network access."""
+    from backfill import history_with_previous, render_day
+    from html_summary import write_summary_pages
+    from persistence import HistoryStore
+
+    values, previous = history_with_previous(HistoryStore.load(portfolio=portfolio).frame)
+    values = values[values["Total"].notna()]
+    if values.empty:
+        raise SystemExit("No history recorded yet; run the full job first.")
+    date_str = date_str or values.index[-1]
+    if date_str not in values.index:
+        raise SystemExit(f"No history recorded for {date_str}")
+
+    output_dir = summary_dir(portfolio)
+    write_summary_pages(
+        lambda out, href: out.write(render_day(date_str, values.loc[date_str], previous.loc[date_str], href)),
+        date_str,
+        output_dir=str(output_dir),
+        update_latest=date_str == values.index[-1],
+        link_stylesheet=get_summary_stylesheet() == "linked",
     )
+    logger.info("Rendered %s into %s", date_str, output_dir)
+    return date_str
+
+
+def resend_last_notification(portfolio: str | None = None) -> None:
+    """Send the last saved notification again; nothing is scraped or rendered."""
+    output_dir = summary_dir(portfolio)
+    try:
+        saved = json.loads((output_dir / LAST_NOTIFICATION).read_text(encoding="utf-8"))
+        html_summary = (output_dir / LAST_NOTIFICATION_HTML).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        raise SystemExit(f"No saved notification in {output_dir}; run the full job first.") from None
+    send_notification(saved["subject"], saved["push_message"], html_summary, portfolio=portfolio)
+    logger.info("Re-sent the notification from %s", saved["date"])
+
+
+def run_intraday_daemon() -> None:
+    from daemon import run_daemon
 
-    send_push_notification(get_push_settings(), subject, push_message)
-    send_email_notification(get_email_settings(), subject, html_summary)
+    stop = threading.Event()
+    # systemd and docker stop with SIGTERM; finish the current poll and exit cleanly.
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        run_daemon(stop)
+    except KeyboardInterrupt:
+        pass
+
+
+def _format_seconds(value: float | None) -> str:
+    return "n/a" if value is None else f"{value * 1000:.0f}ms"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Scrape HL fund prices, record history and send the daily summary.")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.add_parser("run", help="scrape, record history, render and notify (the default)")
+    commands.add_parser("dry-run", help="scrape and render, but write no files and send nothing")
+    render = commands.add_parser("render", help="re-render a summary from stored history, offline")
+    render.add_argument("--date", help="day to render (YYYY-MM-DD), defaults to the latest in history")
+    render.add_argument("--portfolio", help="portfolio name from PORTFOLIOS")
+    resend = commands.add_parser("resend", help="send the last notification again")
+    resend.add_argument("--portfolio", help="portfolio name from PORTFOLIOS")
+    commands.add_parser("daemon", help="poll prices through the day and push alerts on big moves")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    debug_mode = get_debug_mode()
+    configure_logging(debug_mode)
+
+    if args.command == "resend":
+        resend_last_notification(args.portfolio)
+        return
+
+    configure_locale()
+    if args.command == "render":
+        render_summary(args.date, args.portfolio)
+    elif args.command == "daemon":
+        run_intraday_daemon()
+    else:
+        full_run(date.today().isoformat(), debug_mode, dry_run=args.command == "dry-run")
 
 
 if __name__ == "__main__":
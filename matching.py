@@ -0,0 +1,226 @@
+"""Resolve scraped page titles to holdings without relying on the URL.
+
+The index is built once per units.csv from each fund's normalised key: its
+word tokens, adjacent-token bigrams and share-class markers (acc/inc, class
+letter). Features are weighted by how rare they are across the holdings, and
+a title is only scored against the holdings that share one of its rarest
+tokens, so a lookup doesn't scan the whole file. The built index is cached
+as JSON at MATCH_INDEX_PATH, keyed by the units file's path and mtime.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+import json
+import math
+import os
+from pathlib import Path
+import re
+
+from config import MatchSettings, get_match_settings
+from portfolio_model import Holding
+from utilities import improved_normalise_key
+
+
+INDEX_VERSION = 1
+# Candidates come from the postings of this many of a title's rarest tokens.
+CANDIDATE_TOKENS = 3
+# A title naming the other share class of a fund (acc vs inc, class B vs C).
+CLASS_CONFLICT_PENALTY = 0.5
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_SHARE_CLASS = {
+    "acc": "acc",
+    "accumulation": "acc",
+    "accumulating": "acc",
+    "inc": "inc",
+    "income": "inc",
+    "dist": "inc",
+    "distribution": "inc",
+    "distributing": "inc",
+}
+_NOISE = frozenset({"the", "and", "of", "plc", "ltd", "gbp", "usd", "eur"})
+
+
+@dataclass(frozen=True)
+class Match:
+    fund: str
+    score: float
+    method: str
+
+
+def title_features(text: str) -> tuple[list[str], list[str]]:
+    """Split a fund name or page title into (tokens and bigrams, share-class markers)."""
+    words = _TOKEN_PATTERN.findall(improved_normalise_key(text))
+    tokens: list[str] = []
+    classes: set[str] = set()
+    skip_next = False
+    for position, word in enumerate(words):
+        following = words[position + 1] if position + 1 < len(words) else None
+        if skip_next:
+            skip_next = False
+        elif word in _SHARE_CLASS:
+            classes.add(_SHARE_CLASS[word])
+        elif word == "class" and following is not None:
+            classes.add(f"class-{following}")
+            skip_next = True
+        elif len(word) == 1 and word.isalpha() and (following is None or following in _SHARE_CLASS):
+            # HL names often carry a bare class letter ("Fund I Acc").
+            classes.add(f"class-{word}")
+        elif word not in _NOISE:
+            tokens.append(word)
+    bigrams = [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    return list(dict.fromkeys(tokens + bigrams)), sorted(classes)
+
+
+def _conflicts(left: Iterable[str], right: Iterable[str]) -> bool:
+    """True when both sides name an acc/inc type, or a class letter, and they differ."""
+    for is_kind in (lambda marker: marker in ("acc", "inc"), lambda marker: marker.startswith("class-")):
+        left_kind = {marker for marker in left if is_kind(marker)}
+        right_kind = {marker for marker in right if is_kind(marker)}
+        if left_kind and right_kind and left_kind.isdisjoint(right_kind):
+            return True
+    return False
+
+
+class HoldingIndex:
+    """Exact keys, weighted n-gram features and token postings for one set of holdings."""
+
+    def __init__(
+        self,
+        funds: list[str],
+        keys: list[str],
+        features: list[list[str]],
+        classes: list[list[str]],
+    ) -> None:
+        self.funds = funds
+        self.keys = keys
+        self.features = features
+        self.classes = classes
+        self._by_key = {key: position for position, key in reversed(list(enumerate(keys)))}
+        self._by_fund = {fund: position for position, fund in enumerate(funds)}
+        document_frequency: dict[str, int] = {}
+        self.postings: dict[str, list[int]] = {}
+        for position, fund_features in enumerate(features):
+            for feature in fund_features:
+                document_frequency[feature] = document_frequency.get(feature, 0) + 1
+                if " " not in feature:
+                    self.postings.setdefault(feature, []).append(position)
+        count = len(funds)
+        self._unseen_weight = math.log(count + 1) + 1.0
+        self.weights = {
+            feature: math.log((count + 1) / (frequency + 1)) + 1.0 for feature, frequency in document_frequency.items()
+        }
+        self._norms = [sum(self.weights[feature] for feature in fund_features) for fund_features in features]
+
+    @classmethod
+    def build(cls, holdings: Iterable[Holding]) -> HoldingIndex:
+        # One entry per fund; a fund held in several accounts is still one fund.
+        unique = {holding.fund: holding for holding in holdings}
+        funds, keys, features, classes = [], [], [], []
+        for fund, holding in unique.items():
+            fund_features, fund_classes = title_features(fund)
+            funds.append(fund)
+            keys.append(holding.key)
+            features.append(fund_features)
+            classes.append(fund_classes)
+        return cls(funds, keys, features, classes)
+
+    def to_dict(self) -> dict[str, object]:
+        return {"funds": self.funds, "keys": self.keys, "features": self.features, "classes": self.classes}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, list]) -> HoldingIndex:
+        return cls(data["funds"], data["keys"], data["features"], data["classes"])
+
+    def _weight(self, feature: str) -> float:
+        return self.weights.get(feature, self._unseen_weight)
+
+    def candidates(self, tokens: Iterable[str]) -> set[int]:
+        known = sorted((len(self.postings[token]), token) for token in tokens if token in self.postings)
+        found: set[int] = set()
+        for _, token in known[:CANDIDATE_TOKENS]:
+            found.update(self.postings[token])
+        return found
+
+    def _score(self, position: int, features: list[str], classes: list[str], query_norm: float) -> float:
+        shared = set(features).intersection(self.features[position])
+        score = 2 * sum(self.weights[feature] for feature in shared) / (query_norm + self._norms[position])
+        if _conflicts(classes, self.classes[position]):
+            score *= CLASS_CONFLICT_PENALTY
+        return score
+
+    def resolve(self, title: str, min_score: float = 0.0) -> Match | None:
+        """The holding a title most likely names, scored 0-1, or None below ``min_score``.
+
+        An identical normalised key scores 1.0. Otherwise the score is the
+        weighted Dice overlap of the two feature sets, halved when the title
+        names a different share class than the holding.
+        """
+        if not title:
+            return None
+        position = self._by_key.get(improved_normalise_key(title))
+        if position is not None:
+            return Match(self.funds[position], 1.0, "exact")
+
+        features, classes = title_features(title)
+        query_norm = sum(self._weight(feature) for feature in features)
+        best: tuple[float, int] | None = None
+        for position in sorted(self.candidates(feature for feature in features if " " not in feature)):
+            score = self._score(position, features, classes, query_norm)
+            if best is None or score > best[0]:
+                best = (score, position)
+        if best is None or best[0] < min_score:
+            return None
+        return Match(self.funds[best[1]], round(best[0], 4), "tokens")
+
+    def score(self, title: str, fund: str) -> float:
+        """How well ``title`` names ``fund`` on resolve()'s 0-1 scale; 0.0 for a fund not in the index."""
+        position = self._by_fund.get(fund)
+        if position is None or not title:
+            return 0.0
+        if improved_normalise_key(title) == self.keys[position]:
+            return 1.0
+        features, classes = title_features(title)
+        query_norm = sum(self._weight(feature) for feature in features)
+        return round(self._score(position, features, classes, query_norm), 4)
+
+
+def _load_cache(path: Path) -> dict[str, dict]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+        return {}
+    return data.get("indexes", {})
+
+
+def _save_cache(path: Path, indexes: dict[str, dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps({"version": INDEX_VERSION, "indexes": indexes}), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def load_holding_index(
+    units_path: Path, holdings: Iterable[Holding], settings: MatchSettings | None = None
+) -> HoldingIndex:
+    """The index for ``units_path``, rebuilt from ``holdings`` only when the file's mtime changed."""
+    settings = settings or get_match_settings()
+    cache_path = Path(settings.cache_path)
+    units_path = Path(units_path).resolve()
+    mtime_ns = units_path.stat().st_mtime_ns
+
+    indexes = _load_cache(cache_path)
+    cached = indexes.get(str(units_path))
+    if cached and cached.get("mtime_ns") == mtime_ns:
+        return HoldingIndex.from_dict(cached)
+
+    index = HoldingIndex.build(holdings)
+    # Drop entries for holdings files that no longer exist.
+    indexes = {path: entry for path, entry in indexes.items() if Path(path).exists()}
+    indexes[str(units_path)] = {"mtime_ns": mtime_ns, **index.to_dict()}
+    _save_cache(cache_path, indexes)
+    return index
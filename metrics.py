@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+import json
+import math
+import os
+from pathlib import Path
+import threading
+import time
+
+
+@dataclass
+class FetchSample:
+    url: str
+    seconds: float
+    bytes: int
+    status: int | None
+    retries: int = 0
+    ok: bool = True
+    hedged: bool = False
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class RunMetrics:
+    """Timings and counters for one run, safe to update from scrape workers."""
+
+    started_at: float = field(default_factory=time.time)
+    stages: dict[str, float] = field(default_factory=dict)
+    fetches: list[FetchSample] = field(default_factory=list)
+    parse_seconds: list[float] = field(default_factory=list)
+    attempt_seconds: list[float] = field(default_factory=list)
+    counters: dict[str, int] = field(default_factory=dict)
+    extra: dict[str, object] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def record_fetch(self, sample: FetchSample) -> None:
+        with self._lock:
+            self.fetches.append(sample)
+
+    def record_parse(self, seconds: float) -> None:
+        with self._lock:
+            self.parse_seconds.append(seconds)
+
+    def record_attempt(self, seconds: float) -> None:
+        with self._lock:
+            self.attempt_seconds.append(seconds)
+
+    def fetch_latency_percentile(self, pct: float, min_samples: int = 1) -> float | None:
+        """Percentile of single-request latencies so far (no retries or backoff), once there are enough samples."""
+        with self._lock:
+            latencies = list(self.attempt_seconds)
+        if len(latencies) < min_samples:
+            return None
+        return percentile(latencies, pct)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self) -> dict[str, object]:
+        with self._lock:
+            fetches = list(self.fetches)
+            parses = list(self.parse_seconds)
+            stages = dict(self.stages)
+            counters = dict(self.counters)
+        latencies = [sample.seconds for sample in fetches]
+        return {
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec="seconds"),
+            "duration_seconds": time.time() - self.started_at,
+            "stages": stages,
+            "fetch": {
+                "count": len(fetches),
+                "failures": sum(not sample.ok for sample in fetches),
+                "retries": sum(sample.retries for sample in fetches),
+                "hedged": sum(sample.hedged for sample in fetches),
+                "bytes": sum(sample.bytes for sample in fetches),
+                "seconds_total": sum(latencies),
+                "p50_seconds": percentile(latencies, 50),
+                "p95_seconds": percentile(latencies, 95),
+                "max_seconds": max(latencies, default=None),
+            },
+            "parse": {
+                "count": len(parses),
+                "seconds_total": sum(parses),
+                "p50_seconds": percentile(parses, 50),
+                "p95_seconds": percentile(parses, 95),
+            },
+            "counters": counters,
+            **self.extra,
+            "funds": [asdict(sample) for sample in fetches],
+        }
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def write_json_report(report: dict[str, object], path: Path) -> None:
+    _write_atomic(path, json.dumps(report, indent=2, default=str))
+
+
+def prometheus_text(report: dict[str, object]) -> str:
+    lines = [
+        "# HELP hl_run_duration_seconds Wall time of the whole run.",
+        "# TYPE hl_run_duration_seconds gauge",
+        f"hl_run_duration_seconds {report['duration_seconds']:.6f}",
+        "# HELP hl_run_timestamp_seconds When the run finished.",
+        "# TYPE hl_run_timestamp_seconds gauge",
+        f"hl_run_timestamp_seconds {time.time():.0f}",
+        "# HELP hl_stage_duration_seconds Wall time per pipeline stage.",
+        "# TYPE hl_stage_duration_seconds gauge",
+    ]
+    for stage, seconds in report["stages"].items():
+        lines.append(f'hl_stage_duration_seconds{{stage="{stage}"}} {seconds:.6f}')
+
+    fetch = report["fetch"]
+    lines += [
+        "# HELP hl_fetch_latency_seconds Per-fund page fetch latency.",
+        "# TYPE hl_fetch_latency_seconds summary",
+    ]
+    for quantile, key in (("0.5", "p50_seconds"), ("0.95", "p95_seconds")):
+        if fetch[key] is not None:
+            lines.append(f'hl_fetch_latency_seconds{{quantile="{quantile}"}} {fetch[key]:.6f}')
+    lines += [
+        f"hl_fetch_latency_seconds_sum {fetch['seconds_total']:.6f}",
+        f"hl_fetch_latency_seconds_count {fetch['count']}",
+        "# HELP hl_fetch_bytes_total Bytes downloaded for fund pages.",
+        "# TYPE hl_fetch_bytes_total counter",
+        f"hl_fetch_bytes_total {fetch['bytes']}",
+        "# HELP hl_fetch_failures_total Fund page fetches that failed.",
+        "# TYPE hl_fetch_failures_total counter",
+        f"hl_fetch_failures_total {fetch['failures']}",
+        "# HELP hl_fetch_retries_total Fund page fetch retries.",
+        "# TYPE hl_fetch_retries_total counter",
+        f"hl_fetch_retries_total {fetch['retries']}",
+        "# HELP hl_fetch_hedged_total Fund page fetches that sent a hedged duplicate.",
+        "# TYPE hl_fetch_hedged_total counter",
+        f"hl_fetch_hedged_total {fetch['hedged']}",
+    ]
+    for name, value in report.get("counters", {}).items():
+        lines += [f"# TYPE hl_{name}_total counter", f"hl_{name}_total {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_textfile(report: dict[str, object], path: Path) -> None:
+    # Written via rename so the node_exporter textfile collector never sees a partial file.
+    _write_atomic(path, prometheus_text(report))
+
+
+_metrics = RunMetrics()
+
+
+def get_run_metrics() -> RunMetrics:
+    return _metrics
+
+
+def reset_run_metrics() -> RunMetrics:
+    global _metrics
+    _metrics = RunMetrics()
+    return _metrics
@@ -1,16 +1,26 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from email.mime.text import MIMEText
 import logging
 import smtplib
+import threading
+import time
+from typing import TYPE_CHECKING
 
-import requests
+from config import EmailSettings, PushSettings, get_http_settings
 
-from config import EmailSettings, PushSettings
+if TYPE_CHECKING:
+    from analytics import PortfolioAnalytics
+    from share_quotes import ShareQuote
 
 
 logger = logging.getLogger(__name__)
 
+PUSH_TIMEOUT = 15
+
 
 def build_notification_subject(today_str: str) -> str:
     return f"Daily Portfolio Summary - {today_str}"
@@ -19,39 +29,36 @@ def build_notification_subject(today_str: str) -> str:
 def format_push_message(
     total: float,
     previous_total: float | None,
-    elix_price_pence: float | None = None,
-    elix_change_pence: float | None = None,
-    elix_change_pct: float | None = None,
+    share_quotes: Sequence[ShareQuote] = (),
+    analytics: PortfolioAnalytics | None = None,
 ) -> str:
     message = f"Portfolio total: GBP {total:,.2f}"
-    if previous_total is None:
-        base_message = message
-    else:
+    if previous_total is not None:
         diff = total - previous_total
         if previous_total == 0:
-            base_message = f"{message} ({diff:+,.2f})"
+            message = f"{message} ({diff:+,.2f})"
         else:
             pct = (diff / previous_total) * 100.0
-            base_message = f"{message} ({diff:+,.2f}, {pct:+.2f}%)"
-
-    if elix_price_pence is None:
-        return base_message
-
-    change_text = ""
-    if elix_change_pence is not None:
-        change_text = f" ({elix_change_pence:+.2f}p DoD"
-        if elix_change_pct is not None:
-            change_text += f", {elix_change_pct:+.2f}%"
-        change_text += ")"
-    elif elix_change_pct is not None:
-        change_text = f" ({elix_change_pct:+.2f}% DoD)"
-    return f"{base_message}\nLON:ELIX: {elix_price_pence:.2f}p{change_text}"
+            message = f"{message} ({diff:+,.2f}, {pct:+.2f}%)"
+    lines = [message, *(quote.describe() for quote in share_quotes)]
+    if analytics is not None:
+        lines.append(analytics.describe())
+        top = analytics.top_contributors()
+        if top:
+            lines.append("YTD contributors: " + ", ".join(f"{fund} {pct:+.2f}%" for fund, pct in top))
+    return "\n".join(lines)
 
 
 def send_push_notification(settings: PushSettings, subject: str, message: str, click_url: str | None = None) -> None:
     if not settings.enabled:
         logger.debug("Push notification skipped because no topic is configured")
         return
+    for topic in settings.topics:
+        _post_push(settings, topic, subject, message, click_url)
+
+
+def _post_push(settings: PushSettings, topic: str, subject: str, message: str, click_url: str | None = None) -> None:
+    import http_client
 
     headers = {
         "Title": subject,
@@ -63,20 +70,17 @@ def send_push_notification(settings: PushSettings, subject: str, message: str, c
     if settings.token:
         headers["Authorization"] = f"Bearer {settings.token}"
 
-    response = requests.post(
-        f"{settings.base_url.rstrip('/')}/{settings.topic}",
+    response = http_client.post(
+        f"{settings.base_url.rstrip('/')}/{topic}",
         data=message.encode("utf-8"),
         headers=headers,
-        timeout=15,
+        # ntfy keeps its own shorter timeout rather than HTTP_TIMEOUT.
+        timeout=PUSH_TIMEOUT,
     )
     response.raise_for_status()
 
 
-def send_email_notification(settings: EmailSettings, subject: str, html_body: str) -> None:
-    if not settings.enabled:
-        logger.debug("Email notification skipped because SMTP is not configured")
-        return
-
+def _check_email_settings(settings: EmailSettings) -> None:
     missing = [
         name
         for name, value in {
@@ -91,15 +95,162 @@ def send_email_notification(settings: EmailSettings, subject: str, html_body: st
     if missing:
         raise RuntimeError(f"Missing SMTP env vars: {', '.join(missing)}")
 
+
+def _build_email(settings: EmailSettings, subject: str, html_body: str) -> MIMEText:
     recipients = list(settings.recipients) if settings.recipients else [settings.sender]
     msg = MIMEText(html_body, "html", "utf-8")
     msg["Subject"] = subject
     msg["From"] = settings.sender
     msg["To"] = ", ".join(recipients)
+    return msg
+
+
+class SmtpConnection:
+    """One authenticated SMTP session, opened on first send and reused until close()."""
+
+    def __init__(self, settings: EmailSettings, timeout: float | None = None) -> None:
+        self.settings = settings
+        self.timeout = timeout if timeout is not None else get_http_settings().timeout
+        self._smtp: smtplib.SMTP | None = None
+        self._lock = threading.Lock()
+        self.logins = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.settings.host, int(self.settings.port), timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.settings.starttls:
+                smtp.starttls()
+                smtp.ehlo()
+            smtp.login(self.settings.user, self.settings.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.logins += 1
+        return smtp
+
+    def send(self, msg: MIMEText) -> None:
+        with self._lock:
+            if self._smtp is None:
+                self._smtp = self._connect()
+                self._smtp.send_message(msg)
+                return
+            try:
+                self._smtp.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # The server dropped an idle session; log in again once.
+                self._smtp = self._connect()
+                self._smtp.send_message(msg)
+
+    def close(self) -> None:
+        """End the session without waiting on a send that's still in flight.
+
+        A hung send holds the lock, so its socket is closed under it instead;
+        the send then fails rather than running out its timeout.
+        """
+        if not self._lock.acquire(blocking=False):
+            smtp = self._smtp
+            if smtp is not None:
+                smtp.close()
+            return
+        try:
+            if self._smtp is None:
+                return
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self._smtp.close()
+            self._smtp = None
+        finally:
+            self._lock.release()
+
+
+def send_email_notification(
+    settings: EmailSettings, subject: str, html_body: str, connection: SmtpConnection | None = None
+) -> None:
+    if not settings.enabled:
+        logger.debug("Email notification skipped because SMTP is not configured")
+        return
+
+    _check_email_settings(settings)
+    msg = _build_email(settings, subject, html_body)
+    if connection is not None:
+        connection.send(msg)
+        return
+
+    smtp_connection = SmtpConnection(settings)
+    try:
+        smtp_connection.send(msg)
+    finally:
+        smtp_connection.close()
+
+
+@dataclass(frozen=True)
+class ChannelResult:
+    channel: str
+    ok: bool
+    seconds: float
+    error: str | None = None
+
+
+class Notifier:
+    """Fans each notification out to every push topic and email at once.
+
+    Channels run on their own threads, so a slow ntfy server or SMTP relay
+    can't hold up the others; notify() waits up to ``timeout`` seconds and
+    reports anything still running as timed out. One SMTP session is kept
+    open across every email sent through the notifier until close().
+    """
+
+    def __init__(self, push_settings: PushSettings, email_settings: EmailSettings, timeout: float = 60.0) -> None:
+        self.push_settings = push_settings
+        self.email_settings = email_settings
+        self.timeout = timeout
+        self._smtp = SmtpConnection(email_settings)
+        self._executor = ThreadPoolExecutor(max_workers=len(push_settings.topics) + 1, thread_name_prefix="notify")
+
+    def __enter__(self) -> "Notifier":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _timed(self, channel: str, send) -> ChannelResult:
+        start = time.perf_counter()
+        try:
+            send()
+        except Exception as exc:
+            logger.warning("Notification via %s failed: %s", channel, exc)
+            return ChannelResult(channel, False, time.perf_counter() - start, str(exc))
+        return ChannelResult(channel, True, time.perf_counter() - start)
+
+    def notify(self, subject: str, push_message: str, html_body: str, click_url: str | None = None) -> list[ChannelResult]:
+        futures: dict[str, Future] = {}
+        if self.push_settings.enabled:
+            for topic in self.push_settings.topics:
+                futures[f"ntfy:{topic}"] = self._executor.submit(
+                    self._timed, f"ntfy:{topic}", lambda topic=topic: _post_push(self.push_settings, topic, subject, push_message, click_url)
+                )
+        else:
+            logger.debug("Push notification skipped because no topic is configured")
+        if self.email_settings.enabled:
+            futures["email"] = self._executor.submit(
+                self._timed, "email", lambda: send_email_notification(self.email_settings, subject, html_body, connection=self._smtp)
+            )
+        else:
+            logger.debug("Email notification skipped because SMTP is not configured")
+
+        wait(futures.values(), timeout=self.timeout)
+        results = []
+        for channel, future in futures.items():
+            if future.done():
+                results.append(future.result())
+            else:
+                logger.warning("Notification via %s still running after %.0fs", channel, self.timeout)
+                results.append(ChannelResult(channel, False, self.timeout, "timed out"))
+        return results
 
-    with smtplib.SMTP(settings.host, int(settings.port)) as smtp:
-        smtp.ehlo()
-        smtp.starttls()
-        smtp.ehlo()
-        smtp.login(settings.user, settings.password)
-        smtp.send_message(msg)
+    def close(self) -> None:
+        # Don't wait on a hung channel; its own socket timeout will end it.
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._smtp.close()
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+import time
+
+from config import PageCacheSettings, get_page_cache_settings
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    url: str
+    content_hash: str
+    etag: str | None
+    last_modified: str | None
+    encoding: str | None
+    fetched_at: float
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass
+class CacheStats:
+    not_modified: int = 0
+    downloaded: int = 0
+    parse_hits: int = 0
+    parse_misses: int = 0
+    evicted: int = 0
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+class PageCache:
+    """Persistent cache of HL fund pages and their parsed fields.
+
+    Pages live under ``pages/`` keyed by a hash of the URL (metadata JSON plus
+    the raw body); parsed results live under ``parsed/`` keyed by a hash of the
+    page body, so an unchanged page is never parsed twice.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, max_age_days: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._pages_dir = self.directory / "pages"
+        self._parsed_dir = self.directory / "parsed"
+        self._pages_dir.mkdir(parents=True, exist_ok=True)
+        self._parsed_dir.mkdir(parents=True, exist_ok=True)
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self.stats, field, getattr(self.stats, field) + 1)
+
+    def _page_paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self._pages_dir / f"{key}.json", self._pages_dir / f"{key}.body"
+
+    def lookup(self, url: str) -> CachedPage | None:
+        meta_path, body_path = self._page_paths(url)
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        try:
+            return CachedPage(**json.loads(meta_path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def mark_not_modified(self, page: CachedPage) -> CachedPage:
+        self._count("not_modified")
+        meta_path, _ = self._page_paths(page.url)
+        # Touch so eviction treats the entry as recently used.
+        os.utime(meta_path)
+        return page
+
+    def store(
+        self,
+        url: str,
+        body: bytes,
+        etag: str | None,
+        last_modified: str | None,
+        encoding: str | None,
+    ) -> CachedPage:
+        self._count("downloaded")
+        page = CachedPage(
+            url=url,
+            content_hash=content_hash(body),
+            etag=etag,
+            last_modified=last_modified,
+            encoding=encoding,
+            fetched_at=time.time(),
+        )
+        meta_path, body_path = self._page_paths(url)
+        _write_atomic(body_path, body)
+        _write_atomic(meta_path, json.dumps(asdict(page)).encode("utf-8"))
+        return page
+
+    def read_html(self, page: CachedPage) -> str:
+        _, body_path = self._page_paths(page.url)
+        return body_path.read_bytes().decode(page.encoding or "utf-8", errors="replace")
+
+    def load_parsed(self, digest: str, version: int) -> dict | None:
+        path = self._parsed_dir / f"{digest}.json"
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            payload = None
+        if not isinstance(payload, dict) or payload.get("version") != version:
+            self._count("parse_misses")
+            return None
+        self._count("parse_hits")
+        os.utime(path)
+        return payload["fields"]
+
+    def store_parsed(self, digest: str, version: int, fields: dict) -> None:
+        payload = {"version": version, "fields": fields}
+        _write_atomic(self._parsed_dir / f"{digest}.json", json.dumps(payload).encode("utf-8"))
+
+    def evict(self) -> int:
+        """Drop entries older than max_age_days, then least-recently-used ones until under max_bytes."""
+        cutoff = time.time() - self.max_age_days * 86400
+        entries: list[tuple[float, int, list[Path]]] = []
+        for meta_path in self._pages_dir.glob("*.json"):
+            body_path = meta_path.with_suffix(".body")
+            paths = [meta_path, body_path]
+            entries.append((meta_path.stat().st_mtime, sum(p.stat().st_size for p in paths if p.exists()), paths))
+        for parsed_path in self._parsed_dir.glob("*.json"):
+            entries.append((parsed_path.stat().st_mtime, parsed_path.stat().st_size, [parsed_path]))
+
+        entries.sort(key=lambda entry: entry[0])
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for used_at, size, paths in entries:
+            if used_at >= cutoff and total <= self.max_bytes:
+                continue
+            for path in paths:
+                path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self.stats.evicted += evicted
+        return evicted
+
+
+_cache: PageCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache(settings: PageCacheSettings | None = None) -> PageCache | None:
+    global _cache
+    if _cache is None:
+        settings = settings or get_page_cache_settings()
+        if not settings.enabled:
+            return None
+        with _cache_lock:
+            if _cache is None:
+                _cache = PageCache(Path(settings.directory), settings.max_bytes, settings.max_age_days)
+    return _cache
+
+
+def reset_page_cache() -> None:
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def finalise_page_cache() -> CacheStats | None:
+    """Run eviction and return this run's hit/miss counters, if the cache was used."""
+    if _cache is None:
+        return None
+    _cache.evict()
+    return _cache.stats
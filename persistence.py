@@ -1,10 +1,22 @@
+from collections.abc import Iterator
+import csv
+from dataclasses import dataclass
+import os
 from pathlib import Path
+import re
+from typing import BinaryIO
 
 import pandas as pd
 
+from config import get_history_format
+from history_store import TOTAL_FUND, long_to_wide, read_long_history, upsert_day
+from rollups import rollup_dir, update_rollups
+
 
 DEFAULT_HISTORY_PATH = Path("daily_totals.csv")
 PRIVATE_HISTORY_PATH = Path("HL_Daily_Prices_Data") / "outputs" / "daily_totals.csv"
+DEFAULT_HISTORY_DIR = Path("history")
+PRIVATE_HISTORY_DIR = PRIVATE_HISTORY_PATH.parent / "history"
 
 
 def resolve_history_path() -> Path:
@@ -16,58 +28,307 @@ def resolve_history_path() -> Path:
     return DEFAULT_HISTORY_PATH
 
 
-def load_previous_snapshot(today_str: str, fund_names: list[str]) -> tuple[float | None, dict[str, float]]:
+def resolve_history_dir() -> Path:
+    if PRIVATE_HISTORY_DIR.parent.exists():
+        return PRIVATE_HISTORY_DIR
+    return DEFAULT_HISTORY_DIR
+
+
+def portfolio_history_path(portfolio: str | None = None) -> Path:
+    path = resolve_history_path()
+    return path if portfolio is None else path.with_name(f"{path.stem}-{portfolio}{path.suffix}")
+
+
+def portfolio_history_dir(portfolio: str | None = None) -> Path:
+    directory = resolve_history_dir()
+    return directory if portfolio is None else directory / portfolio
+
+
+def portfolio_rollup_dir(portfolio: str | None = None) -> Path:
+    if get_history_format() == "long":
+        return rollup_dir(portfolio_history_dir(portfolio), "long")
+    return rollup_dir(portfolio_history_path(portfolio))
+
+
+def _previous_long_snapshot(
+    history_dir: Path, today_str: str, fund_names: list[str]
+) -> tuple[float | None, dict[str, float]]:
+    year = int(today_str[:4])
+    # The prior day is almost always in this year's or last year's partition.
+    history_df = read_long_history(history_dir, years=[str(year - 1), str(year)])
+    previous_rows = history_df[history_df["Date"] < today_str]
+    if previous_rows.empty:
+        history_df = read_long_history(history_dir)
+        previous_rows = history_df[history_df["Date"] < today_str]
+    if previous_rows.empty:
+        return None, {}
+
+    previous_day = previous_rows[previous_rows["Date"] == previous_rows["Date"].max()]
+    values = dict(zip(previous_day["Fund"], previous_day["Value"].astype(float)))
+    previous_total = values.get(TOTAL_FUND)
+    previous_by_fund = {fund_name: values[fund_name] for fund_name in fund_names if fund_name in values}
+    return previous_total, previous_by_fund
+
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_TAIL_BLOCK_SIZE = 8192
+
+
+class _TailLookupUnsupported(Exception):
+    """The tail reader can't vouch for this file; use the full parse instead."""
+
+
+def _iter_lines_reversed(handle: BinaryIO, stop: int) -> Iterator[bytes]:
+    handle.seek(0, os.SEEK_END)
+    position = handle.tell()
+    remainder = b""
+    while position > stop:
+        read_size = min(_TAIL_BLOCK_SIZE, position - stop)
+        position -= read_size
+        handle.seek(position)
+        lines = (handle.read(read_size) + remainder).split(b"\n")
+        remainder = lines.pop(0)
+        yield from reversed(lines)
+    if remainder:
+        yield remainder
+
+
+def _tail_previous_snapshot(
+    history_path: Path, today_str: str, fund_names: list[str]
+) -> tuple[float | None, dict[str, float]]:
+    """Read the header and then scan backwards from EOF for the latest row before today.
+
+    update_daily_totals keeps rows in date order, so this is usually a read of
+    the header plus the last line or two, however long the history is.
+    """
+    if not _ISO_DATE.match(today_str):
+        raise _TailLookupUnsupported
+    with history_path.open("rb") as handle:
+        header_line = handle.readline()
+        header = next(csv.reader([header_line.decode("utf-8")]), [])
+        if "Date" not in header:
+            raise _TailLookupUnsupported
+        date_index = header.index("Date")
+
+        previous_row = None
+        for line in _iter_lines_reversed(handle, handle.tell()):
+            text = line.decode("utf-8").strip()
+            if not text:
+                continue
+            row = next(csv.reader([text]))
+            if len(row) != len(header) or not _ISO_DATE.match(row[date_index]):
+                raise _TailLookupUnsupported
+            if row[date_index] < today_str:
+                previous_row = row
+                break
+
+    if previous_row is None:
+        return None, {}
+
+    columns = {name: index for index, name in enumerate(header)}
     previous_total = None
+    if "Total" in columns and previous_row[columns["Total"]] != "":
+        previous_total = float(previous_row[columns["Total"]])
+
     previous_by_fund: dict[str, float] = {}
+    for fund_name in fund_names:
+        if fund_name not in columns or previous_row[columns[fund_name]] == "":
+            continue
+        try:
+            previous_by_fund[fund_name] = float(previous_row[columns[fund_name]])
+        except ValueError:
+            continue
+    return previous_total, previous_by_fund
 
-    try:
-        history_path = resolve_history_path()
-        if not history_path.exists():
-            return previous_total, previous_by_fund
 
-        history_df = pd.read_csv(history_path)
-        if "Date" in history_df.columns:
-            history_df["Date"] = pd.to_datetime(history_df["Date"])
-        today_dt = pd.to_datetime(today_str)
-        previous_rows = history_df[history_df["Date"] < today_dt].sort_values("Date") if "Date" in history_df.columns else history_df
-        if previous_rows.empty:
+def _previous_from_frame(
+    history_df: pd.DataFrame, today_str: str, fund_names: list[str]
+) -> tuple[float | None, dict[str, float]]:
+    previous_total = None
+    previous_by_fund: dict[str, float] = {}
+
+    if "Date" in history_df.columns:
+        dates = pd.to_datetime(history_df["Date"])
+        earlier = dates.where(dates < pd.to_datetime(today_str)).reset_index(drop=True)
+        if earlier.isna().all():
             return previous_total, previous_by_fund
+        # The latest earlier date, taking the last row if a date repeats.
+        previous_row = history_df.iloc[earlier[::-1].idxmax()]
+    elif history_df.empty:
+        return previous_total, previous_by_fund
+    else:
+        previous_row = history_df.iloc[-1]
 
-        previous_row = previous_rows.iloc[-1]
-        if "Total" in previous_row and pd.notna(previous_row.get("Total")):
-            previous_total = float(previous_row.get("Total"))
-
-        for fund_name in fund_names:
-            if fund_name in previous_row.index and pd.notna(previous_row.get(fund_name)):
-                try:
-                    previous_by_fund[fund_name] = float(previous_row.get(fund_name))
-                except (TypeError, ValueError):
-                    continue
-    except Exception:
-        return None, {}
+    if "Total" in previous_row and pd.notna(previous_row.get("Total")):
+        previous_total = float(previous_row.get("Total"))
+
+    for fund_name in fund_names:
+        if fund_name in previous_row.index and pd.notna(previous_row.get(fund_name)):
+            try:
+                previous_by_fund[fund_name] = float(previous_row.get(fund_name))
+            except (TypeError, ValueError):
+                continue
 
     return previous_total, previous_by_fund
 
 
-def update_daily_totals(data: pd.DataFrame, total: float, today_str: str, filename: str | None = None) -> pd.DataFrame:
-    fund_values = data["Total Holding Value"].to_dict()
-    row_dict = {"Date": today_str, "Total": total}
-    row_dict.update(fund_values)
-
-    path = Path(filename) if filename is not None else resolve_history_path()
-    path.parent.mkdir(parents=True, exist_ok=True)
-    if path.exists():
-        history_df = pd.read_csv(path)
-        for fund in fund_values:
-            if fund not in history_df.columns:
-                history_df[fund] = pd.NA
-        if today_str in history_df["Date"].values:
-            for key, value in row_dict.items():
-                history_df.loc[history_df["Date"] == today_str, key] = value
-        else:
-            history_df = pd.concat([history_df, pd.DataFrame([row_dict])], ignore_index=True)
+def load_previous_snapshot(today_str: str, fund_names: list[str]) -> tuple[float | None, dict[str, float]]:
+    return HistoryStore.load().previous_snapshot(today_str, fund_names)
+
+
+def _daily_row(data: pd.DataFrame, total: float, today_str: str) -> dict[str, object]:
+    row_dict: dict[str, object] = {"Date": today_str, "Total": total}
+    row_dict.update(data["Total Holding Value"].to_dict())
+    return row_dict
+
+
+def _apply_daily_row(history_df: pd.DataFrame | None, row_dict: dict[str, object], today_str: str) -> pd.DataFrame:
+    if history_df is None:
+        return pd.DataFrame([row_dict])
+
+    history_df = history_df.copy()
+    for fund in row_dict:
+        if fund not in history_df.columns:
+            history_df[fund] = pd.NA
+    if today_str in history_df["Date"].values:
+        for key, value in row_dict.items():
+            history_df.loc[history_df["Date"] == today_str, key] = value
     else:
-        history_df = pd.DataFrame([row_dict])
+        history_df = pd.concat([history_df, pd.DataFrame([row_dict])], ignore_index=True)
+        if (history_df["Date"].astype(str) < today_str).sum() != len(history_df) - 1:
+            # An out-of-order date; keep the file sorted so the tail lookup stays valid.
+            history_df = history_df.sort_values("Date", kind="stable", key=lambda dates: dates.astype(str))
+            history_df = history_df.reset_index(drop=True)
+    return history_df
+
+
+def _write_csv_atomic(history_df: pd.DataFrame, path: Path) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    history_df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+@dataclass
+class HistoryIOStats:
+    reads: int = 0
+    writes: int = 0
+
 
-    history_df.to_csv(path, index=False)
+class HistoryStore:
+    """The daily history, read at most once per run and written back once by flush().
+
+    Nothing is read until it's needed. A previous-snapshot lookup on a store
+    that hasn't loaded its frame yet reads only the tail of the history (or
+    the latest partitions); recording a day, report queries and any lookup
+    after that work on the in-memory wide frame (Date, Total, one column per
+    fund).
+    """
+
+    def __init__(self, history_df: pd.DataFrame | None, location: Path, history_format: str = "wide") -> None:
+        self._history_df = history_df
+        self._loaded = history_df is not None
+        self.location = location
+        self.history_format = history_format
+        self.io = HistoryIOStats()
+        self._dirty_dates: set[str] = set()
+
+    @classmethod
+    def load(
+        cls, filename: str | None = None, history_format: str | None = None, portfolio: str | None = None
+    ) -> "HistoryStore":
+        history_format = "wide" if filename is not None else (history_format or get_history_format())
+        if history_format == "long":
+            return cls(None, portfolio_history_dir(portfolio), "long")
+        path = Path(filename) if filename is not None else portfolio_history_path(portfolio)
+        return cls(None, path, "wide")
+
+    def load_frame(self) -> pd.DataFrame | None:
+        """Read the whole history into memory now, if it hasn't been; None when there is none."""
+        if not self._loaded:
+            self._loaded = True
+            if self.history_format == "long":
+                long_df = read_long_history(self.location)
+                self.io.reads += 1
+                if not long_df.empty:
+                    self._history_df = long_to_wide(long_df)
+            elif self.location.exists():
+                self._history_df = pd.read_csv(self.location)
+                self.io.reads += 1
+        return self._history_df
+
+    @property
+    def rollup_dir(self) -> Path:
+        return rollup_dir(self.location, self.history_format)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        history_df = self.load_frame()
+        if history_df is None:
+            return pd.DataFrame(columns=["Date", "Total"])
+        return history_df
+
+    def record(self, data: pd.DataFrame, total: float, today_str: str) -> pd.DataFrame:
+        self._history_df = _apply_daily_row(self.load_frame(), _daily_row(data, total, today_str), today_str)
+        self._dirty_dates.add(today_str)
+        return self._history_df
+
+    def replace_days(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Swap in whole days from ``rows`` (a wide frame like ``frame``), keeping every other day as it was."""
+        rows = rows.assign(Date=rows["Date"].astype(str))
+        current = self.load_frame()
+        if current is None:
+            history_df = rows
+        else:
+            kept = current[~current["Date"].astype(str).isin(rows["Date"])]
+            history_df = pd.concat([kept, rows], ignore_index=True)
+        self._history_df = history_df.sort_values("Date", kind="stable", key=lambda dates: dates.astype(str)).reset_index(drop=True)
+        self._dirty_dates.update(rows["Date"])
+        return self._history_df
+
+    def _previous_from_files(self, today_str: str, fund_names: list[str]) -> tuple[float | None, dict[str, float]] | None:
+        if self.history_format == "long":
+            self.io.reads += 1
+            return _previous_long_snapshot(self.location, today_str, fund_names)
+        if not self.location.exists():
+            return None, {}
+        try:
+            snapshot = _tail_previous_snapshot(self.location, today_str, fund_names)
+        except _TailLookupUnsupported:
+            return None
+        self.io.reads += 1
+        return snapshot
+
+    def previous_snapshot(self, today_str: str, fund_names: list[str]) -> tuple[float | None, dict[str, float]]:
+        try:
+            if not self._loaded:
+                snapshot = self._previous_from_files(today_str, fund_names)
+                if snapshot is not None:
+                    return snapshot
+            history_df = self.load_frame()
+            if history_df is None:
+                return None, {}
+            return _previous_from_frame(history_df, today_str, fund_names)
+        except Exception:
+            return None, {}
+
+    def flush(self) -> None:
+        if not self._dirty_dates or self._history_df is None:
+            return
+        if self.history_format == "long":
+            dated = self._history_df.set_index(self._history_df["Date"].astype(str))
+            for date_str in sorted(self._dirty_dates):
+                values = dated.loc[date_str].drop("Date").to_dict()
+                upsert_day(self.location, date_str, values)
+        else:
+            self.location.parent.mkdir(parents=True, exist_ok=True)
+            _write_csv_atomic(self._history_df, self.location)
+        update_rollups(self.rollup_dir, self._history_df, self._dirty_dates)
+        self.io.writes += 1
+        self._dirty_dates.clear()
+
+
+def update_daily_totals(data: pd.DataFrame, total: float, today_str: str, filename: str | None = None) -> pd.DataFrame:
+    store = HistoryStore.load(filename)
+    history_df = store.record(data, total, today_str)
+    store.flush()
     return history_df
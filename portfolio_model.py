@@ -0,0 +1,309 @@
+"""Typed holdings, quotes and valuations for the scrape-and-collate path.
+
+A portfolio of a few dozen funds is mostly per-row overhead, so the core path
+keeps slotted records and array-backed value columns and only builds a pandas
+DataFrame when a caller (history, the HTML renderer) asks for one through
+``Valuation.to_frame()``.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable, Mapping
+import csv
+from dataclasses import dataclass, field
+import logging
+import math
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from fx import get_gbp_rates
+from utilities import improved_normalise_key, infer_currency, parse_price_to_gbp
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+# The markers pandas.read_csv treats as missing by default, which units.csv relied on.
+_NA_VALUES = frozenset({"", "#N/A", "#N/A N/A", "#NA", "-NaN", "-nan", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"})
+
+
+@dataclass(frozen=True, slots=True)
+class Holding:
+    """One row of units.csv; ``units`` stays an int when the file gives whole units."""
+
+    fund: str
+    units: float
+    url: str
+    key: str
+    extra: tuple[tuple[str, str | None], ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class Quote:
+    """The price fields scraped from one fund page, still as displayed text."""
+
+    url: str
+    title: str
+    key: str
+    fund_name: str
+    sell: str | None = None
+    buy: str | None = None
+    change_value: str | None = None
+    change_pct: str | None = None
+
+    @classmethod
+    def from_fields(cls, url: str, fund_name: str, fields: Mapping[str, str | None]) -> Quote:
+        title = fields["title"]
+        return cls(
+            url,
+            title,
+            improved_normalise_key(title),
+            fund_name,
+            fields.get("sell"),
+            fields.get("buy"),
+            fields.get("change_value"),
+            fields.get("change_pct"),
+        )
+
+
+def _cell(value: str | None) -> str | None:
+    return None if value is None or value.strip() in _NA_VALUES else value
+
+
+def _parse_units(text: str) -> float:
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def load_holdings(units_path: Path) -> tuple[list[Holding], tuple[str, ...]]:
+    """Read units.csv into holdings, plus its columns other than fund and url in file order.
+
+    Rows missing a fund or units are skipped, as are blank lines. A row
+    without a url is kept with an empty one, to be found by its name.
+    """
+    with open(units_path, newline="", encoding="utf-8") as handle:
+        reader = csv.DictReader(handle)
+        header = [name for name in reader.fieldnames or () if name is not None]
+        if "fund" not in header:
+            raise ValueError("units.csv must contain a 'fund' column for matching.")
+        missing_columns = [column for column in ("units", "url") if column not in header]
+        if missing_columns:
+            raise ValueError(f"units.csv is missing required columns: {', '.join(missing_columns)}")
+
+        extra_columns = [name for name in header if name not in ("fund", "units", "url")]
+        holdings = []
+        for row in reader:
+            fund, units, url = _cell(row["fund"]), _cell(row["units"]), _cell(row["url"])
+            if fund is None or units is None:
+                continue
+            extra = tuple((name, _cell(row.get(name))) for name in extra_columns)
+            holdings.append(Holding(fund, _parse_units(units), url or "", improved_normalise_key(fund), extra))
+    return holdings, tuple(name for name in header if name not in ("fund", "url"))
+
+
+@dataclass(slots=True)
+class Valuation:
+    """Priced holdings in GBP, one slot per holding in units.csv order.
+
+    ``sell_price`` is in each quote's currency and ``value`` in GBP, both
+    aligned with ``holdings``; ``currencies`` and ``fx_rates`` (GBP per unit)
+    record the conversion. ``quotes`` is None for stale rows valued from
+    history. ``failed_units`` holds the units of holdings that couldn't be
+    priced today.
+    """
+
+    holdings: list[Holding]
+    quotes: list[Quote | None]
+    sell_price: array
+    value: array
+    columns: tuple[str, ...] = ("units",)
+    stale: array = field(default_factory=lambda: array("b"))
+    failed_units: dict[str, float] = field(default_factory=dict)
+    currencies: list[str] = field(default_factory=list)
+    fx_rates: array = field(default_factory=lambda: array("d"))
+
+    def __post_init__(self) -> None:
+        if len(self.stale) != len(self.holdings):
+            self.stale = array("b", bytes(len(self.holdings)))
+        if len(self.currencies) != len(self.holdings) or len(self.fx_rates) != len(self.holdings):
+            self.currencies = ["GBP"] * len(self.holdings)
+            self.fx_rates = array("d", [1.0] * len(self.holdings))
+
+    def __len__(self) -> int:
+        return len(self.holdings)
+
+    @property
+    def funds(self) -> list[str]:
+        return [holding.fund for holding in self.holdings]
+
+    def total(self) -> float:
+        return math.fsum(self.value)
+
+    def reprice(self, updates: Mapping[int, Quote]) -> float:
+        """Re-value only the positions in ``updates`` from their new quotes, in place.
+
+        Every updated quote must have a sell price; one in a currency with no
+        GBP rate is skipped, keeping its last value. Returns the change in total.
+        """
+        currencies = {position: infer_currency(quote.sell) for position, quote in updates.items()}
+        rates = _gbp_rates(currencies.values())
+        positions = [position for position, currency in currencies.items() if _has_rate(self.holdings[position], currency, rates)]
+        sell_price, value, currencies, fx_rates = _price(
+            [(self.holdings[position], updates[position]) for position in positions], [currencies[position] for position in positions], rates
+        )
+        delta = 0.0
+        for position, price, new_value, currency, rate in zip(positions, sell_price, value, currencies, fx_rates):
+            delta += new_value - self.value[position]
+            self.quotes[position] = updates[position]
+            self.sell_price[position] = price
+            self.value[position] = new_value
+            self.currencies[position] = currency
+            self.fx_rates[position] = rate
+        return delta
+
+    def with_stale(self, last_values: Mapping[str, float]) -> Valuation:
+        """Add failed holdings back at their last known value, flagged as stale.
+
+        ``last_values`` maps fund names to their most recent value in history;
+        funds with no history stay excluded.
+        """
+        priced = set(self.funds)
+        stale = {fund: units for fund, units in self.failed_units.items() if fund in last_values and fund not in priced}
+        if not stale:
+            return self
+        holdings, quotes = list(self.holdings), list(self.quotes)
+        sell_price, value, flags = array("d", self.sell_price), array("d", self.value), array("b", self.stale)
+        currencies, fx_rates = list(self.currencies), array("d", self.fx_rates)
+        for fund, units in stale.items():
+            logger.warning("Using last known value for %s", fund)
+            last_value = float(last_values[fund])
+            holdings.append(Holding(fund, float(units), "", ""))
+            quotes.append(None)
+            sell_price.append(last_value / units if units != 0 else math.nan)
+            value.append(last_value)
+            flags.append(1)
+            currencies.append("GBP")
+            fx_rates.append(1.0)
+        return Valuation(holdings, quotes, sell_price, value, self.columns, flags, dict(self.failed_units), currencies, fx_rates)
+
+    def to_frame(self) -> pd.DataFrame:
+        """The collated portfolio as a DataFrame indexed by fund, with the columns the summary shows."""
+        import pandas as pd
+
+        stale = [bool(flag) for flag in self.stale]
+        frame: dict[str, object] = {}
+        for column in self.columns:
+            if column == "units":
+                frame["Units"] = [holding.units for holding in self.holdings]
+            else:
+                texts = [None if is_stale else dict(holding.extra)[column] for holding, is_stale in zip(self.holdings, stale)]
+                frame[column] = _numeric_if_possible(texts)
+        frame["key"] = [None if is_stale else holding.key for holding, is_stale in zip(self.holdings, stale)]
+        frame["Sell Price"] = self.sell_price.tolist()
+        for label, attribute in (
+            ("Buy Price", "buy"),
+            ("Change Value", "change_value"),
+            ("Percentage Change", "change_pct"),
+            ("key_src", "key"),
+            ("fund_name", "fund_name"),
+        ):
+            frame[label] = [None if quote is None else getattr(quote, attribute) for quote in self.quotes]
+        frame["Currency"] = ["GBP"] * len(self.holdings)
+        frame["Total Holding Value"] = self.value.tolist()
+        if any(stale):
+            frame["Stale"] = stale
+
+        data = pd.DataFrame(frame, index=pd.Index(self.funds, name="Fund/Share"))
+        data.attrs["failed_units"] = dict(self.failed_units)
+        return data
+
+
+def _numeric_if_possible(values: list[str | None]) -> list[object]:
+    # Extra units.csv columns keep the numeric types read_csv would have given them.
+    import pandas as pd
+
+    try:
+        return pd.to_numeric(pd.Series(values, dtype=object)).tolist()
+    except (ValueError, TypeError):
+        return values
+
+
+def value_holdings(holdings: Iterable[Holding], quotes: Mapping[str, Quote], columns: tuple[str, ...] = ("units",)) -> Valuation:
+    """Price each holding from its page's quote and convert it to GBP.
+
+    Holdings whose page failed to scrape, had no sell price, or is priced in
+    a currency with no GBP rate are left out and their units kept in
+    ``failed_units``.
+    """
+    scraped: list[tuple[Holding, Quote]] = []
+    failed_units: dict[str, float] = {}
+    for holding in holdings:
+        quote = quotes.get(holding.url)
+        if quote is None:
+            logger.warning("Excluded fund: %s", holding.fund)
+        if quote is None or quote.sell is None:
+            failed_units[holding.fund] = float(holding.units)
+            continue
+        scraped.append((holding, quote))
+
+    scraped_currencies = [infer_currency(quote.sell) for _, quote in scraped]
+    rates = _gbp_rates(scraped_currencies)
+    priced: list[tuple[Holding, Quote]] = []
+    currencies: list[str] = []
+    for (holding, quote), currency in zip(scraped, scraped_currencies):
+        if _has_rate(holding, currency, rates):
+            priced.append((holding, quote))
+            currencies.append(currency)
+        else:
+            failed_units[holding.fund] = float(holding.units)
+    if not priced:
+        raise ValueError("No funds have valid scraped data. All scraping attempts failed.")
+
+    sell_price, value, currencies, fx_rates = _price(priced, currencies, rates)
+    return Valuation(
+        [holding for holding, _ in priced],
+        [quote for _, quote in priced],
+        sell_price,
+        value,
+        columns,
+        failed_units=failed_units,
+        currencies=currencies,
+        fx_rates=fx_rates,
+    )
+
+
+def _gbp_rates(currencies: Iterable[str]) -> dict[str, float]:
+    # Only hit the FX service when something is actually priced outside GBP.
+    foreign_currencies = set(currencies) - {"GBP"}
+    return get_gbp_rates(foreign_currencies) if foreign_currencies else {"GBP": 1.0}
+
+
+def _has_rate(holding: Holding, currency: str, rates: Mapping[str, float]) -> bool:
+    if currency in rates:
+        return True
+    logger.warning("No GBP rate for %s; excluded fund: %s", currency, holding.fund)
+    return False
+
+
+def _price(pairs: list[tuple[Holding, Quote]], currencies: list[str], rates: Mapping[str, float]) -> tuple[array, array, list[str], array]:
+    """Sell price, GBP value, currency and GBP rate for each (holding, quote) pair.
+
+    A few dozen rows don't repay building pandas objects, so this stays on the
+    scalar helpers; utilities' column helpers are for frame-sized inputs.
+    """
+    sell_price = array("d")
+    value = array("d")
+    fx_rates = array("d")
+    for (holding, quote), currency in zip(pairs, currencies):
+        # HL quotes funds in pence and shares in pounds.
+        price = parse_price_to_gbp(quote.sell, "share" in holding.fund.lower())
+        rate = float(rates[currency])
+        sell_price.append(price)
+        value.append(holding.units * price * rate)
+        fx_rates.append(rate)
+    return sell_price, value, list(currencies), fx_rates
@@ -0,0 +1,184 @@
+"""A per-run ledger of the unit prices each valuation was built from.
+
+Every run appends one row per holding to that year's ``price_ledger-YYYY.csv``
+in the ``price_ledger/`` directory next to the history, so a run only rewrites
+one year of rows: (Date, Fund, Units, Sell, Buy, Currency, FX Rate, Source).
+Sell and Buy are per-unit prices in the quote's currency, FX Rate is GBP per
+unit of that currency, and Source is ``hl`` for a scraped page or ``history``
+for a holding valued from its last recorded value. HL doesn't serve past pages,
+so this is what lets past totals be recomputed offline when units change:
+
+    python price_ledger.py revalue [--units-timeline FILE] [--apply] [--portfolio NAME]
+
+A units timeline is a CSV of (Date, Fund, Units) rows, each effective from
+its date until that fund's next row; before a fund's first row, and for
+funds it doesn't mention, the units recorded in the ledger are used.
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import date
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from analytics import analytics_state_path, rebuild_state, save_state
+from history_store import upsert_rows
+from persistence import HistoryStore, portfolio_history_path
+from utilities import parse_price_to_gbp
+
+if TYPE_CHECKING:
+    from portfolio_model import Valuation
+
+
+LEDGER_COLUMNS = ["Date", "Fund", "Units", "Sell", "Buy", "Currency", "FX Rate", "Source"]
+
+
+def ledger_dir(portfolio: str | None = None) -> Path:
+    suffix = "" if portfolio is None else f"-{portfolio}"
+    return portfolio_history_path(portfolio).with_name(f"price_ledger{suffix}")
+
+
+def ledger_partition(directory: Path, year: str) -> Path:
+    return Path(directory) / f"price_ledger-{year}.csv"
+
+
+def migrate_single_file(directory: Path) -> bool:
+    """Split a ledger written as one ``price_ledger.csv`` into the yearly partitions; True if there was one."""
+    directory = Path(directory)
+    legacy = directory.with_name(f"{directory.name}.csv")
+    if not legacy.exists():
+        return False
+    ledger = read_ledger(legacy)
+    directory.mkdir(parents=True, exist_ok=True)
+    for year, partition in ledger.groupby(ledger["Date"].str[:4], sort=True):
+        path = ledger_partition(directory, year)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        partition.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    legacy.unlink()
+    return True
+
+
+def _buy_price(text: str | None, is_share: bool) -> float | None:
+    if text is None:
+        return None
+    try:
+        return parse_price_to_gbp(text, is_share)
+    except ValueError:
+        return None
+
+
+def ledger_rows(valuation: Valuation, date_str: str) -> list[tuple[object, ...]]:
+    rows = []
+    for position, holding in enumerate(valuation.holdings):
+        quote = valuation.quotes[position]
+        buy = None if quote is None else _buy_price(quote.buy, "share" in holding.fund.lower())
+        rows.append(
+            (
+                date_str,
+                holding.fund,
+                holding.units,
+                valuation.sell_price[position],
+                "" if buy is None else buy,
+                valuation.currencies[position],
+                valuation.fx_rates[position],
+                "history" if valuation.stale[position] else "hl",
+            )
+        )
+    return rows
+
+
+def record_prices(directory: Path, date_str: str, valuation: Valuation) -> Path:
+    """Write the day's rows into its year's partition, appending a new day and replacing a re-run one."""
+    migrate_single_file(directory)
+    path = ledger_partition(directory, date_str[:4])
+    return upsert_rows(path, date_str, ledger_rows(valuation, date_str), LEDGER_COLUMNS)
+
+
+def read_ledger(path: Path) -> pd.DataFrame:
+    """A ledger directory's partitions (or a single ledger CSV) as one frame, oldest first."""
+    path = Path(path)
+    paths = sorted(path.glob("price_ledger-[0-9][0-9][0-9][0-9].csv")) if path.is_dir() else [path]
+    dtype = {"Date": str, "Fund": str, "Currency": str, "Source": str}
+    frames = [pd.read_csv(partition, dtype=dtype) for partition in paths]
+    if not frames:
+        return pd.DataFrame(columns=LEDGER_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_units_timeline(path: Path) -> pd.DataFrame:
+    timeline = pd.read_csv(path, dtype={"Date": str, "Fund": str})
+    missing = [column for column in ("Date", "Fund", "Units") if column not in timeline.columns]
+    if missing:
+        raise ValueError(f"Units timeline is missing required columns: {', '.join(missing)}")
+    return timeline[["Date", "Fund", "Units"]]
+
+
+def revalue(ledger: pd.DataFrame, units_timeline: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Recompute every recorded day's totals as a wide history frame (Date, Total, one column per fund).
+
+    Units come from ``units_timeline`` where it has an entry on or before the
+    day, matched in one as-of join; otherwise from the ledger itself.
+    """
+    ledger = ledger.assign(Date=ledger["Date"].astype(str))
+    if units_timeline is not None and not units_timeline.empty:
+        # merge_asof wants real dates, sorted, on both sides.
+        left = ledger.assign(Day=pd.to_datetime(ledger["Date"])).sort_values("Day", kind="stable")
+        right = units_timeline.assign(Day=pd.to_datetime(units_timeline["Date"].astype(str)))
+        right = right[["Day", "Fund", "Units"]].sort_values("Day", kind="stable")
+        ledger = pd.merge_asof(left, right, on="Day", by="Fund", direction="backward", suffixes=("", "_timeline"))
+        units = ledger["Units_timeline"].astype(float).fillna(ledger["Units"].astype(float))
+    else:
+        units = ledger["Units"].astype(float)
+
+    ledger = ledger.assign(Value=units * ledger["Sell"].astype(float) * ledger["FX Rate"].astype(float))
+    funds = list(dict.fromkeys(ledger["Fund"]))
+    wide = ledger.pivot_table(index="Date", columns="Fund", values="Value", aggfunc="sum", sort=True)
+    wide = wide.reindex(columns=funds)
+    wide.insert(0, "Total", wide.sum(axis=1))
+    wide.columns.name = None
+    return wide.reset_index()
+
+
+def apply_revaluation(revalued: pd.DataFrame, portfolio: str | None = None) -> int:
+    """Replace the history's rows for every revalued day; returns how many days changed.
+
+    Rollups and the analytics state are rebuilt to match.
+    """
+    store = HistoryStore.load(portfolio=portfolio)
+    store.replace_days(revalued)
+    store.flush()
+    save_state(analytics_state_path(portfolio), rebuild_state(store.frame))
+    return len(revalued)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Recompute past totals from the price ledger, offline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    revalue_parser = subparsers.add_parser("revalue", help="ledger + units timeline -> daily totals")
+    revalue_parser.add_argument("--units-timeline", type=Path, help="CSV of Date,Fund,Units changes")
+    revalue_parser.add_argument("--output", type=Path, help="where to write the recomputed totals (wide CSV)")
+    revalue_parser.add_argument("--apply", action="store_true", help="replace those days in the history itself")
+    revalue_parser.add_argument("--portfolio", help="a name from PORTFOLIOS; defaults to the single portfolio")
+    args = parser.parse_args(argv)
+
+    path = ledger_dir(args.portfolio)
+    migrate_single_file(path)
+    if not path.exists():
+        raise SystemExit(f"No price ledger at {path}")
+    timeline = read_units_timeline(args.units_timeline) if args.units_timeline else None
+    revalued = revalue(read_ledger(path), timeline)
+
+    output = args.output or path.with_name(f"{path.name}-revalued-{date.today().isoformat()}.csv")
+    revalued.to_csv(output, index=False)
+    print(f"Recomputed {len(revalued)} days into {output}")
+    if args.apply:
+        print(f"Replaced {apply_revaluation(revalued, args.portfolio)} days in the history")
+
+
+if __name__ == "__main__":
+    main()
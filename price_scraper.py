@@ -1,20 +1,118 @@
 from __future__ import annotations
 
+from html import unescape
 import re
-import requests
-from bs4 import BeautifulSoup
+import time
+from urllib.parse import urljoin
+
+from fetch_policy import fetch_with_retries
+from metrics import get_run_metrics
+from page_cache import CachedPage, PageCache, get_page_cache
+from utilities import CURRENCY_CODE, CURRENCY_SYMBOLS
+
+
+# Bump whenever parse_fund_html's output changes so memoised parses are redone.
+PARSER_VERSION = 1
+
+
+def _fetch_cached_page(cache: PageCache, url: str) -> CachedPage:
+    cached = cache.lookup(url)
+    headers = cached.conditional_headers() if cached is not None else {}
+    response = fetch_with_retries(url, headers=headers)
+    if response.status_code == 304 and cached is not None:
+        return cache.mark_not_modified(cached)
+    response.raise_for_status()
+    return cache.store(
+        url,
+        response.content,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        encoding=response.encoding or response.apparent_encoding,
+    )
 
 
 def fetch_fund_html(url: str) -> str:
-    response = requests.get(url, timeout=20)
+    cache = get_page_cache()
+    if cache is not None:
+        return cache.read_html(_fetch_cached_page(cache, url))
+
+    response = fetch_with_retries(url)
     response.raise_for_status()
     return response.text
 
 
-def parse_fund_html(html: str) -> dict[str, str | None]:
+_SYMBOL = "[" + "".join(re.escape(symbol) for symbol in CURRENCY_SYMBOLS) + "]"
+# Any currency utilities.infer_currency knows: a symbol, or an ISO code before or after the amount.
+_PRICE = rf"(?:{CURRENCY_CODE}\s?)?{_SYMBOL}?[0-9,]+\.\d{{2}}p?(?:\s?{CURRENCY_CODE}\b)?"
+# Markup and whitespace that BeautifulSoup's get_text(" ", strip=True) would
+# collapse into a single separator between a label and its value.
+_GAP = r"(?:\s|<[^>]*>)*"
+
+# One scanner over the raw page. Comments, script/style/template bodies and
+# the inside of every other tag are consumed before the label alternatives,
+# so text that get_text() ignores (or attribute values) can't be picked up.
+_FAST_SCANNER = re.compile(
+    r"<!--.*?-->"
+    r"|<(?i:(?P<skip>script|style|template))\b.*?</(?i:(?P=skip))\s*>"
+    r"|(?P<meta><(?i:meta)\b[^>]*>)"
+    r"|<[a-zA-Z/!?][^>]*>"
+    rf"|Sell:{_GAP}(?P<sell>{_PRICE})"
+    rf"|Buy:{_GAP}(?P<buy>{_PRICE})"
+    rf"|Change:{_GAP}(?P<change_value>[+\-]?\d+(?:\.\d+)?p?){_GAP}\({_GAP}(?P<change_pct>[-+]?[\d\.]+%){_GAP}\)",
+    re.S,
+)
+_ATTR_PATTERN = re.compile(r"""([^\s=/>]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""")
+_FAST_FIELDS = ("sell", "buy", "change_value", "change_pct")
+
+
+def _meta_attributes(tag: str) -> dict[str, str]:
+    attributes: dict[str, str] = {}
+    for match in _ATTR_PATTERN.finditer(tag, 5):
+        name = match.group(1).lower()
+        if name not in attributes:
+            value = next(group for group in match.groups()[1:] if group is not None)
+            attributes[name] = unescape(value)
+    return attributes
+
+
+def _parse_fund_html_fast(html: str) -> dict[str, str | None]:
+    """Pull the fund fields straight out of the raw HTML in one regex pass.
+
+    Fields that can't be found (including a missing og:title) are left as
+    None so parse_fund_html knows to fall back to the BeautifulSoup path.
+    """
+    result: dict[str, str | None] = dict.fromkeys(("title", *_FAST_FIELDS))
+    og_seen = False
+    for match in _FAST_SCANNER.finditer(html):
+        kind = match.lastgroup
+        if kind == "meta":
+            if og_seen:
+                continue
+            attributes = _meta_attributes(match.group("meta"))
+            if attributes.get("property") == "og:title":
+                og_seen = True
+                content = attributes.get("content", "").strip()
+                result["title"] = content or None
+        elif kind == "sell" and result["sell"] is None:
+            result["sell"] = match.group("sell")
+        elif kind == "buy" and result["buy"] is None:
+            result["buy"] = match.group("buy")
+        elif kind == "change_pct" and result["change_value"] is None:
+            result["change_value"] = match.group("change_value")
+            result["change_pct"] = match.group("change_pct")
+
+        if og_seen and all(result[field] is not None for field in _FAST_FIELDS):
+            break
+    return result
+
+
+def _parse_fund_html_soup(html: str) -> dict[str, str | None]:
+    # Only pages the fast path can't read get here, so bs4 is loaded on demand.
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
 
-    price_pattern = r"([$£]?[0-9,]+\.\d{2}p?)"
+    price_pattern = rf"({_PRICE})"
     text = soup.get_text(" ", strip=True)
 
     sell = re.search(rf"Sell:\s*{price_pattern}", text)
@@ -41,42 +139,51 @@ def parse_fund_html(html: str) -> dict[str, str | None]:
     }
 
 
-def price_scraper_fund(url: str) -> dict[str, str | None]:
-    return parse_fund_html(fetch_fund_html(url))
-
-
-def fetch_share_quote(yahoo_symbol: str) -> dict[str, str | float | None]:
-    """Fetch a listed share quote via yfinance, normalised to pence.
-
-    LSE quotes are usually reported in GBp (pence); a feed reporting GBP
-    (pounds) is scaled up by 100 so the rest of the app can assume pence.
-    yfinance is imported lazily so the rest of the module stays usable
-    (and testable) without the dependency installed.
-    """
-    import yfinance as yf
-
-    fast_info = yf.Ticker(yahoo_symbol).fast_info
-    last_price = fast_info.get("lastPrice")
-    previous_close = fast_info.get("previousClose")
-    currency = fast_info.get("currency") or ""
+def parse_fund_html(html: str) -> dict[str, str | None]:
+    parsed = _parse_fund_html_fast(html)
+    if all(value is not None for value in parsed.values()):
+        return parsed
+    return _parse_fund_html_soup(html)
 
-    if last_price is None:
-        raise ValueError(f"Could not fetch latest price for {yahoo_symbol}")
 
-    scale = 100.0 if currency == "GBP" else 1.0  # GBp/GBX are already pence
-    price_pence = float(last_price) * scale
+def _timed_parse(html: str) -> dict[str, str | None]:
+    start = time.perf_counter()
+    try:
+        return parse_fund_html(html)
+    finally:
+        get_run_metrics().record_parse(time.perf_counter() - start)
 
-    change_pence = None
-    change_pct = None
-    if previous_close:
-        previous_pence = float(previous_close) * scale
-        change_pence = price_pence - previous_pence
-        if previous_pence:
-            change_pct = (change_pence / previous_pence) * 100.0
 
-    return {
-        "symbol": yahoo_symbol,
-        "price_pence": price_pence,
-        "change_pence": change_pence,
-        "change_pct": change_pct,
-    }
+def price_scraper_fund(url: str) -> dict[str, str | None]:
+    cache = get_page_cache()
+    if cache is None:
+        return _timed_parse(fetch_fund_html(url))
+
+    # An unchanged page (304, or an identical body) reuses the memoised parse.
+    page = _fetch_cached_page(cache, url)
+    parsed = cache.load_parsed(page.content_hash, PARSER_VERSION)
+    if parsed is None:
+        parsed = _timed_parse(cache.read_html(page))
+        cache.store_parsed(page.content_hash, PARSER_VERSION, parsed)
+    return dict(parsed)
+
+
+_LINK_PATTERN = re.compile(r"""<a\b[^>]*?\bhref\s*=\s*["']([^"']+)["'][^>]*>(.*?)</a\s*>""", re.S | re.I)
+_TAG_PATTERN = re.compile(r"<[^>]*>")
+
+
+def parse_fund_links(html: str, listing_url: str) -> list[tuple[str, str]]:
+    """(link text, absolute URL) for every link on a listing page that points below it."""
+    prefix = listing_url.rstrip("/") + "/"
+    links = []
+    for href, text in _LINK_PATTERN.findall(html):
+        url = urljoin(prefix, unescape(href))
+        title = " ".join(unescape(_TAG_PATTERN.sub(" ", text)).split())
+        if title and url.startswith(prefix):
+            links.append((title, url))
+    return links
+
+
+def search_fund_pages(listing_url: str) -> list[tuple[str, str]]:
+    """The fund pages an HL A-Z listing links to, as (title, URL)."""
+    return parse_fund_links(fetch_fund_html(listing_url), listing_url)
@@ -1,121 +1,236 @@
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 import logging
 from pathlib import Path
 
 import pandas as pd
 
-from price_scraper import price_scraper_fund
-from utilities import convert_value_to_gbp, get_usd_gbp_rate, improved_normalise_key, infer_currency, parse_price_to_gbp
+from config import MatchSettings, get_match_settings, get_scrape_workers
+from matching import HoldingIndex, load_holding_index
+from metrics import get_run_metrics
+from portfolio_model import Holding, Quote, Valuation, load_holdings, value_holdings
+from price_scraper import price_scraper_fund, search_fund_pages
 
 
 logger = logging.getLogger(__name__)
 UNITS_PATH = Path("HL_Daily_Prices_Data") / "units.csv"
 
 
-def load_units_dataframe(units_path: Path = UNITS_PATH) -> pd.DataFrame:
-    units_df = pd.read_csv(units_path)
-    units_df = units_df.dropna(how="all")
-
-    if "fund" not in units_df.columns:
-        raise ValueError("units.csv must contain a 'fund' column for matching.")
+def _scrape_quote(position: int, total: int, holding: Holding, debug: bool = False) -> Quote | None:
+    fund_name, url = holding.fund, holding.url
+    try:
+        if debug:
+            logger.debug("Scraping %s/%s: %s", position, total, fund_name)
+        data = price_scraper_fund(url)
+        if debug:
+            logger.debug("Scrape result for %s: %s", fund_name, data)
+        if not isinstance(data, dict) or "title" not in data or not data["title"]:
+            logger.warning("Failed to scrape %s - no title found", fund_name)
+            get_run_metrics().increment("scrape_failures")
+            return None
+        return Quote.from_fields(url, fund_name, data)
+    except Exception as exc:
+        logger.warning("Error scraping %s (%s): %s", fund_name, url, exc)
+        get_run_metrics().increment("scrape_failures")
+        return None
+
+
+def scrape_quotes(holdings: Sequence[Holding], debug: bool = False, workers: int = 1) -> list[Quote]:
+    if debug:
+        logger.debug("Processing %s funds from units.csv", len(holdings))
+        logger.debug("Funds: %s", [holding.fund for holding in holdings])
+
+    total = len(holdings)
+    jobs = [(index + 1, total, holding) for index, holding in enumerate(holdings)]
+
+    # executor.map yields results in submission order, so the quotes come back
+    # in units.csv order regardless of which page finishes first.
+    if workers > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            results = list(executor.map(lambda job: _scrape_quote(*job, debug=debug), jobs))
+    else:
+        results = [_scrape_quote(*job, debug=debug) for job in jobs]
+
+    quotes = [quote for quote in results if quote is not None]
+    if not quotes:
+        raise ValueError("No funds were successfully scraped. Check your URLs and network connection.")
 
-    missing_columns = [column for column in ("units", "url") if column not in units_df.columns]
-    if missing_columns:
-        raise ValueError(f"units.csv is missing required columns: {', '.join(missing_columns)}")
+    if debug:
+        logger.debug("Successfully scraped %s out of %s funds", len(quotes), len(holdings))
+
+    return quotes
+
+
+@dataclass(frozen=True)
+class ScrapeDedupStats:
+    holdings: int
+    unique_urls: int
+
+    @property
+    def saved_requests(self) -> int:
+        return self.holdings - self.unique_urls
+
+
+def scrape_unique_urls(holding_lists: list[list[Holding]], debug: bool = False) -> tuple[dict[str, Quote], ScrapeDedupStats]:
+    """Scrape every distinct URL across the holdings lists once; quotes are keyed by URL."""
+    unique: dict[str, Holding] = {}
+    holdings = 0
+    for holding_list in holding_lists:
+        holdings += len(holding_list)
+        for holding in holding_list:
+            if holding.url:
+                unique.setdefault(holding.url, holding)
+    if not unique:
+        return {}, ScrapeDedupStats(holdings, 0)
+    with get_run_metrics().stage("scrape"):
+        quotes = scrape_quotes(list(unique.values()), debug=debug, workers=get_scrape_workers())
+    return {quote.url: quote for quote in quotes}, ScrapeDedupStats(holdings, len(unique))
+
+
+def _search_listing(holding: Holding, search_url: str, listings: dict[str, list[tuple[str, str]]]) -> list[tuple[str, str]]:
+    letter = next((char for char in holding.key if char.isalnum()), None)
+    if not search_url or letter is None:
+        return []
+    url = search_url.format(letter=letter)
+    if url not in listings:
+        try:
+            listings[url] = search_fund_pages(url)
+        except Exception as exc:
+            logger.warning("Fund search failed (%s): %s", url, exc)
+            listings[url] = []
+    return listings[url]
+
+
+def _search_for_page(
+    holding: Holding,
+    index: HoldingIndex,
+    settings: MatchSettings,
+    listings: dict[str, list[tuple[str, str]]],
+    quotes: dict[str, Quote],
+    debug: bool,
+) -> str | None:
+    """Scrape the listing entry whose title best resolves to ``holding``; its URL if it has a price."""
+    best: tuple[float, str] | None = None
+    for title, url in _search_listing(holding, settings.search_url, listings):
+        match = index.resolve(title, settings.min_score)
+        if match is not None and match.fund == holding.fund and (best is None or match.score > best[0]):
+            best = (match.score, url)
+    if best is None:
+        return None
+    quote = quotes.get(best[1]) or _scrape_quote(1, 1, replace(holding, url=best[1]), debug=debug)
+    if quote is None or quote.sell is None:
+        return None
+    quotes[best[1]] = quote
+    return best[1]
+
+
+def resolve_holdings(
+    holdings: list[Holding],
+    quotes: dict[str, Quote],
+    index: HoldingIndex,
+    settings: MatchSettings | None = None,
+    listings: dict[str, list[tuple[str, str]]] | None = None,
+    debug: bool = False,
+) -> list[Holding]:
+    """Point every holding at the page it should be priced from, matching page titles to fund names.
+
+    A page is used for the holdings that link it unless its title resolves to
+    a holding on another URL and scores below MATCH_MIN_SCORE against this
+    one; such pages are counted in ``title_mismatches``. A holding left without a
+    price (no url, a failed page or the wrong page) takes any page scraped
+    this run whose title resolves to it, else the best match on HL's A-Z
+    listing, which is scraped and added to ``quotes``. Holdings that still
+    have no page come back with an empty url.
+    """
+    settings = settings or get_match_settings()
+    listings = {} if listings is None else listings
+    funds_by_url: dict[str, set[str]] = {}
+    for holding in holdings:
+        funds_by_url.setdefault(holding.url, set()).add(holding.fund)
+    resolved: list[Holding] = []
+    unpriced: list[int] = []
+    for holding in holdings:
+        quote = quotes.get(holding.url) if holding.url else None
+        if quote is not None:
+            # The URL stays the authority unless the title clearly names another holding and not this one.
+            match = index.resolve(quote.title, settings.min_score)
+            if (
+                match is not None
+                and match.fund not in funds_by_url[holding.url]
+                and index.score(quote.title, holding.fund) < settings.min_score
+            ):
+                logger.warning("Page for %s (%r) names %s, score %.2f; not using it", holding.fund, quote.title, match.fund, match.score)
+                get_run_metrics().increment("title_mismatches")
+                quote = None
+        if quote is None or quote.sell is None:
+            unpriced.append(len(resolved))
+            holding = replace(holding, url="") if quote is None else holding
+        resolved.append(holding)
+    if not unpriced:
+        return resolved
+
+    by_title: dict[str, str] = {}
+    scores: dict[str, float] = {}
+    for url, quote in quotes.items():
+        match = index.resolve(quote.title, settings.min_score) if quote.sell is not None else None
+        if match is not None and match.score > scores.get(match.fund, 0.0):
+            by_title[match.fund], scores[match.fund] = url, match.score
+
+    for position in unpriced:
+        holding = resolved[position]
+        url = by_title.get(holding.fund)
+        if url is None:
+            url = _search_for_page(holding, index, settings, listings, quotes, debug)
+            if url is None:
+                continue
+            by_title[holding.fund] = url
+        logger.warning("Pricing %s from %s, matched by title; update its url in units.csv", holding.fund, url)
+        resolved[position] = replace(holding, url=url)
+    return resolved
 
-    units_df = units_df.dropna(subset=["fund", "units", "url"]).copy()
-    units_df["key"] = units_df["fund"].apply(improved_normalise_key)
-    return units_df
 
+def build_valuation(holdings: list[Holding], quotes: Mapping[str, Quote], columns: tuple[str, ...] = ("units",)) -> Valuation:
+    with get_run_metrics().stage("collate"):
+        return value_holdings(holdings, quotes, columns)
 
-def scrape_fund_rows(units_df: pd.DataFrame, debug: bool = False) -> list[dict[str, object]]:
-    temp_data: list[dict[str, object]] = []
 
-    if debug:
-        logger.debug("Processing %s funds from units.csv", len(units_df))
-        logger.debug("Funds: %s", units_df["fund"].tolist())
+def create_valuation(debug: bool = False, units_path: Path = UNITS_PATH) -> Valuation:
+    holdings, columns = load_holdings(units_path)
+    quotes, _ = scrape_unique_urls([holdings], debug=debug)
+    with get_run_metrics().stage("match"):
+        holdings = resolve_holdings(holdings, quotes, load_holding_index(units_path, holdings), debug=debug)
+    return build_valuation(holdings, quotes, columns)
 
-    for index, row in units_df.iterrows():
-        fund_name = row["fund"]
-        url = row["url"]
-        try:
-            if debug:
-                logger.debug("Scraping %s/%s: %s", index + 1, len(units_df), fund_name)
-            data = price_scraper_fund(url)
-            if debug:
-                logger.debug("Scrape result for %s: %s", fund_name, data)
-            if not isinstance(data, dict) or "title" not in data or not data["title"]:
-                logger.warning("Failed to scrape %s - no title found", fund_name)
-                continue
-            data["key"] = improved_normalise_key(data["title"])
-            data["url"] = url
-            data["fund_name"] = fund_name
-            temp_data.append(data)
-        except Exception as exc:
-            logger.warning("Error scraping %s (%s): %s", fund_name, url, exc)
-            continue
 
-    if not temp_data:
-        raise ValueError("No funds were successfully scraped. Check your URLs and network connection.")
+def create_valuations(
+    units_paths: Mapping[str, Path], debug: bool = False
+) -> tuple[dict[str, Valuation], ScrapeDedupStats]:
+    """Value every holdings file, scraping each fund URL only once."""
+    loaded = {name: load_holdings(Path(path)) for name, path in units_paths.items()}
+    quotes, stats = scrape_unique_urls([holdings for holdings, _ in loaded.values()], debug=debug)
 
-    if debug:
-        logger.debug("Successfully scraped %s out of %s funds", len(temp_data), len(units_df))
-
-    return temp_data
-
-
-def normalise_merged_dataframe(merged_data_df: pd.DataFrame) -> pd.DataFrame:
-    merged_data_df = merged_data_df.copy()
-    merged_data_df["currency"] = merged_data_df["sell"].map(infer_currency)
-    share_mask = merged_data_df.index.str.contains("share", case=False)
-    merged_data_df["sell"] = [
-        parse_price_to_gbp(price, is_share=is_share)
-        for price, is_share in zip(merged_data_df["sell"], share_mask)
-    ]
-    merged_data_df["value"] = merged_data_df["units"] * merged_data_df["sell"]
-
-    usd_gbp_rate = get_usd_gbp_rate()
-    merged_data_df["value"] = [
-        convert_value_to_gbp(value, currency, usd_gbp_rate)
-        for value, currency in zip(merged_data_df["value"], merged_data_df["currency"])
-    ]
-    merged_data_df.loc[merged_data_df["currency"] == "USD", "currency"] = "GBP"
-
-    return merged_data_df.drop(columns=["title"])
-
-
-def create_data_frame(debug: bool = False) -> pd.DataFrame:
-    units_df = load_units_dataframe()
-    scraped_rows = scrape_fund_rows(units_df, debug=debug)
-
-    fund_data_df = pd.DataFrame(scraped_rows).set_index("url")
-    merged_data_df = units_df.set_index("url").join(fund_data_df, how="left", rsuffix="_src")
-
-    if "fund" in merged_data_df.columns:
-        merged_data_df = merged_data_df.set_index("fund")
-
-    failed_funds = merged_data_df[merged_data_df["title"].isna()]
-    if not failed_funds.empty:
-        logger.warning("%s funds failed to scrape and will be excluded", len(failed_funds))
-        for fund in failed_funds.index:
-            logger.warning("Excluded fund: %s", fund)
-
-    merged_data_df = merged_data_df.dropna(subset=["title", "sell"])
-    if merged_data_df.empty:
-        raise ValueError("No funds have valid scraped data. All scraping attempts failed.")
-
-    merged_data_df = normalise_merged_dataframe(merged_data_df)
-    merged_data_df = merged_data_df.rename(
-        {
-            "units": "Units",
-            "sell": "Sell Price",
-            "buy": "Buy Price",
-            "change_value": "Change Value",
-            "change_pct": "Percentage Change",
-            "url": "URL",
-            "currency": "Currency",
-            "value": "Total Holding Value",
-        },
-        axis=1,
-    )
-    merged_data_df.index.name = "Fund/Share"
-    return merged_data_df
+    portfolios: dict[str, Valuation] = {}
+    listings: dict[str, list[tuple[str, str]]] = {}
+    for name, (holdings, columns) in loaded.items():
+        try:
+            with get_run_metrics().stage("match"):
+                index = load_holding_index(Path(units_paths[name]), holdings)
+                holdings = resolve_holdings(holdings, quotes, index, listings=listings, debug=debug)
+            portfolios[name] = build_valuation(holdings, quotes, columns)
+        except ValueError as exc:
+            logger.warning("Skipping portfolio %s: %s", name, exc)
+    if not portfolios:
+        raise ValueError("No portfolio has valid scraped data. All scraping attempts failed.")
+    return portfolios, stats
+
+
+def create_data_frame(debug: bool = False, units_path: Path = UNITS_PATH) -> pd.DataFrame:
+    return create_valuation(debug, units_path).to_frame()
+
+
+def create_data_frames(
+    units_paths: Mapping[str, Path], debug: bool = False
+) -> tuple[dict[str, pd.DataFrame], ScrapeDedupStats]:
+    valuations, stats = create_valuations(units_paths, debug)
+    return {name: valuation.to_frame() for name, valuation in valuations.items()}, stats
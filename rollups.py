@@ -0,0 +1,338 @@
+"""Weekly, monthly and yearly rollups of the daily history.
+
+Each level stores (Period, Fund, Open, Close, Min, Max) rows, with the
+portfolio total under the ``Total`` fund name, partitioned by year:
+``weekly-YYYY.csv`` (weeks keyed by their Monday), ``monthly-YYYY.csv`` and
+one ``yearly.csv``. Recording a day recomputes only the periods containing
+it, from that period's daily rows; ``manifest.json`` remembers the last day
+folded in so a gap (or a missing directory) triggers a full rebuild instead.
+
+query_range answers a date range from the coarsest periods that fit inside
+it, so a multi-year view reads a handful of yearly rows plus the months and
+weeks at its edges rather than every day.
+
+Usage:
+    python rollups.py rebuild [--portfolio NAME]
+    python rollups.py query 2021-01-01 2026-03-31 [--portfolio NAME]
+"""
+
+from __future__ import annotations
+
+import argparse
+import calendar
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import date, timedelta
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from history_store import wide_to_long
+
+
+LEVELS = ("yearly", "monthly", "weekly")
+ROLLUP_COLUMNS = ["Period", "Fund", "Open", "Close", "Min", "Max"]
+MANIFEST_NAME = "manifest.json"
+
+
+def rollup_dir(history_location: Path, history_format: str = "wide") -> Path:
+    """Where the rollups of a history file (wide) or partition directory (long) live."""
+    history_location = Path(history_location)
+    if history_format == "long":
+        return history_location / "rollups"
+    return history_location.with_name(f"{history_location.stem}_rollups")
+
+
+def period_key(day: date, level: str) -> str:
+    if level == "yearly":
+        return f"{day.year:04d}"
+    if level == "monthly":
+        return f"{day.year:04d}-{day.month:02d}"
+    if level == "weekly":
+        return (day - timedelta(days=day.weekday())).isoformat()
+    raise ValueError(f"Unknown rollup level: {level}")
+
+
+def period_bounds(key: str, level: str) -> tuple[date, date]:
+    """The first and last calendar day of a period."""
+    if level == "yearly":
+        year = int(key)
+        return date(year, 1, 1), date(year, 12, 31)
+    if level == "monthly":
+        year, month = int(key[:4]), int(key[5:7])
+        return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+    if level == "weekly":
+        start = date.fromisoformat(key)
+        return start, start + timedelta(days=6)
+    raise ValueError(f"Unknown rollup level: {level}")
+
+
+def _partition_path(directory: Path, level: str, key: str) -> Path:
+    return directory / ("yearly.csv" if level == "yearly" else f"{level}-{key[:4]}.csv")
+
+
+def _period_keys(dates: pd.Series, level: str) -> pd.Series:
+    if level == "yearly":
+        return dates.str[:4]
+    if level == "monthly":
+        return dates.str[:7]
+    days = pd.to_datetime(dates)
+    return (days - pd.to_timedelta(days.dt.dayofweek, unit="D")).dt.strftime("%Y-%m-%d")
+
+
+def _aggregate(long_df: pd.DataFrame, level: str) -> pd.DataFrame:
+    """Roll date-ordered (Date, Fund, Value) rows up to one level."""
+    if long_df.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    grouped = long_df.assign(Period=_period_keys(long_df["Date"], level)).groupby(["Period", "Fund"], sort=True)["Value"]
+    rolled = grouped.agg(Open="first", Close="last", Min="min", Max="max").reset_index()
+    return rolled[ROLLUP_COLUMNS]
+
+
+def _long_rows(history_df: pd.DataFrame) -> pd.DataFrame:
+    wide = history_df.copy()
+    wide["Date"] = wide["Date"].astype(str)
+    wide = wide.drop_duplicates("Date", keep="last").sort_values("Date", kind="stable")
+    long_df = wide_to_long(wide)
+    long_df["Value"] = pd.to_numeric(long_df["Value"], errors="coerce")
+    return long_df.dropna(subset=["Value"])
+
+
+def _period_rows(period: pd.DataFrame, key: str) -> pd.DataFrame:
+    """Rows for one period from its slice of the date-ordered wide history."""
+    period = period.drop_duplicates("Date", keep="last")
+    funds = [column for column in period.columns if column != "Date"]
+    values = period[funds].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    rows = []
+    for index, fund in enumerate(funds):
+        column = values[:, index]
+        column = column[~np.isnan(column)]
+        if len(column):
+            rows.append((key, str(fund), column[0], column[-1], column.min(), column.max()))
+    return pd.DataFrame(rows, columns=ROLLUP_COLUMNS)
+
+
+def _write_atomic(frame: pd.DataFrame, path: Path) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _read_partition(path: Path) -> pd.DataFrame:
+    if not path.exists():
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    return pd.read_csv(path, dtype={"Period": str, "Fund": str})
+
+
+def _load_manifest(directory: Path) -> dict[str, str] | None:
+    try:
+        return json.loads((directory / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _save_manifest(directory: Path, last_date: str) -> None:
+    path = directory / MANIFEST_NAME
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps({"last_date": last_date}), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def rebuild_rollups(directory: Path, history_df: pd.DataFrame) -> None:
+    """Recompute every level from the whole history in one grouped pass per level."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("*.csv"):
+        stale.unlink()
+    long_df = _long_rows(history_df)
+    for level in LEVELS:
+        rolled = _aggregate(long_df, level)
+        if level == "yearly":
+            _write_atomic(rolled, directory / "yearly.csv")
+            continue
+        for year, partition in rolled.groupby(rolled["Period"].str[:4], sort=True):
+            _write_atomic(partition, _partition_path(directory, level, str(year)))
+    if not long_df.empty:
+        _save_manifest(directory, str(long_df["Date"].max()))
+
+
+def update_rollups(
+    directory: Path,
+    history_df: pd.DataFrame,
+    dates: Iterable[str],
+) -> None:
+    """Recompute the periods containing ``dates`` from ``history_df``.
+
+    ``history_df`` is the full wide history. When the rollups are missing or
+    stop short of the day before ``dates``, everything is rebuilt from it.
+    """
+    directory = Path(directory)
+    dates = sorted(set(dates))
+    if not dates:
+        return
+    history_dates = history_df["Date"].astype(str)
+    earlier = history_dates[history_dates < dates[0]]
+    previous = earlier.max() if not earlier.empty else None
+    manifest = _load_manifest(directory)
+    if manifest is None or (previous is not None and manifest.get("last_date", "") < previous):
+        rebuild_rollups(directory, history_df)
+        return
+
+    wide = history_df.assign(Date=history_dates).sort_values("Date", kind="stable")
+    sorted_dates = wide["Date"]
+    for level in LEVELS:
+        touched = sorted({period_key(date.fromisoformat(date_str), level) for date_str in dates})
+        for path, keys in _group_by_partition(directory, level, touched).items():
+            periods = []
+            for key in keys:
+                first, last = period_bounds(key, level)
+                lo = sorted_dates.searchsorted(first.isoformat(), side="left")
+                hi = sorted_dates.searchsorted(last.isoformat(), side="right")
+                periods.append(_period_rows(wide.iloc[lo:hi], key))
+            partition = _read_partition(path)
+            partition = partition[~partition["Period"].isin(keys)]
+            partition = pd.concat([partition, *periods], ignore_index=True).sort_values(["Period", "Fund"], kind="stable")
+            _write_atomic(partition[ROLLUP_COLUMNS], path)
+    _save_manifest(directory, max(manifest.get("last_date", ""), dates[-1]))
+
+
+def _group_by_partition(directory: Path, level: str, keys: list[str]) -> dict[Path, list[str]]:
+    grouped: dict[Path, list[str]] = {}
+    for key in keys:
+        grouped.setdefault(_partition_path(directory, level, key), []).append(key)
+    return grouped
+
+
+def plan_range(start: date, end: date, levels: tuple[str, ...] = LEVELS) -> list[tuple[str, str]]:
+    """Cover [start, end] with (level, period) pieces, coarsest first.
+
+    Periods that fit entirely inside the range are taken at each level and
+    the ragged edges left over go to the next finer one. Edges shorter than a
+    week are widened to the week containing them.
+    """
+    if start > end:
+        return []
+    level = levels[0]
+    if len(levels) == 1:
+        pieces, key = [], period_key(start, level)
+        while period_bounds(key, level)[0] <= end:
+            pieces.append((level, key))
+            key = period_key(period_bounds(key, level)[1] + timedelta(days=1), level)
+        return pieces
+
+    key = period_key(start, level)
+    if period_bounds(key, level)[0] < start:
+        key = period_key(period_bounds(key, level)[1] + timedelta(days=1), level)
+    inside = []
+    while period_bounds(key, level)[1] <= end:
+        inside.append((level, key))
+        key = period_key(period_bounds(key, level)[1] + timedelta(days=1), level)
+    if not inside:
+        return plan_range(start, end, levels[1:])
+    head_end = period_bounds(inside[0][1], level)[0] - timedelta(days=1)
+    tail_start = period_bounds(inside[-1][1], level)[1] + timedelta(days=1)
+    return [*plan_range(start, head_end, levels[1:]), *inside, *plan_range(tail_start, end, levels[1:])]
+
+
+@dataclass(frozen=True)
+class RangeQuery:
+    start: date
+    end: date
+    pieces: list[tuple[str, str]]
+    rows_read: int
+    # Open, Close, Min and Max over the range, indexed by fund (and Total).
+    values: pd.DataFrame
+
+
+def read_level(directory: Path, level: str, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+    """One level's rows, e.g. for a chart, limited to the periods overlapping [start, end]."""
+    directory = Path(directory)
+    first = None if start is None else period_key(date.fromisoformat(start), level)
+    last = None if end is None else period_key(date.fromisoformat(end), level)
+    if level == "yearly":
+        paths = [directory / "yearly.csv"]
+    else:
+        paths = sorted(directory.glob(f"{level}-[0-9][0-9][0-9][0-9].csv"))
+        paths = [
+            path
+            for path in paths
+            if (first is None or path.stem[-4:] >= first[:4]) and (last is None or path.stem[-4:] <= last[:4])
+        ]
+    rows = pd.concat([_read_partition(path) for path in paths], ignore_index=True) if paths else pd.DataFrame(columns=ROLLUP_COLUMNS)
+    if first is not None:
+        rows = rows[rows["Period"] >= first]
+    if last is not None:
+        rows = rows[rows["Period"] <= last]
+    return rows.reset_index(drop=True)
+
+
+def query_range(directory: Path, start: str, end: str) -> RangeQuery:
+    """Open/close/min/max per fund over [start, end], read from the coarsest rollups that fit."""
+    directory = Path(directory)
+    pieces = plan_range(date.fromisoformat(start), date.fromisoformat(end))
+    frames, rows_read = [], 0
+    for (level, path), keys in _pieces_by_partition(directory, pieces).items():
+        partition = _read_partition(path)
+        rows_read += len(partition)
+        frame = partition[partition["Period"].isin(keys)].copy()
+        bounds = [period_bounds(key, level) for key in frame["Period"]]
+        frame["Start"] = [first.isoformat() for first, _ in bounds]
+        frame["End"] = [last.isoformat() for _, last in bounds]
+        frames.append(frame)
+
+    covered_start = min((period_bounds(key, level)[0] for level, key in pieces), default=date.fromisoformat(start))
+    covered_end = max((period_bounds(key, level)[1] for level, key in pieces), default=date.fromisoformat(end))
+    rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[*ROLLUP_COLUMNS, "Start", "End"])
+    if rows.empty:
+        values = pd.DataFrame(columns=["Open", "Close", "Min", "Max"])
+    else:
+        by_start = rows.sort_values(["Start", "End"], kind="stable").groupby("Fund", sort=False)
+        by_end = rows.sort_values(["End", "Start"], kind="stable").groupby("Fund", sort=False)
+        values = pd.DataFrame(
+            {
+                "Open": by_start["Open"].first(),
+                "Close": by_end["Close"].last(),
+                "Min": by_start["Min"].min(),
+                "Max": by_start["Max"].max(),
+            }
+        )
+    values.index.name = "Fund"
+    return RangeQuery(covered_start, covered_end, pieces, rows_read, values)
+
+
+def _pieces_by_partition(directory: Path, pieces: list[tuple[str, str]]) -> dict[tuple[str, Path], list[str]]:
+    grouped: dict[tuple[str, Path], list[str]] = {}
+    for level, key in pieces:
+        grouped.setdefault((level, _partition_path(directory, level, key)), []).append(key)
+    return grouped
+
+
+def main(argv: list[str] | None = None) -> None:
+    from persistence import HistoryStore, portfolio_rollup_dir
+
+    parser = argparse.ArgumentParser(description="Maintain and query the weekly/monthly/yearly history rollups.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="history -> rollup tables")
+    query = subparsers.add_parser("query", help="open/close/min/max per fund over a date range")
+    query.add_argument("start", help="YYYY-MM-DD")
+    query.add_argument("end", help="YYYY-MM-DD")
+    for subparser in (rebuild, query):
+        subparser.add_argument("--portfolio", help="a name from PORTFOLIOS; defaults to the single portfolio")
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        store = HistoryStore.load(portfolio=args.portfolio)
+        rebuild_rollups(store.rollup_dir, store.frame)
+        print(store.rollup_dir)
+        return
+
+    result = query_range(portfolio_rollup_dir(args.portfolio), args.start, args.end)
+    print(f"{result.start} to {result.end} from {len(result.pieces)} periods ({result.rows_read} rows read)")
+    print(result.values.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Quotes for the watchlist of listed shares shown alongside the portfolio.
+
+Every symbol missing from the on-disk cache is fetched in one batched
+yfinance download; quotes younger than QUOTE_CACHE_TTL_SECONDS are served
+from the cache. yfinance is imported lazily, only when a download is needed.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from dataclasses import asdict, dataclass
+import json
+import logging
+import os
+from pathlib import Path
+import time
+
+import numpy as np
+
+from config import WatchlistSettings, get_watchlist_settings
+
+
+logger = logging.getLogger(__name__)
+
+# Yahoo symbol suffix -> the exchange prefix shown in badges.
+EXCHANGE_PREFIXES = {".L": "LON"}
+
+
+@dataclass(frozen=True, slots=True)
+class ShareQuote:
+    symbol: str
+    price_pence: float
+    change_pence: float | None = None
+    change_pct: float | None = None
+
+    @property
+    def label(self) -> str:
+        for suffix, exchange in EXCHANGE_PREFIXES.items():
+            if self.symbol.endswith(suffix):
+                return f"{exchange}:{self.symbol[: -len(suffix)]}"
+        return self.symbol
+
+    def describe(self) -> str:
+        """The badge text, e.g. ``LON:ELIX: 152.50p (+1.50p DoD, +1.23%)``."""
+        change_text = ""
+        if self.change_pence is not None:
+            change_text = f" ({self.change_pence:+.2f}p DoD"
+            if self.change_pct is not None:
+                change_text += f", {self.change_pct:+.2f}%"
+            change_text += ")"
+        elif self.change_pct is not None:
+            change_text = f" ({self.change_pct:+.2f}% DoD)"
+        return f"{self.label}: {self.price_pence:.2f}p{change_text}"
+
+
+@dataclass(frozen=True, slots=True)
+class RawQuote:
+    """A downloaded quote as the feed reports it, before conversion to pence."""
+
+    last: float | None
+    previous_close: float | None
+    currency: str
+
+
+def normalise_to_pence(symbols: Sequence[str], raw: Mapping[str, RawQuote]) -> list[ShareQuote]:
+    """Convert raw quotes to pence in one array pass.
+
+    LSE quotes are usually reported in GBp (pence); a feed reporting GBP
+    (pounds) is scaled up by 100 so the rest of the app can assume pence.
+    Symbols without a last price are dropped.
+    """
+    symbols = [symbol for symbol in symbols if symbol in raw and raw[symbol].last is not None]
+    if not symbols:
+        return []
+    last = np.array([raw[symbol].last for symbol in symbols], dtype=float)
+    previous = np.array([np.nan if raw[symbol].previous_close is None else raw[symbol].previous_close for symbol in symbols], dtype=float)
+    scale = np.where(np.array([raw[symbol].currency for symbol in symbols]) == "GBP", 100.0, 1.0)
+
+    price = last * scale
+    previous_pence = previous * scale
+    change = price - previous_pence
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(previous_pence != 0, change / previous_pence * 100.0, np.nan)
+
+    return [
+        ShareQuote(symbol, float(p), None if np.isnan(c) else float(c), None if np.isnan(r) else float(r))
+        for symbol, p, c, r in zip(symbols, price.tolist(), change.tolist(), pct.tolist())
+    ]
+
+
+def download_quotes(symbols: Sequence[str], currencies: Mapping[str, str]) -> dict[str, RawQuote]:
+    """Fetch the last two daily closes for every symbol in one yfinance download.
+
+    The download carries no currency, so symbols not in ``currencies`` (kept
+    in the cache, they practically never change) are looked up once each.
+    """
+    import yfinance as yf
+
+    history = yf.download(list(symbols), period="5d", interval="1d", group_by="ticker", auto_adjust=False, progress=False)
+    raw: dict[str, RawQuote] = {}
+    for symbol in symbols:
+        try:
+            columns = history[symbol] if history.columns.nlevels > 1 else history
+            closes = columns["Close"].dropna()
+        except KeyError:
+            continue
+        if closes.empty:
+            continue
+        currency = currencies.get(symbol) or yf.Ticker(symbol).fast_info.get("currency") or ""
+        previous = float(closes.iloc[-2]) if len(closes) > 1 else None
+        raw[symbol] = RawQuote(float(closes.iloc[-1]), previous, currency)
+    return raw
+
+
+def _load_cache(path: Path) -> dict[str, dict]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_cache(path: Path, cache: dict[str, dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(cache, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def fetch_watchlist_quotes(settings: WatchlistSettings | None = None, now: float | None = None) -> list[ShareQuote]:
+    """Return a quote for every watchlist symbol that has one, in watchlist order.
+
+    If the download fails, the last cached quote is used however old it is;
+    a symbol that has never been fetched is left out.
+    """
+    settings = settings or get_watchlist_settings()
+    if not settings.symbols:
+        return []
+    now = time.time() if now is None else now
+    cache_path = Path(settings.cache_path)
+    cache = _load_cache(cache_path)
+    quotes = cache.setdefault("quotes", {})
+    currencies = cache.setdefault("currencies", {})
+
+    stale = [
+        symbol
+        for symbol in settings.symbols
+        if symbol not in quotes or now - quotes[symbol]["fetched_at"] > settings.ttl_seconds
+    ]
+    if stale:
+        try:
+            raw = download_quotes(stale, currencies)
+        except Exception as exc:
+            logger.warning("Share quote download failed, using cached quotes: %s", exc)
+        else:
+            for quote in normalise_to_pence(stale, raw):
+                quotes[quote.symbol] = {**asdict(quote), "fetched_at": now}
+            currencies.update({symbol: raw_quote.currency for symbol, raw_quote in raw.items() if raw_quote.currency})
+            _save_cache(cache_path, cache)
+
+    result = []
+    for symbol in settings.symbols:
+        cached = quotes.get(symbol)
+        if cached is None:
+            logger.warning("No quote available for %s", symbol)
+            continue
+        result.append(ShareQuote(symbol, cached["price_pence"], cached["change_pence"], cached["change_pct"]))
+    return result
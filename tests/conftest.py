@@ -1,7 +1,16 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_match_index(tmp_path, monkeypatch):
+    # Keep the title-match cache out of the repo, and never search HL from a test.
+    monkeypatch.setenv("MATCH_INDEX_PATH", str(tmp_path / "holding_index.json"))
+    monkeypatch.setenv("MATCH_SEARCH_URL", "")
@@ -0,0 +1,91 @@
+from datetime import date
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics
+import html_summary
+from analytics import AnalyticsState, rebuild_state
+from notifications import format_push_message
+from persistence import HistoryStore
+
+
+def _history(days=400, seed=7):
+    dates = pd.bdate_range("2025-01-02", periods=days)
+    rng = np.random.default_rng(seed)
+    fund_a = 1000 * np.cumprod(1 + rng.normal(0.0004, 0.01, days))
+    fund_b = 500 * np.cumprod(1 + rng.normal(0.0002, 0.02, days))
+    return pd.DataFrame({"Date": dates.strftime("%Y-%m-%d"), "Total": fund_a + fund_b, "Fund A": fund_a, "Fund B": fund_b})
+
+
+def test_incremental_updates_match_the_vectorised_rebuild():
+    history = _history()
+    state = AnalyticsState()
+    for row in history.itertuples(index=False):
+        state.update(row.Date, row.Total, {"Fund A": row[2], "Fund B": row[3]})
+
+    rebuilt = rebuild_state(history)
+    assert [day for day, _ in rebuilt.window] == [day for day, _ in state.window]
+    assert [total for _, total in rebuilt.window] == pytest.approx([total for _, total in state.window])
+    assert (rebuilt.last_date, rebuilt.year, rebuilt.count) == (state.last_date, state.year, state.count)
+    assert rebuilt.year_open_by_fund == pytest.approx(state.year_open_by_fund)
+    assert (rebuilt.mean, rebuilt.m2, rebuilt.peak, rebuilt.max_drawdown) == pytest.approx((state.mean, state.m2, state.peak, state.max_drawdown))
+
+    result = state.summarise()
+    totals = history["Total"]
+    daily = totals.pct_change().dropna()
+    assert result.volatility == pytest.approx(daily.std() * np.sqrt(252) * 100)
+    assert result.max_drawdown == pytest.approx(((totals / totals.cummax()) - 1).min() * 100)
+    year_open = history[history["Date"] < "2026-01-01"].iloc[-1]
+    assert result.returns["YTD"] == pytest.approx((totals.iloc[-1] / year_open["Total"] - 1) * 100)
+    assert sum(result.contributions.values()) == pytest.approx(result.returns["YTD"])
+    # The window only keeps the last year plus the day anchoring 1Y.
+    year_ago = analytics.period_start(date.fromisoformat(state.last_date), "1Y").isoformat()
+    assert state.window[0][0] <= year_ago < state.window[1][0]
+
+
+def test_rolling_returns_anchor_on_the_latest_day_at_or_before_the_period_start():
+    state = AnalyticsState()
+    for date_str, total in [("2026-03-13", 80.0), ("2026-03-16", 100.0), ("2026-04-09", 110.0), ("2026-04-16", 121.0)]:
+        state.update(date_str, total, {"Fund A": total})
+
+    result = state.summarise()
+
+    assert result.returns["1W"] == pytest.approx(10.0)
+    assert result.returns["1M"] == pytest.approx(21.0)
+    assert result.returns["YTD"] == pytest.approx(51.25)
+    assert result.returns["1Y"] is None
+    assert result.describe().startswith("1W +10.00% | 1M +21.00% | YTD +51.25% | 1Y n/a | Vol ")
+
+
+def test_refresh_updates_from_today_or_rebuilds_when_out_of_step(tmp_path):
+    path = tmp_path / "analytics_state.json"
+    history = HistoryStore(_history(30), tmp_path / "daily_totals.csv")
+    analytics.save_state(path, rebuild_state(history.frame.iloc[:-1]))
+    last = history.frame.iloc[-1]
+
+    state = analytics.refresh_state(history, last["Date"], last["Total"], {"Fund A": last["Fund A"], "Fund B": last["Fund B"]}, path)
+    assert state.m2 == pytest.approx(rebuild_state(history.frame).m2)
+
+    # A re-run of the same day can't be folded in twice.
+    analytics.save_state(path, state)
+    state = analytics.refresh_state(history, last["Date"], last["Total"], {}, path)
+    assert state.count == 29
+    assert json.loads(path.read_text())["last_date"] == last["Date"]
+
+
+def test_summary_and_push_message_show_the_analytics():
+    state = AnalyticsState()
+    state.update("2025-12-31", 100.0, {"Fund A": 60.0, "Fund B": 40.0})
+    state.update("2026-01-02", 105.0, {"Fund A": 66.0, "Fund B": 39.0})
+    result = state.summarise()
+    data = pd.DataFrame({"Total Holding Value": [66.0, 39.0]}, index=pd.Index(["Fund A", "Fund B"], name="Fund/Share"))
+
+    html = html_summary.build_html_summary(data, 105.0, "2026-01-02", previous_total=100.0, previous_by_fund={}, analytics=result)
+    message = format_push_message(105.0, 100.0, analytics=result)
+
+    assert '<div class="analytics">1W n/a | 1M n/a | YTD +5.00% | 1Y n/a | Vol n/a | Max DD 0.00%</div>' in html
+    assert "<th>YTD Contribution</th>" in html and "<td>+6.00%</td>" in html and "<td>-1.00%</td>" in html
+    assert message.splitlines()[1:] == [result.describe(), "YTD contributors: Fund A +6.00%, Fund B -1.00%"]
@@ -0,0 +1,36 @@
+import pandas as pd
+
+import backfill
+
+
+HISTORY = pd.DataFrame(
+    [
+        {"Date": "2026-04-14", "Total": 100.0, "Fund A": 60.0, "Fund B": 40.0},
+        {"Date": "2026-04-15", "Total": 110.0, "Fund A": 70.0, "Fund B": 40.0},
+        {"Date": "2026-04-16", "Total": 90.0, "Fund A": 90.0, "Fund B": None},
+    ]
+)
+
+
+def test_history_with_previous_matches_latest_prior_row():
+    values, previous = backfill.history_with_previous(HISTORY)
+
+    assert previous.loc["2026-04-16", "Total"] == 110.0
+    assert previous.loc["2026-04-15", "Fund A"] == 60.0
+    assert pd.isna(previous.loc["2026-04-14", "Total"])
+
+
+def test_backfill_summaries_writes_each_day_without_touching_latest(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("backfill must not look up snapshots one day at a time")
+
+    monkeypatch.setattr("html_summary.load_previous_snapshot", fail)
+
+    rendered = backfill.backfill_summaries(HISTORY, "2026-04-15", "2026-04-16", output_dir=str(tmp_path), workers=2)
+
+    assert rendered == ["2026-04-15", "2026-04-16"]
+    assert not (tmp_path / "latest.html").exists()
+    assert not (tmp_path / "daily_summary-2026-04-14.html").exists()
+    page = (tmp_path / "daily_summary-2026-04-16.html").read_text(encoding="utf-8")
+    assert "£-20.00" in page
+    assert "Fund B" not in page
@@ -0,0 +1,19 @@
+from benchmarks import run_benchmarks
+
+
+def test_benchmark_suite_runs_and_flags_regressions():
+    results = run_benchmarks.run_suite(fund_sizes=[10], history_fund_sizes=[10], history_years=[1], repeat=1)
+    payload = run_benchmarks.results_to_json(results)
+
+    keys = {entry["key"] for entry in payload["results"]}
+    assert {
+        "parse_fund_html[funds=10,years=None]",
+        "value_holdings[funds=10,years=None]",
+        "build_html_summary[funds=10,years=None]",
+        "update_daily_totals[funds=10,years=1]",
+        "load_previous_snapshot[funds=10,years=1]",
+    } <= keys
+
+    slower = {"results": [{**entry, "seconds": entry["seconds"] * 2} for entry in payload["results"]]}
+    assert run_benchmarks.compare(payload, payload, tolerance=0.25) == []
+    assert len(run_benchmarks.compare(slower, payload, tolerance=0.25)) == len(payload["results"])
@@ -0,0 +1,115 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import daemon
+import pull_and_collate
+import share_quotes
+from config import DaemonSettings
+
+
+def _monitor(tmp_path, monkeypatch, pages, pushes, units="fund,units,url\nFund A,100,u1\nFund B,50,u2\n"):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PAGE_CACHE", "false")
+    monkeypatch.setenv("WATCHLIST", "")
+    (tmp_path / "units.csv").write_text(units, encoding="utf-8")
+    pd.DataFrame([{"Date": "2026-04-15", "Total": 200.0, "Fund A": 100.0, "Fund B": 100.0, "Fund C": 100.0}]).to_csv(
+        "daily_totals.csv", index=False
+    )
+    monkeypatch.setattr(pull_and_collate, "price_scraper_fund", lambda url: {"title": url, "sell": pages[url]})
+    monkeypatch.setattr(share_quotes, "download_quotes", lambda symbols, currencies: {})
+    monkeypatch.setattr(daemon, "send_push_notification", lambda settings, subject, message: pushes.append(message))
+    settings = DaemonSettings(interval_seconds=1, portfolio_alert_pct=1.0, fund_alert_pct=3.0)
+    return daemon.IntradayMonitor(settings, {None: tmp_path / "units.csv"})
+
+
+def test_polls_reprice_changed_funds_and_alert_once_per_threshold(tmp_path, monkeypatch):
+    pages = {"u1": "100.00p", "u2": "200.00p"}
+    pushes = []
+    monitor = _monitor(tmp_path, monkeypatch, pages, pushes)
+    (state,) = monitor.portfolios
+
+    rebuilds = []
+    monkeypatch.setattr(daemon, "value_holdings", lambda *args: rebuilds.append(1) or pull_and_collate.value_holdings(*args))
+    assert monitor.poll("2026-04-16") == {None: []}
+
+    pages["u1"] = "104.00p"
+    (alerts,) = monitor.poll("2026-04-16").values()
+
+    assert [(alert.name, round(alert.pct, 2)) for alert in alerts] == [("Portfolio", 2.0), ("Fund A", 4.0)]
+    assert pushes == ["Portfolio: GBP 204.00 (+2.00% since close)\nFund A: GBP 104.00 (+4.00% since close)"]
+    assert state.total == pytest.approx(204.0)
+
+    pages["u1"] = "105.00p"
+    assert monitor.poll("2026-04-16") == {None: []}
+    pages["u1"] = "107.00p"
+    assert [alert.name for alert in monitor.poll("2026-04-16")[None]] == ["Portfolio", "Fund A"]
+    assert len(pushes) == 2
+    assert rebuilds == [1]
+
+    # A new day reloads the previous close and re-arms every alert.
+    assert [alert.name for alert in monitor.poll("2026-04-17")[None]] == ["Portfolio", "Fund A"]
+    assert len(pushes) == 3
+
+
+def test_failed_fund_triggers_a_rebuild_without_it(tmp_path, monkeypatch):
+    pages = {"u1": "100.00p", "u2": "200.00p"}
+    monitor = _monitor(tmp_path, monkeypatch, pages, [])
+    (state,) = monitor.portfolios
+    monitor.poll("2026-04-16")
+
+    pages["u2"] = None
+    monitor.poll("2026-04-16")
+    assert state.valuation.funds == ["Fund A"]
+    assert state.valuation.failed_units == {"Fund B": 50.0}
+
+    pages["u2"] = "210.00p"
+    monitor.poll("2026-04-16")
+    assert state.valuation.funds == ["Fund A", "Fund B"]
+    assert state.total == pytest.approx(205.0)
+
+
+def test_holding_without_a_url_is_matched_priced_and_alerted(tmp_path, monkeypatch):
+    monkeypatch.setenv("MATCH_SEARCH_URL", "https://hl.example/search-results/{letter}")
+    pages = {"u1": "100.00p", "u3": "100.00p"}
+    pushes = []
+    monitor = _monitor(tmp_path, monkeypatch, pages, pushes, units="fund,units,url\nFund A,100,u1\nFund C,100,\n")
+    monkeypatch.setattr(pull_and_collate, "price_scraper_fund", lambda url: {"title": {"u3": "Fund C"}.get(url, url), "sell": pages[url]})
+    searched = []
+    monkeypatch.setattr(pull_and_collate, "search_fund_pages", lambda url: searched.append(url) or [("Fund C", "u3")])
+    (state,) = monitor.portfolios
+
+    monitor.poll("2026-04-16")
+    assert [holding.url for holding in state.valuation.holdings] == ["u1", "u3"]
+    assert state.total == pytest.approx(200.0)
+
+    rebuilds = []
+    monkeypatch.setattr(daemon, "value_holdings", lambda *args: rebuilds.append(1) or pull_and_collate.value_holdings(*args))
+    pages["u3"] = "105.00p"
+    (alerts,) = monitor.poll("2026-04-16").values()
+
+    assert [alert.name for alert in alerts] == ["Portfolio", "Fund C"]
+    assert state.total == pytest.approx(205.0)
+    assert rebuilds == []
+    assert len(searched) == 1
+
+
+def test_run_daemon_stops_on_request(monkeypatch):
+    polls = []
+
+    class FakeMonitor:
+        settings = DaemonSettings(interval_seconds=60, portfolio_alert_pct=1, fund_alert_pct=3)
+
+        def poll(self):
+            polls.append(1)
+            if len(polls) == 2:
+                raise RuntimeError("HL down")
+            if len(polls) == 3:
+                stop.set()
+
+    stop = threading.Event()
+    monkeypatch.setattr(stop, "wait", lambda timeout: None)
+    daemon.run_daemon(stop, monitor=FakeMonitor())
+
+    assert len(polls) == 3
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+import requests
+
+import fetch_policy
+import metrics
+
+
+def _response(status: int, body: bytes = b"ok") -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    return response
+
+
+@pytest.fixture(autouse=True)
+def fresh_run(monkeypatch):
+    monkeypatch.setenv("FETCH_BACKOFF_SECONDS", "0")
+    monkeypatch.setenv("FETCH_RETRIES", "2")
+    monkeypatch.setenv("FETCH_HEDGE", "true")
+    fetch_policy.start_run_budget(60)
+    yield metrics.reset_run_metrics()
+    fetch_policy.start_run_budget()
+
+
+def test_transient_failures_are_retried(fresh_run, monkeypatch):
+    outcomes = [requests.ConnectionError("reset"), _response(503), _response(200)]
+
+    def fake_get(url, **kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(fetch_policy.http_client, "get", fake_get)
+
+    response = fetch_policy.fetch_with_retries("https://example.com/fund")
+
+    assert response.status_code == 200
+    (sample,) = fresh_run.fetches
+    assert sample.retries == 2 and sample.ok
+    # The hedge threshold sees each answered request, not the whole retried fetch.
+    assert len(fresh_run.attempt_seconds) == 2
+
+
+def test_gives_up_after_the_retry_limit(fresh_run, monkeypatch):
+    monkeypatch.setattr(fetch_policy.http_client, "get", lambda url, **kwargs: _response(503))
+
+    response = fetch_policy.fetch_with_retries("https://example.com/fund")
+
+    assert response.status_code == 503
+    (sample,) = fresh_run.fetches
+    assert sample.retries == 2 and not sample.ok
+
+
+def test_exhausted_budget_fails_fast(fresh_run, monkeypatch):
+    fetch_policy.start_run_budget(0)
+    monkeypatch.setattr(fetch_policy.http_client, "get", lambda url, **kwargs: pytest.fail("should not fetch"))
+
+    with pytest.raises(fetch_policy.DeadlineExceeded):
+        fetch_policy.fetch_with_retries("https://example.com/fund")
+    assert not fresh_run.fetches[0].ok
+
+
+def test_slow_request_is_hedged_past_p95(fresh_run, monkeypatch):
+    for _ in range(fetch_policy.HEDGE_MIN_SAMPLES):
+        fresh_run.record_attempt(0.01)
+    calls = []
+
+    def fake_get(url, **kwargs):
+        calls.append(url)
+        if len(calls) == 1:
+            time.sleep(1.0)
+            return _response(200, b"slow")
+        return _response(200, b"fast")
+
+    monkeypatch.setattr(fetch_policy.http_client, "get", fake_get)
+
+    start = time.perf_counter()
+    response = fetch_policy.fetch_with_retries("https://example.com/slow")
+
+    assert time.perf_counter() - start < 0.5
+    assert response.content == b"fast"
+    assert fresh_run.fetches[-1].hedged
+
+
+def test_busy_hedge_pool_falls_back_to_an_unhedged_request(fresh_run, monkeypatch):
+    for _ in range(fetch_policy.HEDGE_MIN_SAMPLES):
+        fresh_run.record_attempt(0.01)
+    monkeypatch.setattr(fetch_policy, "_submit", lambda *args: None)
+    monkeypatch.setattr(fetch_policy.http_client, "get", lambda url, **kwargs: _response(200))
+
+    response = fetch_policy.fetch_with_retries("https://example.com/fund")
+
+    assert response.status_code == 200
+    assert not fresh_run.fetches[-1].hedged
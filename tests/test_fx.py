@@ -0,0 +1,61 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import fx
+from config import FxSettings
+
+
+def _settings(tmp_path):
+    return FxSettings(api_url="https://fx.invalid/latest", cache_path=str(tmp_path / "fx_rates.json"))
+
+
+def test_get_gbp_rates_batches_and_caches_per_business_day(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_fetch(api_url, currencies):
+        calls.append(currencies)
+        return {"EUR": 0.85, "USD": 0.8}
+
+    monkeypatch.setattr(fx, "_fetch_rates", fake_fetch)
+    settings = _settings(tmp_path)
+
+    friday = fx.get_gbp_rates(["USD", "EUR", "GBP", "USD"], settings=settings, today=date(2026, 10, 16))
+    saturday = fx.get_gbp_rates(["EUR"], settings=settings, today=date(2026, 10, 17))
+
+    assert calls == [["EUR", "USD"]]
+    assert friday == {"GBP": 1.0, "EUR": 0.85, "USD": 0.8}
+    assert saturday == {"GBP": 1.0, "EUR": 0.85}
+
+
+def test_get_gbp_rates_skips_network_for_gbp_only(monkeypatch, tmp_path):
+    monkeypatch.setattr(fx, "_fetch_rates", lambda *args: pytest.fail("no request expected"))
+    assert fx.get_gbp_rates(["GBP"], settings=_settings(tmp_path)) == {"GBP": 1.0}
+
+
+def test_get_gbp_rates_falls_back_to_last_cached_rate_when_offline(tmp_path, monkeypatch):
+    settings = _settings(tmp_path)
+    monkeypatch.setattr(fx, "_fetch_rates", lambda api_url, currencies: {"USD": 0.8})
+    fx.get_gbp_rates(["USD"], settings=settings, today=date(2026, 10, 14))
+
+    def offline(api_url, currencies):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(fx, "_fetch_rates", offline)
+    assert fx.get_gbp_rates(["USD"], settings=settings, today=date(2026, 10, 15))["USD"] == 0.8
+    # A currency that never had a rate is left for the caller to exclude.
+    assert fx.get_gbp_rates(["EUR", "USD"], settings=settings, today=date(2026, 10, 15)) == {"GBP": 1.0, "USD": 0.8}
+
+
+def test_get_gbp_rates_keeps_the_rates_the_api_did_return(tmp_path, monkeypatch):
+    monkeypatch.setattr(fx, "_fetch_rates", lambda api_url, currencies: {"USD": 0.8})
+
+    assert fx.get_gbp_rates(["USD", "XAU"], settings=_settings(tmp_path), today=date(2026, 10, 14)) == {"GBP": 1.0, "USD": 0.8}
+
+
+def test_convert_to_gbp_is_column_wise():
+    values = pd.Series([100.0, 100.0, 100.0])
+    currencies = pd.Series(["GBP", "USD", "EUR"])
+    converted = fx.convert_to_gbp(values, currencies, {"GBP": 1.0, "USD": 0.8, "EUR": 0.85})
+    assert converted.tolist() == [100.0, 80.0, 85.0]
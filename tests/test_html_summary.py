@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import html_summary
+from share_quotes import ShareQuote
+
+
+GOLDEN_DIR = Path(__file__).parent / "fixtures" / "summaries"
+
+
+def _collated_portfolio() -> pd.DataFrame:
+    # The column set create_data_frame produces, including the leftover join columns.
+    names = ["Vanguard LifeStrategy 80%  Equity", "Fundsmith Equity I Acc", "iShares Share Class\tX", "New Fund"]
+    data = pd.DataFrame(
+        {
+            "Units": [120.5, 33.0, 1_000.123456789, 2.0],
+            "key": ["vanguard", "fundsmith", "ishares", "new"],
+            "Sell Price": [2.5431, 6.1, 0.9876, np.nan],
+            "Buy Price": ["254.31p", "610.00p", "$1.25", None],
+            "Change Value": ["+1.20p", "-3.00p", "+0.01", None],
+            "Percentage Change": ["+0.47%", "-0.49%", "+0.80%", None],
+            "fund_name": names,
+            "Currency": ["GBP", "GBP", "GBP", "GBP"],
+            "Total Holding Value": [306.44, 201.3, 987.72, 10.0],
+        },
+        index=pd.Index(names, name="Fund/Share"),
+    )
+    data["Stale"] = [False, False, False, True]
+    return data
+
+
+SCENARIOS = {
+    "mixed": lambda: (
+        _collated_portfolio(),
+        dict(
+            previous_total=1400.0,
+            previous_by_fund={"Vanguard LifeStrategy 80%  Equity": 300.0, "Fundsmith Equity I Acc": 210.0, "New Fund": 0.0},
+            share_quotes=[ShareQuote("ELIX.L", 152.5, -1.5, -0.97)],
+        ),
+    ),
+    "first_run": lambda: (_collated_portfolio().drop(columns="Stale"), dict(previous_total=None, previous_by_fund={})),
+    "values_only": lambda: (
+        pd.DataFrame({"Total Holding Value": [10.0, 2_500_000.5]}, index=pd.Index(["A", "B"], name="Fund/Share")),
+        dict(previous_total=2_600_000.0, previous_by_fund={"A": 12.0, "B": 2_400_000.0}, share_quotes=[ShareQuote("ELIX.L", 10.0, change_pct=0.5)]),
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(SCENARIOS))
+def test_output_matches_the_to_html_renderer(name):
+    data, kwargs = SCENARIOS[name]()
+    total = float(data["Total Holding Value"].sum())
+
+    rendered = html_summary.build_html_summary(data, total, "2026-04-16", **kwargs)
+
+    assert rendered == (GOLDEN_DIR / f"{name}.html").read_text(encoding="utf-8")
+
+
+def test_linked_stylesheet_replaces_the_inline_css(tmp_path):
+    data, kwargs = SCENARIOS["mixed"]()
+    total = float(data["Total Holding Value"].sum())
+    inline = html_summary.build_html_summary(data, total, "2026-04-16", **kwargs)
+
+    path = tmp_path / "daily_summary-2026-04-16.html"
+    with path.open("w", encoding="utf-8") as out:
+        html_summary.render_html_summary(out, data, total, "2026-04-16", stylesheet_href="summary.css", **kwargs)
+    linked = path.read_text(encoding="utf-8")
+
+    assert '<link rel="stylesheet" href="summary.css">' in linked
+    assert "<style>" not in linked and "<style>" in inline
+    assert linked[linked.index("<body>"):] == inline[inline.index("<body>"):]
+    assert html_summary.SUMMARY_CSS.strip() in inline
@@ -0,0 +1,67 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+import pytest
+
+import config
+from config import get_http_settings
+import http_client
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    http_client.reset_session()
+    yield f"http://127.0.0.1:{server.server_port}"
+    http_client.reset_session()
+    server.shutdown()
+    server.server_close()
+
+
+def test_session_is_shared_and_reuses_connections(local_server):
+    assert http_client.get_session() is http_client.get_session()
+
+    for _ in range(3):
+        response = http_client.get(f"{local_server}/page")
+        assert response.text == "ok"
+
+    stats = http_client.get_connection_stats()
+    assert stats.opened == 1
+    assert stats.reused == 2
+
+
+def test_connection_stats_are_zero_before_first_request():
+    http_client.reset_session()
+    assert http_client.get_connection_stats() == http_client.ConnectionStats(opened=0, reused=0)
+
+
+def test_malformed_number_settings_fall_back_to_their_defaults(monkeypatch):
+    for name in ("HTTP_TIMEOUT", "HTTP_POOL_SIZE", "SCRAPE_WORKERS", "FETCH_RETRIES", "PAGE_CACHE_MAX_MB", "ALERT_FUND_PCT", "MATCH_MIN_SCORE", "NOTIFY_TIMEOUT"):
+        monkeypatch.setenv(name, "lots")
+    monkeypatch.setenv("HTTP_POOL_HOSTS", "")
+
+    settings = get_http_settings()
+
+    assert (settings.timeout, settings.pool_hosts, settings.pool_size) == (20.0, 10, 10)
+    assert config.get_scrape_workers() == 8
+    assert config.get_fetch_settings().retries == 2
+    assert config.get_page_cache_settings().max_bytes == 50 * 1024 * 1024
+    assert config.get_daemon_settings().fund_alert_pct == 3.0
+    assert config.get_match_settings().min_score == 0.6
+    assert config.get_notify_timeout() == 60.0
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = ("pandas", "numpy", "requests", "bs4", "yfinance")
+
+
+def _import_times(code: str, cwd: Path = ROOT) -> dict[str, int]:
+    """Run ``code`` under ``-X importtime``; return each module's cumulative import time in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        env={"PYTHONPATH": str(ROOT), "PATH": ""},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times.setdefault(name.strip(), int(cumulative))
+    return times
+
+
+def test_importing_main_leaves_the_heavy_dependencies_unloaded():
+    main_times = _import_times("import main")
+    pandas_times = _import_times("import pandas")
+
+    assert not set(HEAVY_MODULES) & set(main_times)
+    assert main_times["main"] < pandas_times["pandas"] / 4
+
+
+def test_resend_runs_without_pandas_or_requests(tmp_path):
+    summaries = tmp_path / "summaries"
+    summaries.mkdir()
+    (summaries / "last_notification.json").write_text(
+        '{"date": "2026-04-16", "subject": "Daily Portfolio Summary - 2026-04-16", "push_message": "Portfolio total: GBP 1.00"}',
+        encoding="utf-8",
+    )
+    (summaries / "last_notification.html").write_text("<html></html>", encoding="utf-8")
+
+    times = _import_times("import main; main.main(['resend'])", cwd=tmp_path)
+
+    assert "notifications" in times
+    assert not set(HEAVY_MODULES) & set(times)
+
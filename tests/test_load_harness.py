@@ -0,0 +1,25 @@
+from benchmarks import load_harness
+
+
+def test_full_run_against_stand_ins():
+    config = load_harness.HlServerConfig(latency_ms=1.0, error_rate=0.0, page_kb=2)
+    (result,) = load_harness.run_load([12], config, workers=4)
+
+    assert result.status == "ok"
+    assert result.fetch_failures == 0
+    assert result.fetch_p95_seconds is not None
+    assert result.pushes == 1
+    assert result.emails == 1
+
+
+def test_failed_pages_are_retried_and_the_run_completes():
+    config = load_harness.HlServerConfig(error_rate=0.5, page_kb=2, seed=3)
+    with load_harness.stand_ins(config) as services:
+        result = load_harness.run_once(services, 20, workers=4)
+        (email,) = services.emails.messages
+
+    assert result.status == "ok"
+    assert result.fetch_retries > 0
+    assert result.fetch_failures < 20
+    assert email["user"] == "harness"
+    assert email["rcpt"] == ["inbox@localhost"]
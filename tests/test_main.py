@@ -0,0 +1,192 @@
+from array import array
+import json
+
+import pandas as pd
+import pytest
+
+import html_summary
+import main
+import notifications
+import persistence
+from portfolio_model import Holding, Quote, Valuation
+import pull_and_collate
+import share_quotes
+
+
+@pytest.fixture(autouse=True)
+def _local_run(tmp_path, monkeypatch):
+    # Run in a scratch directory, with no portfolios, channels or summary options from the environment.
+    monkeypatch.chdir(tmp_path)
+    for name in (
+        "PORTFOLIOS",
+        "NTFY_TOPIC",
+        "SMTP_HOST",
+        "SMTP_USER",
+        "SMTP_PASS",
+        "EMAIL_FROM",
+        "EMAIL_TO",
+        "EMAIL_ADDRESS",
+        "EMAIL_APP_PASSWORD",
+        "EMAIL_RECIPIENTS",
+        "SUMMARY_STYLESHEET",
+        "METRICS_PROMETHEUS",
+    ):
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.fixture
+def history_stores(monkeypatch):
+    # Every HistoryStore the run loads, to check its I/O counts afterwards.
+    stores = []
+
+    class SpyHistoryStore(persistence.HistoryStore):
+        @classmethod
+        def load(cls, *args, **kwargs):
+            store = super().load(*args, **kwargs)
+            stores.append(store)
+            return store
+
+    monkeypatch.setattr(persistence, "HistoryStore", SpyHistoryStore)
+    return stores
+
+
+def _stand_in_quotes(symbols, currencies):
+    return {symbol: share_quotes.RawQuote(150.0, None, "GBp") for symbol in symbols}
+
+
+def _portfolio(**kwargs):
+    holdings = [Holding("Fund A", 10, "u1", "fund a"), Holding("Fund B", 20, "u2", "fund b")]
+    quotes = [Quote("u1", "Fund A", "fund a", "Fund A", "150p"), Quote("u2", "Fund B", "fund b", "Fund B", "200p")]
+    return Valuation(holdings, quotes, array("d", [1.5, 2.0]), array("d", [15.0, 40.0]), **kwargs)
+
+
+def test_main_reads_and_writes_history_once(tmp_path, monkeypatch, history_stores):
+    pd.DataFrame([{"Date": "2000-01-01", "Total": 50.0, "Fund A": 10.0, "Fund B": 40.0}]).to_csv("daily_totals.csv", index=False)
+    monkeypatch.setattr(pull_and_collate, "create_valuation", lambda debug=False: _portfolio())
+    monkeypatch.setattr(share_quotes, "download_quotes", _stand_in_quotes)
+    calls = []
+    monkeypatch.setattr(persistence.pd, "read_csv", _counting(persistence.pd.read_csv, calls))
+
+    main.main([])
+
+    (store,) = history_stores
+    assert store.io.reads == 1
+    assert store.io.writes == 1
+    assert len(calls) == 1
+    history = pd.read_csv(tmp_path / "daily_totals.csv")
+    assert history["Total"].tolist() == [50.0, 55.0]
+    assert "+£5.00" in (tmp_path / "summaries" / "latest.html").read_text(encoding="utf-8")
+
+
+def test_main_writes_run_report(tmp_path, monkeypatch):
+    monkeypatch.setenv("METRICS_PROMETHEUS", "true")
+    monkeypatch.setattr(pull_and_collate, "create_valuation", lambda debug=False: _portfolio())
+    monkeypatch.setattr(share_quotes, "download_quotes", _stand_in_quotes)
+
+    main.main([])
+
+    (report_path,) = (tmp_path / "summaries").glob("run_report-*.json")
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert report["status"] == "ok"
+    assert {"share_quotes", "history_load", "history_update", "snapshot", "analytics", "render", "notify", "history_flush"} <= set(report["stages"])
+    assert json.loads((tmp_path / "analytics_state.json").read_text(encoding="utf-8"))["last_total"] == 55.0
+    (ledger_partition,) = (tmp_path / "price_ledger").glob("price_ledger-*.csv")
+    assert pd.read_csv(ledger_partition)["Fund"].tolist() == ["Fund A", "Fund B"]
+    prom = (tmp_path / "summaries" / "hl_daily_prices.prom").read_text(encoding="utf-8")
+    assert 'hl_stage_duration_seconds{stage="render"}' in prom
+
+
+def _counting(func, calls):
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def test_failed_funds_fall_back_to_last_known_value(tmp_path, monkeypatch, history_stores):
+    pd.DataFrame([{"Date": "2000-01-01", "Total": 80.0, "Fund A": 10.0, "Fund B": 40.0, "Fund C": 30.0}]).to_csv("daily_totals.csv", index=False)
+
+    monkeypatch.setattr(pull_and_collate, "create_valuation", lambda debug=False: _portfolio(failed_units={"Fund C": 3.0, "Fund D": 1.0}))
+    monkeypatch.setattr(share_quotes, "download_quotes", _stand_in_quotes)
+
+    main.main([])
+
+    (store,) = history_stores
+    assert store.io.reads == 1
+
+    history = pd.read_csv(tmp_path / "daily_totals.csv")
+    assert history["Total"].tolist() == [80.0, 85.0]
+    assert history["Fund C"].tolist() == [30.0, 30.0]
+    html = (tmp_path / "summaries" / "latest.html").read_text(encoding="utf-8")
+    assert 'Fund C <span class="stale">stale</span>' in html
+    assert "Fund D" not in html
+
+
+def test_linked_stylesheet_archive_keeps_inline_css_for_email(tmp_path, monkeypatch):
+    monkeypatch.setenv("SUMMARY_STYLESHEET", "linked")
+    monkeypatch.setattr(pull_and_collate, "create_valuation", lambda debug=False: _portfolio())
+    monkeypatch.setattr(share_quotes, "download_quotes", _stand_in_quotes)
+    emails = []
+    monkeypatch.setattr(notifications.Notifier, "notify", lambda self, subject, push, html: emails.append(html) or [])
+
+    main.main([])
+
+    summaries = tmp_path / "summaries"
+    archived = next(summaries.glob("daily_summary-*.html")).read_text(encoding="utf-8")
+    assert '<link rel="stylesheet" href="summary.css">' in archived
+    assert (summaries / "summary.css").read_text(encoding="utf-8") == html_summary.SUMMARY_CSS
+    assert (summaries / "latest.html").read_text(encoding="utf-8") == archived
+    (email,) = emails
+    assert "<style>" in email
+    assert email[email.index("<body>"):] == archived[archived.index("<body>"):]
+
+
+def test_dry_run_writes_and_sends_nothing(tmp_path, monkeypatch, capsys):
+    pd.DataFrame([{"Date": "2000-01-01", "Total": 50.0, "Fund A": 10.0, "Fund B": 40.0}]).to_csv("daily_totals.csv", index=False)
+    monkeypatch.setattr(pull_and_collate, "create_valuation", lambda debug=False: _portfolio())
+    monkeypatch.setattr(share_quotes, "download_quotes", _stand_in_quotes)
+    monkeypatch.setattr(notifications.Notifier, "notify", lambda *args: pytest.fail("dry run must not notify"))
+
+    main.main(["dry-run"])
+
+    assert "Portfolio total: GBP 55.00 (+5.00, +10.00%)" in capsys.readouterr().out
+    assert pd.read_csv(tmp_path / "daily_totals.csv")["Total"].tolist() == [50.0]
+    assert not (tmp_path / "summaries").exists()
+
+
+def test_resend_repeats_the_last_notification(tmp_path, monkeypatch):
+    monkeypatch.setattr(pull_and_collate, "create_valuation", lambda debug=False: _portfolio())
+    monkeypatch.setattr(share_quotes, "download_quotes", _stand_in_quotes)
+    sent = []
+    monkeypatch.setattr(notifications.Notifier, "notify", lambda self, *args: sent.append(args) or [])
+
+    main.main([])
+    monkeypatch.setattr(pull_and_collate, "create_valuation", lambda debug=False: pytest.fail("resend must not scrape"))
+    main.main(["resend"])
+
+    assert len(sent) == 2
+    assert sent[0] == sent[1]
+
+
+def test_resend_without_a_saved_notification_fails_cleanly():
+    with pytest.raises(SystemExit, match="No saved notification"):
+        main.main(["resend"])
+
+
+def test_render_rebuilds_the_latest_summary_from_history(tmp_path):
+    pd.DataFrame(
+        [
+            {"Date": "2026-04-15", "Total": 50.0, "Fund A": 10.0, "Fund B": 40.0},
+            {"Date": "2026-04-16", "Total": 55.0, "Fund A": 15.0, "Fund B": 40.0},
+        ]
+    ).to_csv("daily_totals.csv", index=False)
+
+    main.main(["render"])
+    main.main(["render", "--date", "2026-04-15"])
+
+    summaries = tmp_path / "summaries"
+    latest = (summaries / "latest.html").read_text(encoding="utf-8")
+    assert latest == (summaries / "daily_summary-2026-04-16.html").read_text(encoding="utf-8")
+    assert "+£5.00" in latest
+    assert (summaries / "daily_summary-2026-04-15.html").exists()
@@ -0,0 +1,130 @@
+import os
+
+import matching
+import pull_and_collate
+from config import MatchSettings
+from metrics import reset_run_metrics
+from portfolio_model import Quote, load_holdings
+from price_scraper import parse_fund_links
+
+
+UNITS = (
+    "fund,units,url\n"
+    "Baillie Gifford Japanese,10,u1\n"
+    "Fundsmith Equity I Acc,2,u2\n"
+    "Fundsmith Equity I Inc,3,u3\n"
+    "L&G Global Technology Index,4,u4\n"
+)
+
+
+def _index(tmp_path, text=UNITS):
+    path = tmp_path / "units.csv"
+    path.write_text(text, encoding="utf-8")
+    holdings, _ = load_holdings(path)
+    return matching.HoldingIndex.build(holdings)
+
+
+def test_titles_resolve_to_holdings_with_a_confidence(tmp_path):
+    index = _index(tmp_path)
+
+    exact = index.resolve("fundsmith equity i acc")
+    japan = index.resolve("Baillie Gifford Japanese Class B - Accumulation (GBP)")
+    income = index.resolve("Fundsmith Equity Class I - Income")
+    tech = index.resolve("L&G Global Technology Index Trust C Acc")
+
+    assert (exact.fund, exact.score, exact.method) == ("Fundsmith Equity I Acc", 1.0, "exact")
+    assert (japan.fund, japan.score) == ("Baillie Gifford Japanese", 1.0)
+    assert income.fund == "Fundsmith Equity I Inc"
+    assert tech.fund == "L&G Global Technology Index" and 0.6 < tech.score < 1.0
+    assert index.resolve("Baillie Gifford American Class B - Accumulation", min_score=0.6) is None
+    assert index.resolve("Some Unrelated Trust") is None
+
+
+def test_index_cache_is_reused_until_units_csv_changes(tmp_path, monkeypatch):
+    settings = MatchSettings(cache_path=str(tmp_path / "index.json"), min_score=0.6, search_url="")
+    path = tmp_path / "units.csv"
+    path.write_text(UNITS, encoding="utf-8")
+    holdings, _ = load_holdings(path)
+    matching.load_holding_index(path, holdings, settings)
+
+    built = []
+    monkeypatch.setattr(matching.HoldingIndex, "build", classmethod(lambda cls, holdings: built.append(1) or cls([], [], [], [])))
+    cached = matching.load_holding_index(path, holdings, settings)
+    assert not built and cached.resolve("Fundsmith Equity I Acc").method == "exact"
+
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    matching.load_holding_index(path, holdings, settings)
+    assert built == [1]
+
+
+def test_single_portfolio_recovers_moved_swapped_and_unlinked_holdings(tmp_path, monkeypatch):
+    listing = "https://hl.example/search-results/{letter}"
+    monkeypatch.setenv("MATCH_SEARCH_URL", listing)
+    pages = {
+        # u1 moved; HL's listing links the fund's new page.
+        "https://hl.example/search-results/b/bg-japanese": ("Baillie Gifford Japanese Class B - Accumulation", "100.00p"),
+        # units.csv has the two Fundsmith share classes' URLs swapped.
+        "u2": ("Fundsmith Equity Class I - Income", "500.00p"),
+        "u3": ("Fundsmith Equity Class I - Accumulation", "600.00p"),
+        "https://hl.example/search-results/l/lg-tech": ("L&G Global Technology Index Trust C Acc", "50.00p"),
+    }
+
+    def fake_scraper(url):
+        if url not in pages:
+            raise RuntimeError("404")
+        title, sell = pages[url]
+        return {"title": title, "sell": sell}
+
+    searched = []
+
+    def fake_search(url):
+        searched.append(url)
+        html = {
+            "b": '<a href="bg-american">Baillie Gifford American Class B - Accumulation</a>'
+            '<a href="bg-japanese">Baillie Gifford Japanese Class B - Accumulation</a>',
+            "l": '<a href="/search-results/l/lg-tech">L&amp;G Global Technology Index Trust C Acc</a>',
+        }[url[-1]]
+        return parse_fund_links(html, url)
+
+    monkeypatch.setattr(pull_and_collate, "price_scraper_fund", fake_scraper)
+    monkeypatch.setattr(pull_and_collate, "search_fund_pages", fake_search)
+    metrics = reset_run_metrics()
+    path = tmp_path / "units.csv"
+    # The L&G holding was added by name only.
+    path.write_text(UNITS.replace(",4,u4", ",4,"), encoding="utf-8")
+
+    valuation = pull_and_collate.create_valuation(units_path=path)
+
+    assert {holding.fund: holding.url for holding in valuation.holdings} == {
+        "Baillie Gifford Japanese": "https://hl.example/search-results/b/bg-japanese",
+        "Fundsmith Equity I Acc": "u3",
+        "Fundsmith Equity I Inc": "u2",
+        "L&G Global Technology Index": "https://hl.example/search-results/l/lg-tech",
+    }
+    assert valuation.total() == 10.0 + 12.0 + 15.0 + 2.0
+    assert valuation.failed_units == {}
+    assert metrics.counters["title_mismatches"] == 2
+    assert searched == [listing.format(letter="b"), listing.format(letter="l")]
+
+
+def test_one_url_shared_across_accounts_prices_every_account(tmp_path):
+    units = (
+        "fund,units,url\n"
+        "Fundsmith Equity I Acc (ISA),2,u1\n"
+        "Fundsmith Equity I Acc (SIPP),3,u1\n"
+        "Baillie Gifford Japanese,10,u2\n"
+    )
+    path = tmp_path / "units.csv"
+    path.write_text(units, encoding="utf-8")
+    holdings, _ = load_holdings(path)
+    index = matching.HoldingIndex.build(holdings)
+    title = "Fundsmith Equity Class I - Accumulation"
+    quotes = {"u1": Quote("u1", title, title.lower(), title, "600.00p")}
+    metrics = reset_run_metrics()
+
+    resolved = pull_and_collate.resolve_holdings(holdings, quotes, index, MatchSettings(str(tmp_path / "index.json"), 0.6, ""))
+
+    assert index.resolve(title, 0.6).fund == "Fundsmith Equity I Acc (ISA)"
+    assert [holding.url for holding in resolved] == ["u1", "u1", ""]
+    assert metrics.counters.get("title_mismatches", 0) == 0
@@ -0,0 +1,56 @@
+import requests
+
+import fetch_policy
+import metrics
+import price_scraper
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert metrics.percentile(values, 50) == 50.0
+    assert metrics.percentile(values, 95) == 95.0
+    assert metrics.percentile([0.3], 95) == 0.3
+    assert metrics.percentile([], 50) is None
+
+
+def test_report_summarises_fetches_and_stages():
+    run = metrics.RunMetrics()
+    with run.stage("scrape"):
+        pass
+    for index in range(20):
+        run.record_fetch(metrics.FetchSample(f"https://example.com/{index}", (index + 1) / 100, 1000, 200))
+    run.record_fetch(metrics.FetchSample("https://example.com/down", 5.0, 0, None, ok=False))
+    run.increment("scrape_failures")
+
+    report = run.report()
+    assert "scrape" in report["stages"]
+    assert report["fetch"]["count"] == 21
+    assert report["fetch"]["failures"] == 1
+    assert report["fetch"]["bytes"] == 20_000
+    assert report["fetch"]["p50_seconds"] == 0.11
+    assert report["fetch"]["p95_seconds"] == 0.2
+    assert report["counters"] == {"scrape_failures": 1}
+
+    text = metrics.prometheus_text(report)
+    assert 'hl_fetch_latency_seconds{quantile="0.95"} 0.200000' in text
+    assert "hl_fetch_latency_seconds_sum 7.100000" in text
+    assert "hl_fetch_latency_seconds_count 21" in text
+    assert "hl_fetch_failures_total 1" in text
+    assert "hl_scrape_failures_total 1" in text
+
+
+def test_fund_fetches_are_recorded(monkeypatch):
+    run = metrics.reset_run_metrics()
+    response = requests.Response()
+    response.status_code = 200
+    response._content = b"<html>Sell: 1.00p</html>"
+    monkeypatch.setattr(price_scraper, "get_page_cache", lambda: None)
+    monkeypatch.setattr(fetch_policy.http_client, "get", lambda url, **kwargs: response)
+
+    price_scraper.price_scraper_fund("https://example.com/fund")
+
+    (sample,) = run.fetches
+    assert sample.url == "https://example.com/fund"
+    assert sample.bytes == len(response._content)
+    assert sample.status == 200 and sample.ok
+    assert len(run.parse_seconds) == 1
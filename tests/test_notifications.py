@@ -1,4 +1,11 @@
-from notifications import build_notification_subject, format_push_message
+import threading
+import time
+
+from benchmarks import load_harness
+from config import EmailSettings, PushSettings
+import notifications
+from notifications import Notifier, build_notification_subject, format_push_message
+from share_quotes import ShareQuote
 
 
 def test_build_notification_subject():
@@ -18,22 +25,78 @@ def test_format_push_message_with_zero_previous_total():
     assert format_push_message(12345.67, 0.0) == "Portfolio total: GBP 12,345.67 (+12,345.67)"
 
 
-def test_format_push_message_with_elix_quote_and_change():
-    message = format_push_message(
-        12345.67,
-        12193.57,
-        elix_price_pence=152.5,
-        elix_change_pence=1.5,
-        elix_change_pct=1.23,
-    )
+def test_format_push_message_with_share_quote_and_change():
+    message = format_push_message(12345.67, 12193.57, [ShareQuote("ELIX.L", 152.5, 1.5, 1.23)])
     assert message == "Portfolio total: GBP 12,345.67 (+152.10, +1.25%)\nLON:ELIX: 152.50p (+1.50p DoD, +1.23%)"
 
 
-def test_format_push_message_with_elix_quote_without_change():
-    message = format_push_message(12345.67, None, elix_price_pence=152.5)
+def test_format_push_message_with_share_quote_without_change():
+    message = format_push_message(12345.67, None, [ShareQuote("ELIX.L", 152.5)])
     assert message == "Portfolio total: GBP 12,345.67\nLON:ELIX: 152.50p"
 
 
-def test_format_push_message_with_elix_quote_and_only_pct_change():
-    message = format_push_message(12345.67, None, elix_price_pence=152.5, elix_change_pct=-0.45)
-    assert message == "Portfolio total: GBP 12,345.67\nLON:ELIX: 152.50p (-0.45% DoD)"
+def test_format_push_message_lists_every_watchlist_quote():
+    message = format_push_message(12345.67, None, [ShareQuote("ELIX.L", 152.5, change_pct=-0.45), ShareQuote("AAPL", 19_000.0)])
+    assert message == "Portfolio total: GBP 12,345.67\nLON:ELIX: 152.50p (-0.45% DoD)\nAAPL: 19000.00p"
+
+
+def test_notifier_fans_out_and_reuses_one_smtp_login():
+    config = load_harness.HlServerConfig()
+    with load_harness.stand_ins(config) as services:
+        push = PushSettings(base_url=services.ntfy_url, topic="alerts, family", token="")
+        email = EmailSettings("127.0.0.1", services.smtp_port, "user", "pass", "me@localhost", ("you@localhost",), starttls=False)
+        with Notifier(push, email, timeout=10) as notifier:
+            first = notifier.notify("Subject 1", "push 1", "<p>one</p>")
+            second = notifier.notify("Subject 2", "push 2", "<p>two</p>")
+            logins = notifier._smtp.logins
+        pushes = list(services.pushes.messages)
+        emails = list(services.emails.messages)
+
+    assert {result.channel for result in first} == {"ntfy:alerts", "ntfy:family", "email"}
+    assert all(result.ok for result in first + second)
+    assert sorted(message["topic"] for message in pushes) == ["alerts", "alerts", "family", "family"]
+    assert len(emails) == 2
+    assert logins == 1
+
+
+def test_slow_channel_does_not_block_the_others(monkeypatch):
+    release = threading.Event()
+    sent = []
+    monkeypatch.setattr(notifications, "_post_push", lambda settings, topic, *args: release.wait(5) if topic == "slow" else sent.append(topic))
+    push = PushSettings(base_url="http://unused", topic="slow,fast", token="")
+    email = EmailSettings("", 587, "", "", "", ())
+
+    start = time.perf_counter()
+    with Notifier(push, email, timeout=0.2) as notifier:
+        results = {result.channel: result for result in notifier.notify("Subject", "message", "<p></p>")}
+    release.set()
+
+    assert time.perf_counter() - start < 2
+    assert sent == ["fast"]
+    assert results["ntfy:fast"].ok
+    assert not results["ntfy:slow"].ok and results["ntfy:slow"].error == "timed out"
+    assert "email" not in results
+
+
+def test_close_does_not_wait_on_a_hung_email_send():
+    settings = EmailSettings("127.0.0.1", 25, "user", "pass", "me@localhost", ("you@localhost",))
+    connection = notifications.SmtpConnection(settings)
+    closed = threading.Event()
+
+    class HungSmtp:
+        def send_message(self, msg):
+            closed.wait(5)
+
+        def close(self):
+            closed.set()
+
+    connection._smtp = HungSmtp()
+    sender = threading.Thread(target=connection.send, args=(None,))
+    sender.start()
+    time.sleep(0.05)
+
+    start = time.perf_counter()
+    connection.close()
+    assert time.perf_counter() - start < 1
+    assert closed.is_set()
+    sender.join(1)
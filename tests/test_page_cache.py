@@ -0,0 +1,88 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+import time
+
+import pytest
+
+import http_client
+import price_scraper
+from page_cache import PageCache
+
+
+PAGE = b"""<html><head><meta property="og:title" content="Fund A Accumulation"></head>
+<body>Sell: 123.45p Buy: 123.45p Change: +1.00p (+0.82%)</body></html>"""
+
+
+class _EtagHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    bodies_sent = 0
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        type(self).bodies_sent += 1
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fund_server():
+    _EtagHandler.bodies_sent = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EtagHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    http_client.reset_session()
+    yield f"http://127.0.0.1:{server.server_port}/fund-a"
+    http_client.reset_session()
+    server.shutdown()
+    server.server_close()
+
+
+def test_unchanged_page_skips_download_and_parse(tmp_path, monkeypatch, fund_server):
+    cache = PageCache(tmp_path, max_bytes=10_000_000, max_age_days=14)
+    monkeypatch.setattr(price_scraper, "get_page_cache", lambda: cache)
+
+    first = price_scraper.price_scraper_fund(fund_server)
+
+    def fail(_html):
+        raise AssertionError("memoised parse should be reused")
+
+    monkeypatch.setattr(price_scraper, "parse_fund_html", fail)
+    second = price_scraper.price_scraper_fund(fund_server)
+
+    assert second == first
+    assert first["sell"] == "123.45p"
+    assert _EtagHandler.bodies_sent == 1
+    assert cache.stats.downloaded == 1
+    assert cache.stats.not_modified == 1
+    assert cache.stats.parse_hits == 1
+    assert cache.stats.parse_misses == 1
+
+
+def test_evict_drops_stale_then_least_recently_used(tmp_path):
+    cache = PageCache(tmp_path, max_bytes=10_000_000, max_age_days=14)
+    stale = cache.store("https://example.test/stale", b"old", None, None, "utf-8")
+    fresh = cache.store("https://example.test/fresh", b"new", None, None, "utf-8")
+    stale_meta, _ = cache._page_paths(stale.url)
+    long_ago = time.time() - 30 * 86400
+    os.utime(stale_meta, (long_ago, long_ago))
+
+    assert cache.evict() == 1
+    assert cache.lookup(stale.url) is None
+    assert cache.lookup(fresh.url) == fresh
+
+    cache.max_bytes = 0
+    cache.evict()
+    assert cache.lookup(fresh.url) is None
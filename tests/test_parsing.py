@@ -1,8 +1,17 @@
+from pathlib import Path
+
 import pandas as pd
+import pytest
 
+import price_scraper
 from price_scraper import parse_fund_html
-from pull_and_collate import normalise_merged_dataframe
-from utilities import convert_value_to_gbp, infer_currency, parse_price_to_gbp
+from utilities import (
+    contains_share,
+    infer_currencies,
+    infer_currency,
+    parse_price_to_gbp,
+    parse_prices_to_gbp,
+)
 
 
 def test_parse_fund_html_extracts_expected_fields():
@@ -24,33 +33,91 @@ def test_parse_fund_html_extracts_expected_fields():
     assert parsed["buy"] == "£125.67"
 
 
+FUND_PAGES = sorted((Path(__file__).parent / "fixtures" / "fund_pages").glob("*.html"))
+
+
+@pytest.mark.parametrize("page", FUND_PAGES, ids=lambda page: page.stem)
+def test_fast_and_soup_parsers_agree(page):
+    html = page.read_text(encoding="utf-8")
+    soup_result = price_scraper._parse_fund_html_soup(html)
+    fast_result = price_scraper._parse_fund_html_fast(html)
+
+    assert parse_fund_html(html) == soup_result
+    for field, value in fast_result.items():
+        if value is not None:
+            assert value == soup_result[field]
+
+
+def test_parse_fund_html_skips_soup_when_fast_path_finds_everything(monkeypatch):
+    html = (Path(__file__).parent / "fixtures" / "fund_pages" / "hl_factsheet.html").read_text(encoding="utf-8")
+
+    def fail(_html):
+        raise AssertionError("BeautifulSoup fallback should not run")
+
+    monkeypatch.setattr(price_scraper, "_parse_fund_html_soup", fail)
+    assert parse_fund_html(html) == {
+        "title": "Baillie Gifford Japanese Class B - Accumulation (GBP)",
+        "sell": "1,234.56p",
+        "buy": "1,234.56p",
+        "change_value": "+12.34p",
+        "change_pct": "+1.01%",
+    }
+
+
+@pytest.mark.parametrize(
+    ("page", "sell", "currency"),
+    [("eur_price", "€1,234.56", "EUR"), ("code_suffixed_price", "412.77 USD", "USD")],
+)
+def test_foreign_prices_are_scraped_with_their_currency(page, sell, currency):
+    html = (Path(__file__).parent / "fixtures" / "fund_pages" / f"{page}.html").read_text(encoding="utf-8")
+
+    parsed = price_scraper._parse_fund_html_fast(html)
+
+    assert parsed["sell"] == sell
+    assert infer_currency(parsed["sell"]) == currency
+    assert parse_price_to_gbp(parsed["sell"], is_share=True) == float(sell.strip("€ USD").replace(",", ""))
+
+
 def test_parse_price_to_gbp_handles_fund_and_share_values():
     assert parse_price_to_gbp("123.45p", is_share=False) == 1.2345
     assert parse_price_to_gbp("£123.45", is_share=True) == 123.45
 
 
-def test_currency_helpers_convert_usd_values():
+def test_infer_currency_reads_price_symbols():
     assert infer_currency("$123.45") == "USD"
     assert infer_currency("£123.45") == "GBP"
-    assert convert_value_to_gbp(100.0, "USD", 0.8) == 80.0
-    assert convert_value_to_gbp(100.0, "GBP", 0.8) == 100.0
-
-
-def test_normalise_merged_dataframe_converts_prices_and_values(monkeypatch):
-    monkeypatch.setattr("pull_and_collate.get_usd_gbp_rate", lambda: 0.8)
-    merged = pd.DataFrame(
-        {
-            "units": [2, 3],
-            "sell": ["123.45p", "$10.00"],
-            "title": ["Fund A", "Share B"],
-        },
-        index=["Fund A", "Share B"],
+
+
+def test_currency_helpers_handle_eur_and_codes():
+    assert infer_currency("€12.50") == "EUR"
+    assert infer_currency("12.50 CHF") == "CHF"
+    assert parse_price_to_gbp("€1,012.50", is_share=True) == 1012.5
+    assert parse_price_to_gbp("12.50 CHF", is_share=True) == 12.5
+
+
+def test_three_capitals_that_are_not_an_iso_code_stay_out_of_the_price():
+    parsed = price_scraper._parse_fund_html_fast("<div>Sell: 123.45p NAV</div><div>Buy: 124.00p</div>")
+
+    assert parsed["sell"] == "123.45p"
+    assert infer_currency("123.45p NAV") == "GBP"
+
+
+def test_vectorised_helpers_match_scalar_helpers():
+    prices = pd.Series(["123.45p", "£1,234.56", "$10.00", "€9.99", "12.50 CHF", " 99.00p ", "¥1,000.00", "USD 5.00"])
+    is_share = pd.Series([False, True, True, False, True, False, True, False])
+    names = pd.Series(
+        ["  Legal & General Global", "HSBC FTSE All-ShareIndexAccumulation", "Baillie Gifford JapaneseClass B", "L&G", "Straße\nFund Share"]
     )
 
-    normalised = normalise_merged_dataframe(merged)
+    assert parse_prices_to_gbp(prices, is_share).tolist() == [
+        parse_price_to_gbp(price, is_share=flag) for price, flag in zip(prices, is_share)
+    ]
+    assert infer_currencies(prices).tolist() == [infer_currency(price) for price in prices]
+    assert contains_share(names).tolist() == [False, True, False, False, True]
+
 
-    assert normalised.loc["Fund A", "sell"] == 1.2345
-    assert normalised.loc["Fund A", "value"] == 2.469
-    assert normalised.loc["Share B", "sell"] == 10.0
-    assert normalised.loc["Share B", "value"] == 24.0
-    assert set(normalised["currency"]) == {"GBP"}
+def test_vectorised_price_parse_rejects_a_doubled_pence_suffix():
+    with pytest.raises(ValueError):
+        parse_price_to_gbp("12.50pp", is_share=False)
+    with pytest.raises(ValueError):
+        parse_prices_to_gbp(pd.Series(["1.00p", "12.50pp"]), pd.Series([False, False]))
@@ -1,7 +1,9 @@
 from pathlib import Path
 
 import pandas as pd
+import pytest
 
+import history_store
 import persistence
 
 
@@ -55,3 +57,109 @@ def test_update_daily_totals_writes_and_updates_history(tmp_path):
     assert len(second) == 1
     assert second.loc[0, "Total"] == 60.0
     assert second.loc[0, "Fund A"] == 20.0
+
+
+def test_long_history_appends_upserts_and_round_trips_wide(tmp_path):
+    wide_path = tmp_path / "daily_totals.csv"
+    pd.DataFrame(
+        [
+            {"Date": "2025-12-31", "Total": 100.0, "Fund A": 60.0, "Fund B": 40.0},
+            {"Date": "2026-01-02", "Total": 110.0, "Fund A": 110.0, "Fund B": None},
+        ]
+    ).to_csv(wide_path, index=False)
+    history_dir = tmp_path / "history"
+
+    written = history_store.migrate_wide_csv(wide_path, history_dir)
+    assert [path.name for path in written] == ["daily_totals-2025.csv", "daily_totals-2026.csv"]
+
+    history_store.upsert_day(history_dir, "2026-01-05", {"Total": 120.0, "Fund A": 120.0})
+    history_store.upsert_day(history_dir, "2026-01-05", {"Total": 125.0, "Fund A": 125.0})
+    partition = history_store.partition_path(history_dir, "2026").read_text(encoding="utf-8").splitlines()
+    assert partition == ["Date,Fund,Value", "2026-01-02,Total,110.0", "2026-01-02,Fund A,110.0", "2026-01-05,Total,125.0", "2026-01-05,Fund A,125.0"]
+
+    exported = history_store.export_wide_csv(history_dir, tmp_path / "exported.csv")
+    assert list(exported.columns) == ["Date", "Total", "Fund A", "Fund B"]
+    assert exported["Total"].tolist() == [100.0, 110.0, 125.0]
+    assert pd.isna(exported.loc[1, "Fund B"])
+
+
+def test_last_recorded_date_survives_a_tail_cut_inside_a_multibyte_character(tmp_path):
+    path = tmp_path / "daily_totals-2026.csv"
+    for padding in range(40):
+        rows = [f"2026-01-{day:02d},Société Générale Fonds Épargne {'é' * padding},{day}.0" for day in range(1, 29)]
+        path.write_text("\n".join(["Date,Fund,Value", *rows * 3]) + "\n", encoding="utf-8")
+
+        assert history_store.last_recorded_date(path) == "2026-01-28"
+
+
+def test_upsert_ignores_a_temp_file_left_by_a_crashed_write(tmp_path):
+    path = tmp_path / "history-2026.csv"
+    (tmp_path / ".history-2026.csv.tmp").write_text("Date,Fund,Value\n2026-04-01,Stale,1.0\n", encoding="utf-8")
+
+    history_store.upsert_rows(path, "2026-04-16", [("2026-04-16", "Fund A", 2.0)], history_store.LONG_COLUMNS)
+
+    assert path.read_text(encoding="utf-8").splitlines() == ["Date,Fund,Value", "2026-04-16,Fund A,2.0"]
+
+
+def test_long_history_mode_writes_partitions_and_reads_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv("HISTORY_FORMAT", "long")
+    monkeypatch.setattr(persistence, "PRIVATE_HISTORY_DIR", tmp_path / "private" / "history")
+    monkeypatch.setattr(persistence, "DEFAULT_HISTORY_DIR", tmp_path / "history")
+    data = pd.DataFrame({"Total Holding Value": [10.0, 20.0]}, index=["Fund A", "Fund B"])
+
+    persistence.update_daily_totals(data, 30.0, "2026-04-15")
+    persistence.update_daily_totals(data * 2, 60.0, "2026-04-16")
+
+    assert (tmp_path / "history" / "daily_totals-2026.csv").exists()
+    previous_total, previous_by_fund = persistence.load_previous_snapshot("2026-04-16", ["Fund A", "Fund C"])
+    assert previous_total == 30.0
+    assert previous_by_fund == {"Fund A": 10.0}
+
+
+def test_load_previous_snapshot_reads_tail_without_parsing_history(tmp_path, monkeypatch):
+    history_path = tmp_path / "daily_totals.csv"
+    rows = [{"Date": f"2025-{month:02d}-{day:02d}", "Total": 1.0, "Fund, Inc": 1.0} for month in range(1, 13) for day in range(1, 29)]
+    rows += [
+        {"Date": "2026-04-15", "Total": 110.0, "Fund, Inc": 70.0, "Fund B": None},
+        {"Date": "2026-04-16", "Total": 120.0, "Fund, Inc": 80.0, "Fund B": 5.0},
+    ]
+    pd.DataFrame(rows).to_csv(history_path, index=False)
+
+    monkeypatch.setattr(persistence, "PRIVATE_HISTORY_PATH", tmp_path / "private" / "daily_totals.csv")
+    monkeypatch.setattr(persistence, "DEFAULT_HISTORY_PATH", history_path)
+    monkeypatch.setattr(persistence.pd, "read_csv", lambda *args, **kwargs: pytest.fail("full parse not expected"))
+
+    previous_total, previous_by_fund = persistence.load_previous_snapshot("2026-04-16", ["Fund, Inc", "Fund B"])
+    assert previous_total == 110.0
+    assert previous_by_fund == {"Fund, Inc": 70.0}
+
+
+def test_history_store_reads_the_tail_until_it_needs_the_frame(tmp_path, monkeypatch):
+    history_path = tmp_path / "daily_totals.csv"
+    pd.DataFrame(
+        [
+            {"Date": "2026-04-14", "Total": 100.0, "Fund A": 60.0},
+            {"Date": "2026-04-15", "Total": 110.0, "Fund A": 70.0},
+        ]
+    ).to_csv(history_path, index=False)
+    read_csv = pd.read_csv
+    parses = []
+    monkeypatch.setattr(persistence.pd, "read_csv", lambda *args, **kwargs: parses.append(1) or read_csv(*args, **kwargs))
+
+    store = persistence.HistoryStore.load(str(history_path))
+    assert store.previous_snapshot("2026-04-16", ["Fund A"]) == (110.0, {"Fund A": 70.0})
+    assert parses == []
+
+    store.record(pd.DataFrame({"Total Holding Value": [5.0]}, index=["Fund A"]), 5.0, "2026-04-13")
+    assert store.previous_snapshot("2026-04-14", ["Fund A"]) == (5.0, {"Fund A": 5.0})
+    assert parses == [1]
+
+
+def test_update_daily_totals_keeps_history_sorted_for_out_of_order_dates(tmp_path):
+    history_path = tmp_path / "daily_totals.csv"
+    data = pd.DataFrame({"Total Holding Value": [10.0]}, index=["Fund A"])
+
+    persistence.update_daily_totals(data, 10.0, "2026-04-16", filename=str(history_path))
+    history = persistence.update_daily_totals(data, 9.0, "2026-04-14", filename=str(history_path))
+
+    assert history["Date"].tolist() == ["2026-04-14", "2026-04-16"]
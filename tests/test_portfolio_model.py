@@ -0,0 +1,97 @@
+import pytest
+
+import portfolio_model
+from portfolio_model import Quote, load_holdings, value_holdings
+
+
+def _quote(url, sell, title=None):
+    return Quote.from_fields(url, title or url, {"title": title or f"Fund {url}", "sell": sell, "buy": None})
+
+
+def test_load_holdings_keeps_csv_order_and_skips_incomplete_rows(tmp_path):
+    path = tmp_path / "units.csv"
+    path.write_text("fund,account,units,url\nFund A,ISA,10,u1\n\nFund B,SIPP,2.5,u2\nFund C,ISA,,u3\nNA,ISA,1,u4\nFund D,SIPP,3,\n", encoding="utf-8")
+
+    holdings, columns = load_holdings(path)
+
+    assert [(holding.fund, holding.units, holding.url) for holding in holdings] == [("Fund A", 10, "u1"), ("Fund B", 2.5, "u2"), ("Fund D", 3, "")]
+    assert isinstance(holdings[0].units, int)
+    assert holdings[1].extra == (("account", "SIPP"),)
+    assert columns == ("account", "units")
+
+
+def test_load_holdings_requires_the_matching_columns(tmp_path):
+    path = tmp_path / "units.csv"
+    path.write_text("fund,units\nFund A,10\n", encoding="utf-8")
+
+    with pytest.raises(ValueError, match="missing required columns: url"):
+        load_holdings(path)
+
+
+def test_value_holdings_prices_funds_in_pence_and_shares_in_pounds(tmp_path, monkeypatch):
+    import pandas as pd
+
+    monkeypatch.setattr(portfolio_model, "get_gbp_rates", lambda currencies: {"GBP": 1.0, "USD": 0.8})
+    # Pricing stays off pandas; frames are only built by to_frame().
+    monkeypatch.setattr(pd, "Series", lambda *args, **kwargs: pytest.fail("valuation built a Series"))
+    path = tmp_path / "units.csv"
+    path.write_text("fund,units,url\nFund A,10,u1\nSome Share plc,4,u2\nUS Fund,5,u3\nGone,3,u4\n", encoding="utf-8")
+    holdings, columns = load_holdings(path)
+    quotes = {quote.url: quote for quote in (_quote("u1", "150.00p"), _quote("u2", "£2.50"), _quote("u3", "$250.00"))}
+
+    valuation = value_holdings(holdings, quotes, columns)
+
+    assert valuation.funds == ["Fund A", "Some Share plc", "US Fund"]
+    assert valuation.sell_price.tolist() == [1.5, 2.5, 2.5]
+    assert valuation.value.tolist() == [15.0, 10.0, 10.0]
+    assert valuation.total() == 35.0
+    assert valuation.failed_units == {"Gone": 3.0}
+
+
+def test_value_holdings_skips_fx_when_all_gbp(tmp_path, monkeypatch):
+    def fail(currencies):
+        raise AssertionError("FX lookup should be skipped for GBP-only holdings")
+
+    monkeypatch.setattr(portfolio_model, "get_gbp_rates", fail)
+    path = tmp_path / "units.csv"
+    path.write_text("fund,units,url\nFund A,2,u1\nShare B plc,3,u2\n", encoding="utf-8")
+    holdings, columns = load_holdings(path)
+
+    valuation = value_holdings(holdings, {"u1": _quote("u1", "100.00p"), "u2": _quote("u2", "£1,234.50")}, columns)
+
+    assert valuation.value.tolist() == [2.0, 3703.5]
+    assert valuation.currencies == ["GBP", "GBP"]
+
+
+def test_stale_rows_and_frame_edge(tmp_path, monkeypatch):
+    path = tmp_path / "units.csv"
+    path.write_text("fund,units,url\nFund A,10,u1\nFund B,4,u2\nFund C,2,u3\n", encoding="utf-8")
+    holdings, columns = load_holdings(path)
+    valuation = value_holdings(holdings, {"u1": _quote("u1", "150.00p")}, columns)
+
+    stale = valuation.with_stale({"Fund B": 8.0})
+    data = stale.to_frame()
+
+    assert stale.total() == 23.0
+    assert data.index.tolist() == ["Fund A", "Fund B"]
+    assert data.columns.tolist() == [
+        "Units", "key", "Sell Price", "Buy Price", "Change Value", "Percentage Change",
+        "key_src", "fund_name", "Currency", "Total Holding Value", "Stale",
+    ]
+    assert data["Stale"].tolist() == [False, True]
+    assert data.loc["Fund B", "Sell Price"] == 2.0
+    assert data.attrs["failed_units"] == {"Fund B": 4.0, "Fund C": 2.0}
+
+
+def test_a_currency_with_no_gbp_rate_excludes_only_that_holding(tmp_path, monkeypatch):
+    monkeypatch.setattr(portfolio_model, "get_gbp_rates", lambda currencies: {"GBP": 1.0, "USD": 0.8})
+    path = tmp_path / "units.csv"
+    path.write_text("fund,units,url\nFund A,10,u1\nSwiss Fund,5,u2\nUS Fund,5,u3\n", encoding="utf-8")
+    holdings, columns = load_holdings(path)
+    quotes = {quote.url: quote for quote in (_quote("u1", "150.00p"), _quote("u2", "12.50 CHF"), _quote("u3", "$250.00"))}
+
+    valuation = value_holdings(holdings, quotes, columns)
+
+    assert valuation.funds == ["Fund A", "US Fund"]
+    assert valuation.failed_units == {"Swiss Fund": 5.0}
+    assert valuation.total() == 25.0
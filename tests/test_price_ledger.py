@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+
+import portfolio_model
+import price_ledger
+from persistence import HistoryStore, update_daily_totals
+from portfolio_model import Quote, load_holdings, value_holdings
+
+
+def _valuation(tmp_path, monkeypatch, prices, usd_rate=0.8):
+    monkeypatch.setattr(portfolio_model, "get_gbp_rates", lambda currencies: {"GBP": 1.0, "USD": usd_rate})
+    path = tmp_path / "units.csv"
+    path.write_text("fund,units,url\nFund A,10,u1\nUS Fund,5,u2\nFund C,2,u3\n", encoding="utf-8")
+    holdings, columns = load_holdings(path)
+    quotes = {
+        url: Quote.from_fields(url, url, {"title": url, "sell": sell, "buy": buy})
+        for url, (sell, buy) in prices.items()
+    }
+    valuation = value_holdings(holdings, quotes, columns)
+    # Fund C's page failed; it is carried at its last recorded value.
+    return valuation.with_stale({"Fund C": 9.0})
+
+
+def test_ledger_records_each_run_and_replaces_a_rerun_day(tmp_path, monkeypatch):
+    ledger_dir = tmp_path / "price_ledger"
+    first = _valuation(tmp_path, monkeypatch, {"u1": ("150.00p", "151.00p"), "u2": ("$250.00", None)})
+    # A ledger from before the yearly partitions is split into them on the next run.
+    price_ledger.record_prices(tmp_path / "legacy", "2026-04-15", first)
+    (tmp_path / "legacy" / "price_ledger-2026.csv").rename(tmp_path / "price_ledger.csv")
+    price_ledger.record_prices(ledger_dir, "2026-04-16", first)
+    rerun = _valuation(tmp_path, monkeypatch, {"u1": ("160.00p", None), "u2": ("$250.00", None)}, usd_rate=0.75)
+    price_ledger.record_prices(ledger_dir, "2026-04-16", rerun)
+
+    ledger = price_ledger.read_ledger(ledger_dir)
+
+    assert not (tmp_path / "price_ledger.csv").exists()
+
+    assert ledger.columns.tolist() == price_ledger.LEDGER_COLUMNS
+    assert ledger["Date"].tolist() == ["2026-04-15"] * 3 + ["2026-04-16"] * 3
+    assert ledger.iloc[:3][["Fund", "Sell", "Currency", "FX Rate", "Source"]].values.tolist() == [
+        ["Fund A", 1.5, "GBP", 1.0, "hl"],
+        ["US Fund", 2.5, "USD", 0.8, "hl"],
+        ["Fund C", 4.5, "GBP", 1.0, "history"],
+    ]
+    assert ledger["Buy"].iloc[0] == 1.51 and ledger["Buy"].iloc[1:3].isna().all()
+    assert ledger.iloc[3:]["Sell"].tolist() == [1.6, 2.5, 4.5]
+
+    revalued = price_ledger.revalue(ledger).set_index("Date")
+    assert revalued.loc["2026-04-15", "Total"] == pytest.approx(first.total())
+    assert revalued.loc["2026-04-16", "Total"] == pytest.approx(rerun.total())
+    assert revalued.columns.tolist() == ["Total", "Fund A", "US Fund", "Fund C"]
+
+
+def test_revalue_applies_a_units_timeline_and_can_replace_history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    valuation = _valuation(tmp_path, monkeypatch, {"u1": ("150.00p", None), "u2": ("$250.00", None)})
+    for day in ("2026-04-14", "2026-04-15", "2026-04-16"):
+        data = valuation.to_frame()
+        update_daily_totals(data, valuation.total(), day)
+        price_ledger.record_prices(price_ledger.ledger_dir(), day, valuation)
+    timeline = pd.DataFrame({"Date": ["2026-04-15"], "Fund": ["Fund A"], "Units": [20]})
+
+    revalued = price_ledger.revalue(price_ledger.read_ledger(price_ledger.ledger_dir()), timeline)
+
+    assert revalued["Fund A"].tolist() == [15.0, 30.0, 30.0]
+    assert revalued["Total"].tolist() == pytest.approx([34.0, 49.0, 49.0])
+
+    price_ledger.apply_revaluation(revalued.iloc[1:])
+    history = HistoryStore.load().frame
+    assert history["Total"].tolist() == pytest.approx([34.0, 49.0, 49.0])
+    assert (tmp_path / "analytics_state.json").exists()
+    weekly = pd.read_csv(tmp_path / "daily_totals_rollups" / "weekly-2026.csv")
+    assert weekly.set_index("Fund").loc["Total", "Max"] == pytest.approx(49.0)
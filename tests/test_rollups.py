@@ -0,0 +1,90 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import rollups
+from persistence import HistoryStore, update_daily_totals
+
+
+def _history(start="2023-01-02", days=900, seed=3):
+    dates = pd.bdate_range(start, periods=days)
+    rng = np.random.default_rng(seed)
+    fund_a = np.round(1000 * np.cumprod(1 + rng.normal(0.0003, 0.01, days)), 2)
+    fund_b = np.round(500 * np.cumprod(1 + rng.normal(0.0002, 0.02, days)), 2)
+    return pd.DataFrame({"Date": dates.strftime("%Y-%m-%d"), "Total": fund_a + fund_b, "Fund A": fund_a, "Fund B": fund_b})
+
+
+def _day(row):
+    data = pd.DataFrame({"Total Holding Value": [row["Fund A"], row["Fund B"]]}, index=["Fund A", "Fund B"])
+    return data, row["Total"], row["Date"]
+
+
+def _rollup_files(directory):
+    return {path.name: pd.read_csv(path, dtype={"Period": str}) for path in sorted(directory.glob("*.csv"))}
+
+
+def test_daily_updates_match_a_full_rebuild(tmp_path):
+    history = _history(days=25)
+    target = tmp_path / "daily_totals.csv"
+    # Two weeks in, the rollups don't exist yet and are built from the history.
+    history.iloc[:10].to_csv(target, index=False)
+    for _, row in history.iloc[10:].iterrows():
+        update_daily_totals(*_day(row), filename=str(target))
+
+    incremental = _rollup_files(tmp_path / "daily_totals_rollups")
+    rollups.rebuild_rollups(tmp_path / "rebuilt", history)
+    rebuilt = _rollup_files(tmp_path / "rebuilt")
+
+    assert incremental.keys() == rebuilt.keys() == {"yearly.csv", "monthly-2023.csv", "weekly-2023.csv"}
+    for name, frame in rebuilt.items():
+        pd.testing.assert_frame_equal(incremental[name], frame)
+    monthly = rebuilt["monthly-2023.csv"].set_index(["Period", "Fund"])
+    january = history[history["Date"].str.startswith("2023-01")]
+    assert monthly.loc[("2023-01", "Total")].tolist() == pytest.approx(
+        [january["Total"].iloc[0], january["Total"].iloc[-1], january["Total"].min(), january["Total"].max()]
+    )
+
+
+def test_rerunning_a_day_replaces_its_values(tmp_path):
+    target = tmp_path / "daily_totals.csv"
+    history = _history(days=5)
+    history.to_csv(target, index=False)
+    store = HistoryStore.load(str(target))
+    rollups.rebuild_rollups(store.rollup_dir, store.frame)
+
+    row = history.iloc[-1].copy()
+    row[["Total", "Fund A"]] = [row["Total"] + 10_000, row["Fund A"] + 10_000]
+    update_daily_totals(*_day(row), filename=str(target))
+    row[["Total", "Fund A"]] = [1.0, 1.0]
+    update_daily_totals(*_day(row), filename=str(target))
+
+    weekly = rollups.read_level(store.rollup_dir, "weekly").set_index(["Period", "Fund"])
+    assert weekly.loc[("2023-01-02", "Fund A"), ["Close", "Min", "Max"]].tolist() == [1.0, 1.0, history["Fund A"].iloc[:4].max()]
+
+
+def test_plan_range_uses_the_coarsest_periods_that_fit():
+    pieces = rollups.plan_range(date(2023, 3, 15), date(2025, 5, 14))
+
+    levels = [level for level, _ in pieces]
+    assert ("yearly", "2024") in pieces
+    assert levels.count("yearly") == 1
+    assert levels.count("monthly") == 9 + 4
+    assert pieces[0] == ("weekly", "2023-03-13") and pieces[-1] == ("weekly", "2025-05-12")
+    assert [key for level, key in pieces if level == "monthly"][:2] == ["2023-04", "2023-05"]
+
+
+def test_query_range_matches_the_daily_rows_it_summarises(tmp_path):
+    history = _history()
+    rollups.rebuild_rollups(tmp_path, history)
+
+    result = rollups.query_range(tmp_path, "2023-03-15", "2026-05-31")
+
+    covered = history[(history["Date"] >= result.start.isoformat()) & (history["Date"] <= result.end.isoformat())]
+    assert result.start == date(2023, 3, 13)
+    for fund in ("Total", "Fund A", "Fund B"):
+        assert result.values.loc[fund].tolist() == pytest.approx(
+            [covered[fund].iloc[0], covered[fund].iloc[-1], covered[fund].min(), covered[fund].max()]
+        )
+    assert result.rows_read < len(history)
@@ -0,0 +1,48 @@
+import time
+
+import pull_and_collate
+from portfolio_model import Holding
+
+
+def _fake_scraper(url):
+    # Finish out of order so the test proves results are re-ordered.
+    delay = {"u1": 0.03, "u2": 0.0, "u3": 0.01, "u4": 0.02}[url]
+    time.sleep(delay)
+    if url == "u2":
+        raise RuntimeError("boom")
+    if url == "u3":
+        return {"title": None}
+    return {"title": f"Fund {url}", "sell": "100.00p"}
+
+
+def test_scrape_quotes_concurrent_matches_serial(monkeypatch):
+    monkeypatch.setattr(pull_and_collate, "price_scraper_fund", _fake_scraper)
+    holdings = [Holding(fund, units, url, fund.lower()) for fund, units, url in zip("ABCD", [1, 2, 3, 4], ["u1", "u2", "u3", "u4"])]
+
+    serial = pull_and_collate.scrape_quotes(holdings, workers=1)
+    concurrent = pull_and_collate.scrape_quotes(holdings, workers=4)
+
+    assert [quote.fund_name for quote in serial] == ["A", "D"]
+    assert concurrent == serial
+
+
+def test_create_data_frames_scrapes_shared_urls_once(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_scraper(url):
+        calls.append(url)
+        return {"title": f"Fund {url}", "sell": "200.00p"}
+
+    monkeypatch.setattr(pull_and_collate, "price_scraper_fund", fake_scraper)
+    (tmp_path / "alice.csv").write_text("fund,units,url\nFund A,10,u1\nFund B,5,u2\n", encoding="utf-8")
+    (tmp_path / "bob.csv").write_text("fund,units,url\nFund A,3,u1\n", encoding="utf-8")
+
+    portfolios, stats = pull_and_collate.create_data_frames(
+        {"alice": tmp_path / "alice.csv", "bob": tmp_path / "bob.csv"}
+    )
+
+    assert sorted(calls) == ["u1", "u2"]
+    assert stats.holdings == 3
+    assert stats.saved_requests == 1
+    assert portfolios["alice"]["Total Holding Value"].to_dict() == {"Fund A": 20.0, "Fund B": 10.0}
+    assert portfolios["bob"]["Total Holding Value"].to_dict() == {"Fund A": 6.0}
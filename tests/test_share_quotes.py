@@ -0,0 +1,56 @@
+import pytest
+
+import share_quotes
+from config import WatchlistSettings
+from share_quotes import RawQuote, ShareQuote, fetch_watchlist_quotes, normalise_to_pence
+
+
+def test_normalise_to_pence_scales_pound_quotes_only():
+    raw = {
+        "ELIX.L": RawQuote(152.5, 154.0, "GBp"),
+        "BP.L": RawQuote(4.5, 4.0, "GBP"),
+        "NEW.L": RawQuote(10.0, None, "GBp"),
+        "GONE.L": RawQuote(None, 1.0, "GBp"),
+    }
+
+    quotes = normalise_to_pence(["ELIX.L", "BP.L", "NEW.L", "GONE.L", "MISSING.L"], raw)
+
+    assert quotes == [
+        ShareQuote("ELIX.L", 152.5, -1.5, pytest.approx(-0.974, abs=1e-3)),
+        ShareQuote("BP.L", 450.0, 50.0, 12.5),
+        ShareQuote("NEW.L", 10.0, None, None),
+    ]
+    assert quotes[1].describe() == "LON:BP: 450.00p (+50.00p DoD, +12.50%)"
+
+
+def test_watchlist_is_downloaded_in_one_batch_and_cached(tmp_path, monkeypatch):
+    calls = []
+
+    def download(symbols, currencies):
+        calls.append(list(symbols))
+        return {symbol: RawQuote(100.0, 99.0, "GBp") for symbol in symbols if symbol != "NONE.L"}
+
+    monkeypatch.setattr(share_quotes, "download_quotes", download)
+    settings = WatchlistSettings(("ELIX.L", "VOD.L", "NONE.L"), str(tmp_path / "quotes.json"), ttl_seconds=300)
+
+    first = fetch_watchlist_quotes(settings, now=1_000.0)
+    cached = fetch_watchlist_quotes(settings, now=1_200.0)
+    monkeypatch.setattr(share_quotes, "download_quotes", lambda symbols, currencies: pytest.fail("should use the cache"))
+    fetch_watchlist_quotes(WatchlistSettings(("ELIX.L",), settings.cache_path, 300), now=1_250.0)
+
+    assert calls == [["ELIX.L", "VOD.L", "NONE.L"], ["NONE.L"]]
+    assert [quote.symbol for quote in first] == ["ELIX.L", "VOD.L"]
+    assert cached == first
+
+
+def test_failed_download_falls_back_to_expired_cache(tmp_path, monkeypatch):
+    settings = WatchlistSettings(("ELIX.L",), str(tmp_path / "quotes.json"), ttl_seconds=60)
+    monkeypatch.setattr(share_quotes, "download_quotes", lambda symbols, currencies: {"ELIX.L": RawQuote(1.5, 1.4, "GBP")})
+    fetch_watchlist_quotes(settings, now=0.0)
+
+    def offline(symbols, currencies):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(share_quotes, "download_quotes", offline)
+
+    assert fetch_watchlist_quotes(settings, now=10_000.0) == [ShareQuote("ELIX.L", 150.0, pytest.approx(10.0), pytest.approx(7.142857, rel=1e-5))]
@@ -1,20 +1,21 @@
 import logging
 import re
 
-import requests
+import numpy as np
+import pandas as pd
 
 
 logger = logging.getLogger(__name__)
 
-
-def get_usd_gbp_rate() -> float:
-    response = requests.get(
-        "https://api.frankfurter.dev/v1/latest?base=USD&symbols=GBP",
-        timeout=20,
-    )
-    response.raise_for_status()
-    data = response.json()
-    return float(data["rates"]["GBP"])
+CURRENCY_SYMBOLS = {"£": "GBP", "$": "USD", "€": "EUR", "¥": "JPY"}
+# The ISO codes the FX API (ECB reference rates) quotes; any other three
+# capitals next to a price ("NAV", "INC") are not a currency.
+ISO_CURRENCY_CODES = frozenset(
+    "AUD BGN BRL CAD CHF CNY CZK DKK EUR GBP HKD HUF IDR ILS INR ISK JPY KRW MXN MYR NOK NZD PHP PLN RON SEK SGD THB TRY USD ZAR".split()
+)
+CURRENCY_CODE = "(?:" + "|".join(sorted(ISO_CURRENCY_CODES)) + ")"
+CURRENCY_CODE_PATTERN = re.compile(rf"\b({CURRENCY_CODE})\b")
+_SHARE_PATTERN = re.compile("share", re.IGNORECASE)
 
 
 def improved_normalise_key(value: str) -> str:
@@ -34,7 +35,10 @@ def improved_normalise_key(value: str) -> str:
 
 
 def parse_price_to_gbp(value: str, is_share: bool) -> float:
-    cleaned = str(value).replace(",", "").replace("£", "").replace("$", "").strip()
+    cleaned = CURRENCY_CODE_PATTERN.sub("", str(value)).replace(",", "")
+    for symbol in CURRENCY_SYMBOLS:
+        cleaned = cleaned.replace(symbol, "")
+    cleaned = cleaned.strip()
     if cleaned.endswith("p"):
         cleaned = cleaned[:-1]
     amount = float(cleaned)
@@ -42,10 +46,68 @@ def parse_price_to_gbp(value: str, is_share: bool) -> float:
 
 
 def infer_currency(value: str) -> str:
-    return "USD" if "$" in str(value) else "GBP"
+    text = str(value)
+    for symbol, currency in CURRENCY_SYMBOLS.items():
+        if symbol in text:
+            return currency
+    code = CURRENCY_CODE_PATTERN.search(text)
+    return code.group(1) if code else "GBP"
+
+
+# Column-wise equivalents of the scalar price helpers above, for frame-sized
+# inputs; the valuation model prices its few dozen rows with the scalar ones.
+# They work on the column's unique values only (holdings files repeat funds
+# across accounts), using NumPy string ufuncs where one exists and the scalar
+# regexes per unique value otherwise, and must stay result-for-result
+# identical to the scalar versions.
+
+
+def _on_uniques(values: pd.Series | pd.Index, transform) -> np.ndarray:
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    text = pd.Index(uniques).astype(str).to_numpy(dtype=object).astype(str)
+    return np.asarray(transform(text), dtype=object)[codes]
+
+
+def _first_codes(text: np.ndarray) -> dict[int, re.Match]:
+    matches = (CURRENCY_CODE_PATTERN.search(value) for value in text.tolist())
+    return {row: match for row, match in enumerate(matches) if match is not None}
+
+
+def _parse_price_array(text: np.ndarray) -> np.ndarray:
+    coded = list(_first_codes(text))
+    if coded:
+        text = text.astype(object)
+        text[coded] = [CURRENCY_CODE_PATTERN.sub("", value) for value in text[coded]]
+        text = text.astype(str)
+    for symbol in (",", *CURRENCY_SYMBOLS):
+        text = np.strings.replace(text, symbol, "")
+    text = np.strings.strip(text)
+    doubled = np.strings.endswith(text, "pp")
+    if doubled.any():
+        # The scalar helper drops a single "p", so these must fail to parse.
+        raise ValueError(f"could not convert string to float: {str(text[doubled][0])[:-1]!r}")
+    return np.strings.rstrip(text, "p").astype(float)
+
+
+def parse_prices_to_gbp(values: pd.Series, is_share: pd.Series | np.ndarray) -> pd.Series:
+    amounts = _on_uniques(values, _parse_price_array).astype(float)
+    return pd.Series(np.where(np.asarray(is_share, dtype=bool), amounts, amounts / 100.0), index=values.index)
+
+
+def _infer_currency_array(text: np.ndarray) -> np.ndarray:
+    currencies = np.full(len(text), "GBP", dtype=object)
+    for row, code in _first_codes(text).items():
+        currencies[row] = code.group(1)
+    # Symbols win over codes, and earlier symbols win over later ones, as in infer_currency.
+    for symbol, currency in reversed(CURRENCY_SYMBOLS.items()):
+        currencies[np.strings.find(text, symbol) >= 0] = currency
+    return currencies
+
+
+def infer_currencies(values: pd.Series) -> pd.Series:
+    return pd.Series(_on_uniques(values, _infer_currency_array).tolist(), index=values.index)
 
 
-def convert_value_to_gbp(value: float, currency: str, usd_gbp_rate: float) -> float:
-    if currency == "USD":
-        return value * usd_gbp_rate
-    return value
+def contains_share(values: pd.Index | pd.Series) -> np.ndarray:
+    """Column-wise ``str.contains("share", case=False)``."""
+    return _on_uniques(values, lambda text: [_SHARE_PATTERN.search(value) is not None for value in text.tolist()]).astype(bool)